@@ -5,13 +5,9 @@ This module implements machine learning-based anomaly detection using Isolation
 to identify unusual patterns in system logs, network traffic, and user behavior.
 """
 
-import numpy as np
-import pandas as pd
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler, LabelEncoder
 from datetime import datetime, timedelta
 import psutil
-import joblib
+import json
 import os
 from typing import List, Dict, Optional, Tuple
 from .models import AnomalyDetection, AnomalyType, AnomalySeverity, SystemMetrics
@@ -21,6 +17,9 @@ from sqlalchemy import select, and_, desc
 import asyncio
 import logging
 
+# numpy, pandas, scikit-learn and joblib are imported inside the methods that
+# use them so that importing this module does not slow down API startup.
+
 logger = logging.getLogger(__name__)
 
 class AnomalyDetectionService:
@@ -31,6 +30,7 @@ class AnomalyDetectionService:
         self.scalers = {}
         self.label_encoders = {}
         self.model_dir = "models/anomaly_detection"
+        self.ready = False  # True once warm_up() has finished
         os.makedirs(self.model_dir, exist_ok=True)
 
         # Contamination parameters for different anomaly types
@@ -52,6 +52,11 @@ class AnomalyDetectionService:
 
     async def train_cpu_anomaly_model(self, db: AsyncSession) -> None:
         """Train Isolation Forest model for CPU usage anomalies"""
+        import joblib
+        import pandas as pd
+        from sklearn.ensemble import IsolationForest
+        from sklearn.preprocessing import StandardScaler
+
         # Get historical CPU metrics
         result = await db.execute(
             select(SystemMetrics).order_by(desc(SystemMetrics.timestamp)).limit(1000)
@@ -95,6 +100,11 @@ class AnomalyDetectionService:
 
     async def train_memory_anomaly_model(self, db: AsyncSession) -> None:
         """Train Isolation Forest model for memory usage anomalies"""
+        import joblib
+        import pandas as pd
+        from sklearn.ensemble import IsolationForest
+        from sklearn.preprocessing import StandardScaler
+
         result = await db.execute(
             select(SystemMetrics).order_by(desc(SystemMetrics.timestamp)).limit(1000)
         )
@@ -137,22 +147,25 @@ class AnomalyDetectionService:
 
     async def train_login_anomaly_model(self, db: AsyncSession) -> None:
         """Train model for detecting unusual login patterns"""
+        import joblib
+        import numpy as np
+        import pandas as pd
+        from sklearn.ensemble import IsolationForest
+        from sklearn.preprocessing import StandardScaler
+
         # For now, create a simple mock model based on login times
         # In production, integrate with actual authentication logs
-        login_data = []
-
-        # Generate synthetic login patterns for training
-        for hour in range(24):
-            for weekday in range(7):
-                # Normal login patterns: 8-18 on weekdays, less on weekends
-                normal_logins = 10 if weekday < 5 and 8 <= hour <= 18 else 3
-                login_data.extend([{
-                    'hour': hour,
-                    'weekday': weekday,
-                    'login_count': normal_logins + np.random.normal(0, 2)
-                } for _ in range(normal_logins)])
-
-        data = pd.DataFrame(login_data)
+        hours = np.repeat(np.arange(24), 7)
+        weekdays = np.tile(np.arange(7), 24)
+
+        # Normal login patterns: 8-18 on weekdays, less on weekends; one row per login
+        normal_logins = np.where((weekdays < 5) & (hours >= 8) & (hours <= 18), 10, 3)
+        data = pd.DataFrame({
+            'hour': np.repeat(hours, normal_logins),
+            'weekday': np.repeat(weekdays, normal_logins),
+            'login_count': np.repeat(normal_logins, normal_logins)
+                           + np.random.normal(0, 2, size=int(normal_logins.sum())),
+        })
 
         model = IsolationForest(
             contamination=self.contamination_rates[AnomalyType.login_anomaly],
@@ -174,8 +187,25 @@ class AnomalyDetectionService:
 
         logger.info("Login anomaly detection model trained successfully")
 
+    def warm_up(self) -> None:
+        """Import the ML stack and load persisted models.
+
+        Blocking; meant to run in a worker thread after the server has started
+        accepting requests. Detection is skipped for models not yet loaded.
+        """
+        try:
+            import sklearn.ensemble  # noqa: F401 - pay the import cost here, not on the first request
+            import pandas  # noqa: F401
+            self.load_models()
+        except Exception as e:
+            logger.error(f"Anomaly detection warm-up failed: {e}")
+        finally:
+            self.ready = True
+
     def load_models(self) -> None:
         """Load trained models from disk"""
+        import joblib
+
         for anomaly_type in AnomalyType:
             model_path = self._get_model_path(anomaly_type)
             scaler_path = self._get_scaler_path(anomaly_type)
@@ -201,6 +231,8 @@ class AnomalyDetectionService:
         if anomaly_type not in self.models:
             return None
 
+        import pandas as pd
+
         # Prepare data
         data = pd.DataFrame([{
             'cpu_percent': current_metrics.get('cpu_percent', 0),
@@ -227,6 +259,8 @@ class AnomalyDetectionService:
         if anomaly_type not in self.models:
             return None
 
+        import pandas as pd
+
         data = pd.DataFrame([{
             'memory_percent': current_metrics.get('memory_percent', 0),
             'memory_used': current_metrics.get('memory_used', 0),
@@ -252,6 +286,8 @@ class AnomalyDetectionService:
         if anomaly_type not in self.models:
             return None
 
+        import pandas as pd
+
         data = pd.DataFrame([{
             'hour': login_data.get('hour', datetime.now().hour),
             'weekday': login_data.get('weekday', datetime.now().weekday()),
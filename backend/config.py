@@ -8,6 +8,32 @@ class Settings(BaseSettings):
     keycloak_client_id: str = Field(..., env="KEYCLOAK_CLIENT_ID")
     keycloak_client_secret: str = Field(..., env="KEYCLOAK_CLIENT_SECRET")
 
+    # Connection pool; connections past pool_size are opened on demand up to max_overflow,
+    # and a checkout waits at most db_pool_timeout_seconds
+    db_pool_size: int = Field(10, env="DB_POOL_SIZE")
+    db_max_overflow: int = Field(20, env="DB_MAX_OVERFLOW")
+    db_pool_timeout_seconds: float = Field(30, env="DB_POOL_TIMEOUT_SECONDS")
+    db_pool_recycle_seconds: int = Field(1800, env="DB_POOL_RECYCLE_SECONDS")
+    db_pool_pre_ping: bool = Field(True, env="DB_POOL_PRE_PING")
+
+    # SQL logging: echo every statement (development only), or log only the slow ones
+    sql_echo: bool = Field(False, env="SQL_ECHO")
+    slow_query_ms: float = Field(200.0, env="SLOW_QUERY_MS")
+    query_sample_rate: float = Field(0.0, env="QUERY_SAMPLE_RATE")
+    slow_query_keep: int = Field(20, env="SLOW_QUERY_KEEP")
+    # Keeps the parameters of the slowest statements in memory so they can be EXPLAINed
+    slow_query_explain: bool = Field(False, env="SLOW_QUERY_EXPLAIN")
+
+    # System metrics downsampling: raw samples, then 1-minute and 1-hour aggregates
+    # (hour retention 0 keeps them forever)
+    metrics_raw_retention_days: float = Field(7, env="METRICS_RAW_RETENTION_DAYS")
+    metrics_minute_retention_days: float = Field(30, env="METRICS_MINUTE_RETENTION_DAYS")
+    metrics_hour_retention_days: float = Field(0, env="METRICS_HOUR_RETENTION_DAYS")
+    metrics_rollup_interval_seconds: float = Field(60, env="METRICS_ROLLUP_INTERVAL_SECONDS")
+    metrics_delete_batch_size: int = Field(5000, env="METRICS_DELETE_BATCH_SIZE")
+    # Historical queries use the coarsest tier that still gives this many points
+    metrics_query_min_points: int = Field(100, env="METRICS_QUERY_MIN_POINTS")
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,15 @@
+"""
+Shared pytest setup for the backend tests: make the backend package importable
+and provide the settings config.Settings() requires when no .env file is present.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("KEYCLOAK_URL", "http://127.0.0.1:9")
+os.environ.setdefault("KEYCLOAK_REALM", "cyberblue")
+os.environ.setdefault("KEYCLOAK_CLIENT_ID", "cyberblue-backend")
+os.environ.setdefault("KEYCLOAK_CLIENT_SECRET", "test-secret")
@@ -1,8 +1,16 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from .config import settings
+from .pool_metrics import PoolMetrics
+from .query_log import QueryLog
 
-engine = create_async_engine(settings.database_url, echo=True)
+pool_metrics = PoolMetrics("async")
+engine = create_async_engine(settings.database_url, echo=settings.sql_echo,
+                             **pool_metrics.engine_options(settings.database_url, settings))
+
+query_log = QueryLog(settings.slow_query_ms, settings.query_sample_rate, keep=settings.slow_query_keep,
+                     capture_parameters=settings.slow_query_explain)
+query_log.attach(engine)
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 class Base(DeclarativeBase):
@@ -1,15 +1,18 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 import uvicorn
 
 from .config import settings
-from .database import Base, get_db, engine
-from .models import User, Role, Tool, AuditLog, SystemMetrics, AnomalyDetection
+from .database import Base, async_session, get_db, engine
+from .models import User, Role, Tool, AuditLog, SystemMetrics, AnomalyDetection, MetricRollup
 from .routers import auth, tools, actions, metrics, ai
+from .metric_rollup import retain_periodically
 from .websocket import manager
 from .anomaly_detection import anomaly_service
+from .query_log import current_route
 import asyncio
 
 app = FastAPI(title="CyberBlue SOC API", version="1.0.0")
@@ -23,6 +26,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def tag_queries_with_route(request: Request, call_next):
+    """Attribute the statements a request runs to it in the slow-query log"""
+    token = current_route.set(f"{request.method} {request.url.path}")
+    try:
+        return await call_next(request)
+    finally:
+        current_route.reset(token)
+
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(tools.router, prefix="/tools", tags=["tools"])
@@ -36,14 +48,21 @@ async def startup_event():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
+    # Load ML models in the background so the server accepts requests right away
+    app.state.warm_up_task = asyncio.create_task(asyncio.to_thread(anomaly_service.warm_up))
+
     # Start anomaly detection background task
     asyncio.create_task(anomaly_detection_worker())
 
+    # Roll system metrics up into minute and hour tiers and prune the raw samples
+    asyncio.create_task(retain_periodically(metrics.metric_retention, async_session,
+                                            settings.metrics_rollup_interval_seconds))
+
 async def anomaly_detection_worker():
     """Background worker for continuous anomaly detection"""
     while True:
         try:
-            async with AsyncSession(engine) as db:
+            async with async_session() as db:
                 # Run anomaly detection every 30 seconds
                 await anomaly_service.process_current_metrics(db)
         except Exception as e:
@@ -64,5 +83,16 @@ async def websocket_endpoint(websocket):
 async def root():
     return {"message": "CyberBlue SOC API"}
 
+@app.get("/health")
+async def health():
+    return {"status": "healthy", "ml_ready": anomaly_service.ready}
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until background model warm-up has finished"""
+    if not anomaly_service.ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready"}
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text, Float
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Enum, Text, Float, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -69,6 +69,25 @@ class SystemMetrics(Base):
     uptime = Column(Float)
     response_time = Column(Float)
 
+class MetricRollup(Base):
+    """Per-minute and per-hour aggregates of system_metrics (see metric_rollup.py)"""
+    __tablename__ = "metric_rollups"
+
+    resolution = Column(Integer, primary_key=True)  # Seconds per bucket
+    series = Column(String, primary_key=True)  # Always '': system_metrics is a single series
+    metric = Column(String, primary_key=True)  # Metric name, as in /metrics/historical
+    bucket = Column(BigInteger, primary_key=True)  # Bucket start, seconds since 1970 (UTC)
+    min = Column(Float)
+    max = Column(Float)
+    sum = Column(Float)
+    count = Column(Integer)
+
+    # Newest bucket per resolution: where the next rollup resumes
+    __table_args__ = (
+        Index("ix_metric_rollups_resolution_bucket", "resolution", "bucket"),
+        {"sqlite_with_rowid": False},
+    )
+
 class AnomalySeverity(enum.Enum):
     low = "low"
     medium = "medium"
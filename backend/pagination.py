@@ -0,0 +1,109 @@
+"""
+Keyset pagination and approximate counts for list endpoints
+
+OFFSET pagination reads and discards every row before the requested page, so
+deep pages cost as much as all the pages before them. Lists shown newest
+first are paged on (timestamp, id) instead: the cursor names the last row of
+the previous page and the next page continues from it in the timestamp
+index, so every page costs the same as the first. The id breaks ties between
+rows written in the same instant.
+
+An exact total is a count over every matching row, as slow as a deep page.
+With approximate=True, count_rows returns the planner's row estimate on
+PostgreSQL and a count that stops at COUNT_CAP elsewhere.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+from sqlalchemy import desc, func, or_, select
+from sqlalchemy.exc import CompileError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+COUNT_CAP = 10000
+
+
+class InvalidCursor(ValueError):
+    """A cursor that was not produced by encode_cursor"""
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def keyset(query: Select, created_at, row_id, cursor: Optional[str], limit: int) -> Select:
+    """Newest-first page of `query` following `cursor`
+
+    Fetches one row more than the page so split_page can tell whether
+    another page follows.
+    """
+    if cursor:
+        after_created_at, after_id = decode_cursor(cursor)
+        # The first condition is the index range; the second excludes the
+        # rows already shown that share the cursor's timestamp
+        query = query.where(created_at <= after_created_at,
+                            or_(created_at < after_created_at, row_id < after_id))
+    return query.order_by(desc(created_at), desc(row_id)).limit(limit + 1)
+
+
+def split_page(rows: Sequence, limit: int, created_at: str = "timestamp") -> Tuple[list, Optional[str]]:
+    """Split the rows fetched by keyset into the page and the cursor for the next one"""
+    page = list(rows[:limit])
+    if len(rows) <= limit:
+        return page, None
+    last = page[-1]
+    return page, encode_cursor(getattr(last, created_at), last.id)
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a query, executed with the query's parameters bound
+
+    The query is compiled by the connection's own dialect, so its values go
+    to the driver as parameters with their column types applied instead of
+    being rendered into the SQL.
+    """
+    inherit_cache = False
+
+    def __init__(self, query: Select):
+        self.query = query
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.query, **kw)
+
+
+async def count_rows(db: AsyncSession, query: Select, approximate: bool = False) -> Tuple[int, bool]:
+    """Number of rows `query` returns, and whether that number is exact"""
+    if not approximate:
+        return await db.scalar(select(func.count()).select_from(query.order_by(None).subquery())), True
+
+    if db.bind.dialect.name == "postgresql":
+        conn = await db.connection()
+        try:
+            plan = (await conn.execute(Explain(query.order_by(None)))).scalar()
+        except CompileError:
+            plan = None  # fall through to the capped count
+        if plan is not None:
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]["Plan"]["Plan Rows"]), False
+
+    capped = query.order_by(None).limit(COUNT_CAP + 1).subquery()
+    count = await db.scalar(select(func.count()).select_from(capped))
+    return min(count, COUNT_CAP), count <= COUNT_CAP
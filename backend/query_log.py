@@ -0,0 +1,129 @@
+"""
+Slow-query log
+
+Times every statement the engine sends to the database. Statements slower
+than the threshold are logged with their duration, row count and the route
+that issued them; a sample of the remaining statements can be logged too.
+The slowest statements are kept in memory so their plans can be fetched with
+EXPLAIN on demand, instead of echoing every statement the API runs.
+"""
+
+import heapq
+import logging
+import random
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Route of the request being served; set by the HTTP middleware in main.py
+current_route: ContextVar[Optional[str]] = ContextVar("current_route", default=None)
+
+EXPLAIN_PREFIXES = {"postgresql": "EXPLAIN ", "sqlite": "EXPLAIN QUERY PLAN "}
+
+
+class QueryLog:
+    """Statement timing hooks for one engine, plus the slowest statements seen.
+
+    `threshold_ms` marks a statement as slow; `sample_rate` is the share of
+    other statements logged at debug level. With `capture_parameters` the
+    bound parameters of the kept statements are retained, which EXPLAIN needs.
+    """
+
+    def __init__(self, threshold_ms: float = 200.0, sample_rate: float = 0.0, keep: int = 20,
+                 capture_parameters: bool = False):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self.capture_parameters = capture_parameters
+        self.counters = {"queries": 0, "slow": 0, "sampled": 0, "errors": 0}
+        self._slowest: List[tuple] = []  # min-heap of (duration_ms, sequence, entry)
+        self._sequence = 0
+        self._dialect: Optional[str] = None
+
+    def attach(self, engine) -> None:
+        """Listen on an Engine or AsyncEngine"""
+        sync_engine = getattr(engine, "sync_engine", engine)
+        self._dialect = sync_engine.dialect.name
+        event.listen(sync_engine, "before_cursor_execute", self._before)
+        event.listen(sync_engine, "after_cursor_execute", self._after)
+        event.listen(sync_engine, "handle_error", self._error)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append((context, time.perf_counter()))
+
+    def _error(self, exception_context) -> None:
+        # A statement that raised never reaches after_cursor_execute; drop its start time so
+        # the next statement on the connection is not timed from it. Errors raised before the
+        # cursor ran, or while fetching rows, have no entry of their own to drop.
+        conn = exception_context.connection
+        started = conn.info.get("query_started") if conn is not None else None
+        if started and started[-1][0] is exception_context.execution_context:
+            started.pop()
+            self.counters["errors"] += 1
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - conn.info["query_started"].pop()[1]) * 1000
+        self.counters["queries"] += 1
+        # Unknown (-1) for a SELECT until its rows are fetched on most drivers
+        rowcount = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+        route = current_route.get() or "background"
+
+        if duration_ms >= self.threshold_ms:
+            self.counters["slow"] += 1
+            logger.warning(f"Slow query {duration_ms:.1f} ms, rows {rowcount}, route {route}: "
+                           f"{' '.join(statement.split())}")
+            self._remember(statement, parameters, executemany, duration_ms, rowcount, route)
+        elif self.sample_rate and random.random() < self.sample_rate:
+            self.counters["sampled"] += 1
+            logger.debug(f"Query {duration_ms:.1f} ms, rows {rowcount}, route {route}: "
+                         f"{' '.join(statement.split())}")
+
+    def _remember(self, statement, parameters, executemany, duration_ms, rowcount, route) -> None:
+        entry = {
+            "statement": statement,
+            "duration_ms": round(duration_ms, 2),
+            "rowcount": rowcount,
+            "route": route,
+            "at": datetime.now(timezone.utc).isoformat(),
+            "parameters": parameters if self.capture_parameters and not executemany else None,
+            "explainable": self.capture_parameters and not executemany
+                           and statement.lstrip().upper().startswith(("SELECT", "WITH")),
+        }
+        self._sequence += 1
+        item = (duration_ms, self._sequence, entry)
+        if len(self._slowest) < self.keep:
+            heapq.heappush(self._slowest, item)
+        elif duration_ms > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, item)
+
+    def slowest(self) -> List[Dict[str, Any]]:
+        """Kept slow statements, slowest first, without their parameters"""
+        return [{key: value for key, value in entry.items() if key != "parameters"}
+                for _, _, entry in sorted(self._slowest, key=lambda item: item[0], reverse=True)]
+
+    async def explain_slowest(self, engine, limit: int = 5) -> List[Dict[str, Any]]:
+        """EXPLAIN the slowest kept SELECTs on a connection of their own; plans are not executed"""
+        prefix = EXPLAIN_PREFIXES.get(self._dialect)
+        ranked = [entry for _, _, entry in sorted(self._slowest, key=lambda item: item[0], reverse=True)]
+        plans = []
+        for entry in ranked[:limit]:
+            plan = None
+            if prefix and entry["explainable"]:
+                try:
+                    async with engine.connect() as conn:
+                        result = await conn.exec_driver_sql(prefix + entry["statement"], entry["parameters"] or ())
+                        plan = [" | ".join(str(column) for column in row) for row in result.all()]
+                except Exception as e:
+                    plan = [f"EXPLAIN failed: {e}"]
+            plans.append({"statement": entry["statement"], "duration_ms": entry["duration_ms"],
+                          "route": entry["route"], "plan": plan})
+        return plans
+
+    def stats(self) -> Dict[str, Any]:
+        return {"threshold_ms": self.threshold_ms, "sample_rate": self.sample_rate, **self.counters,
+                "slowest": self.slowest()}
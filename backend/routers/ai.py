@@ -5,7 +5,7 @@ from ..database import get_db
 from ..models import Tool, AuditLog, AnomalyDetection, AnomalySeverity
 from ..routers.auth import get_current_user
 from ..anomaly_detection import anomaly_service
-import openai
+from ..pagination import InvalidCursor, count_rows, keyset, split_page
 import json
 from typing import List, Optional
 from pydantic import BaseModel
@@ -123,6 +123,8 @@ class AnomalyFilterRequest(BaseModel):
     severity: Optional[str] = None
     acknowledged: Optional[bool] = None
     limit: int = 50
+    cursor: Optional[str] = None  # next_cursor of the previous page
+    approximate_count: Optional[bool] = None  # include total_count; True allows an estimate
 
 @router.get("/anomalies")
 async def get_anomalies(
@@ -147,11 +149,19 @@ async def get_anomalies(
     if filter_request.acknowledged is not None:
         query = query.where(AnomalyDetection.acknowledged == filter_request.acknowledged)
 
-    # Order by timestamp (most recent first)
-    query = query.order_by(desc(AnomalyDetection.timestamp)).limit(filter_request.limit)
+    total_count = count_is_exact = None
+    if filter_request.approximate_count is not None:
+        total_count, count_is_exact = await count_rows(db, query, filter_request.approximate_count)
+
+    # Most recent first, continuing after the cursor
+    try:
+        query = keyset(query, AnomalyDetection.timestamp, AnomalyDetection.id,
+                       filter_request.cursor, filter_request.limit)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
     result = await db.execute(query)
-    anomalies = result.scalars().all()
+    anomalies, next_cursor = split_page(result.scalars().all(), filter_request.limit)
 
     return {
         "anomalies": [
@@ -170,7 +180,10 @@ async def get_anomalies(
             }
             for a in anomalies
         ],
-        "total": len(anomalies)
+        "total": len(anomalies),
+        "next_cursor": next_cursor,
+        "total_count": total_count,
+        "total_count_exact": count_is_exact
     }
 
 @router.post("/anomalies/acknowledge")
@@ -240,9 +253,3 @@ async def train_anomaly_models(
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Model training failed: {str(e)}")
-
-# Initialize anomaly detection service on startup
-@router.on_event("startup")
-async def startup_event():
-    """Initialize anomaly detection service on application startup"""
-    anomaly_service.load_models()
\ No newline at end of file
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, BackgroundTasks
+from fastapi import APIRouter, Depends, BackgroundTasks, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from ..database import get_db
-from ..models import Tool, AuditLog, SystemMetrics
-from ..routers.auth import get_current_user
+from sqlalchemy import select
+from ..config import settings
+from ..database import engine, get_db, pool_metrics, query_log
+from ..metric_rollup import MetricRetention, Series
+from ..models import Tool, AuditLog, SystemMetrics, MetricRollup
+from ..routers.auth import get_current_user, require_admin
 from ..websocket import manager
 import psutil
 import time
@@ -11,6 +13,25 @@ import asyncio
 
 router = APIRouter()
 
+DAY = 86400
+
+# Metric types of /historical, by column
+metric_retention = MetricRetention(
+    Series(SystemMetrics.__table__, SystemMetrics.timestamp, {
+        "cpu": SystemMetrics.cpu_percent,
+        "memory": SystemMetrics.memory_percent,
+        "active_agents": SystemMetrics.active_agents,
+        "uptime": SystemMetrics.uptime,
+        "response_time": SystemMetrics.response_time,
+    }),
+    MetricRollup,
+    raw_retention=settings.metrics_raw_retention_days * DAY,
+    minute_retention=settings.metrics_minute_retention_days * DAY,
+    hour_retention=settings.metrics_hour_retention_days * DAY or None,
+    batch_size=settings.metrics_delete_batch_size,
+    min_points=settings.metrics_query_min_points,
+)
+
 @router.get("/system")
 async def get_system_metrics(db: AsyncSession = Depends(get_db), user: dict = Depends(get_current_user)):
     """Get real-time system metrics"""
@@ -49,44 +70,49 @@ async def get_system_metrics(db: AsyncSession = Depends(get_db), user: dict = De
     }
 
 @router.get("/historical/{metric_type}")
-async def get_historical_metrics(metric_type: str, hours: int = 24, db: AsyncSession = Depends(get_db), user: dict = Depends(get_current_user)):
-    """Get historical metrics data from database"""
-    # Calculate time range
-    current_time = time.time()
-    start_time = current_time - (hours * 3600)
-
-    # Map metric types to database columns
-    column_map = {
-        "cpu": SystemMetrics.cpu_percent,
-        "memory": SystemMetrics.memory_percent,
-        "active_agents": SystemMetrics.active_agents,
-        "uptime": SystemMetrics.uptime,
-        "response_time": SystemMetrics.response_time
-    }
+async def get_historical_metrics(metric_type: str, hours: int = 24, max_points: int = Query(1000, ge=1, le=10000), db: AsyncSession = Depends(get_db), user: dict = Depends(get_current_user)):
+    """Get historical metrics data, bucketed in SQL to at most about max_points points
 
-    if metric_type not in column_map:
+    Columnar: the i-th entry of each list belongs to timestamps[i], the start of
+    a resolution_seconds-wide bucket (0: raw samples).
+    """
+    if metric_type not in metric_retention.series.values:
         return {"error": f"Unsupported metric type: {metric_type}"}
 
-    # Query historical data
-    result = await db.execute(
-        select(SystemMetrics.timestamp, column_map[metric_type])
-        .where(SystemMetrics.timestamp >= func.datetime(start_time, 'unixepoch'))
-        .order_by(SystemMetrics.timestamp)
-    )
-
-    data_points = [
-        {
-            "timestamp": row[0].timestamp(),
-            "value": row[1]
-        }
-        for row in result.all()
-    ]
+    current_time = time.time()
+    resolution, points = await metric_retention.history(db, metric_type, current_time - hours * 3600, current_time,
+                                                        max_points=max_points)
 
     return {
         "metric_type": metric_type,
-        "data_points": data_points
+        "resolution_seconds": resolution,
+        "timestamps": [point.bucket for point in points],
+        "values": [point.avg for point in points],
+        "min": [point.min for point in points],
+        "max": [point.max for point in points],
+        "count": [point.count for point in points]
     }
 
+@router.get("/retention")
+async def get_metric_retention(user: dict = Depends(get_current_user)):
+    """Rollup and pruning counters of the metrics retention task"""
+    return metric_retention.stats()
+
+@router.get("/slow-queries")
+async def get_slow_queries(explain: bool = False, user: dict = Depends(get_current_user)):
+    """Slow-query log counters and the slowest statements, optionally with their EXPLAIN plans (admins only)"""
+    stats = query_log.stats()
+    if explain:
+        # EXPLAIN runs captured statements, with their parameters, against the database
+        require_admin(user)
+        stats["plans"] = await query_log.explain_slowest(engine)
+    return stats
+
+@router.get("/database")
+async def get_database_metrics(user: dict = Depends(get_current_user)):
+    """Connection pool: checkout wait times and timeouts, connections in use and overflow"""
+    return pool_metrics.snapshot(engine)
+
 @router.get("/logs")
 async def get_audit_logs(limit: int = 50, offset: int = 0, db: AsyncSession = Depends(get_db), user: dict = Depends(get_current_user)):
     """Get audit logs for user activity tracking"""
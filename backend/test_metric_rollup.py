@@ -0,0 +1,97 @@
+"""
+Tests for the system metrics downsampling tiers
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.metric_rollup import HOUR, MINUTE, MetricRetention, Series
+from backend.models import Base, MetricRollup, SystemMetrics
+
+NOW = datetime(2026, 10, 19, 12, 0, 30, tzinfo=timezone.utc).timestamp()
+START = NOW - 3 * HOUR
+SOC_COPY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "soc", "apps", "api", "metric_rollup.py")
+
+
+def sample(at, k):
+    # system_metrics stores naive UTC timestamps
+    return {"timestamp": datetime.fromtimestamp(at, timezone.utc).replace(tzinfo=None), "cpu_percent": k * 7 % 100,
+            "memory_percent": k % 50, "active_agents": k % 4, "uptime": float(k), "response_time": 0.5}
+
+
+SAMPLES = [sample(START + 10 * k, k) for k in range(1080)]  # every 10 s for three hours
+
+
+def make_retention(**options):
+    series = Series(SystemMetrics.__table__, SystemMetrics.timestamp,
+                    {"cpu": SystemMetrics.cpu_percent, "memory": SystemMetrics.memory_percent})
+    options = {"raw_retention": HOUR, "minute_retention": 2 * HOUR, "batch_size": 100, "min_points": 30,
+               **options}
+    return MetricRetention(series, MetricRollup, **options)
+
+
+def make_sessions(samples):
+    path = os.path.join(tempfile.mkdtemp(), "system_metrics.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=[SystemMetrics.__table__, MetricRollup.__table__])
+    with engine.begin() as conn:
+        conn.execute(insert(SystemMetrics), samples)
+    return engine, async_sessionmaker(create_async_engine(f"sqlite+aiosqlite:///{path}"), expire_on_commit=False)
+
+
+def stamp(row):
+    return row["timestamp"].replace(tzinfo=timezone.utc).timestamp()
+
+
+def test_the_single_series_rolls_up_and_history_reads_across_tiers():
+    engine, Session = make_sessions(SAMPLES)
+    retention = make_retention()
+
+    async def run():
+        async with Session() as db:
+            done = await retention.run(db, now=NOW)
+            return done, await retention.history(db, "cpu", START, NOW, now=NOW)
+
+    done, (resolution, points) = asyncio.run(run())
+    # Everything before the last complete hour is held by the hour tier, so those samples are gone
+    covered = NOW // HOUR * HOUR - HOUR
+    assert done["raw_deleted"] == sum(1 for s in SAMPLES if stamp(s) < covered)
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(SystemMetrics)) == 1080 - done["raw_deleted"]
+        assert set(conn.scalars(select(MetricRollup.series).distinct())) == {""}
+
+    # Three hours reach past the minute tier: hour buckets, then raw samples not yet rolled up
+    assert resolution == HOUR
+    assert sum(p.count for p in points) == 1080
+    assert sum(p.sum for p in points) == sum(s["cpu_percent"] for s in SAMPLES)
+
+
+def test_a_gap_longer_than_a_day_does_not_stall_the_minute_tier():
+    early = [sample(START - 5 * 86400 + 10 * k, k) for k in range(360)]
+    engine, Session = make_sessions(early + SAMPLES)
+    retention = make_retention(raw_retention=30 * 86400, minute_retention=30 * 86400)
+
+    async def run():
+        async with Session() as db:
+            return [(await retention.run(db, now=NOW))["minute_rows"] for _ in range(3)]
+
+    runs = asyncio.run(run())
+    assert runs[0] > 0 and runs[1] > 0 and runs[2] == 0
+    with engine.connect() as conn:
+        counts = conn.scalars(select(MetricRollup.count)
+                              .where(MetricRollup.resolution == MINUTE, MetricRollup.metric == "cpu")).all()
+    assert sum(counts) == sum(1 for s in early + SAMPLES if stamp(s) < NOW - 90)
+
+
+@pytest.mark.skipif(not os.path.exists(SOC_COPY), reason="built without the SOC API tree")
+def test_module_matches_the_soc_api_copy():
+    # The two apps build from separate Docker contexts, so the module is copied; keep the copies in step
+    with open(SOC_COPY) as soc, open(os.path.join(os.path.dirname(__file__), "metric_rollup.py")) as backend:
+        assert backend.read() == soc.read()
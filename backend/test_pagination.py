@@ -0,0 +1,93 @@
+"""
+Tests for keyset pagination and approximate counts over the anomaly list
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.dialects.postgresql import asyncpg
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend import pagination
+from backend.models import AnomalyDetection, AnomalySeverity, AnomalyType, Base
+from backend.pagination import count_rows, keyset, split_page
+
+START = datetime(2026, 10, 19, 12, 0, 0)
+SEVERITIES = list(AnomalySeverity)
+
+
+@pytest.fixture(scope="module")
+def async_engine():
+    path = os.path.join(tempfile.mkdtemp(), "anomalies.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=[AnomalyDetection.__table__])
+    with engine.begin() as conn:
+        # Two detections per second, so pages end in the middle of a timestamp
+        conn.execute(insert(AnomalyDetection), [
+            {"timestamp": START + timedelta(seconds=n // 2), "type": AnomalyType.cpu_spike,
+             "severity": SEVERITIES[n % 4], "score": 0.9, "description": "seeded", "source": "metrics"}
+            for n in range(1000)])
+    engine.dispose()
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    yield async_engine
+    asyncio.run(async_engine.dispose())
+
+
+def test_pages_cover_every_detection_once_newest_first(async_engine):
+    query = select(AnomalyDetection).where(AnomalyDetection.severity == AnomalySeverity.high)
+
+    async def run():
+        pages, cursor = [], None
+        async with async_sessionmaker(async_engine)() as db:
+            while True:
+                rows = (await db.execute(keyset(query, AnomalyDetection.timestamp, AnomalyDetection.id,
+                                                cursor, 45))).scalars().all()
+                page, cursor = split_page(rows, 45)
+                pages.append([(row.timestamp, row.id) for row in page])
+                if cursor is None:
+                    return pages
+
+    pages = asyncio.run(run())
+    seen = [key for page in pages for key in page]
+    assert len(pages) == 6 and len(seen) == len(set(seen)) == 250
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_approximate_count_stops_at_the_cap(async_engine, monkeypatch):
+    monkeypatch.setattr(pagination, "COUNT_CAP", 300)
+
+    async def run():
+        async with async_sessionmaker(async_engine)() as db:
+            query = select(AnomalyDetection)
+            return (await count_rows(db, query), await count_rows(db, query, approximate=True),
+                    await count_rows(db, query.where(AnomalyDetection.severity == AnomalySeverity.low),
+                                     approximate=True))
+
+    assert asyncio.run(run()) == ((1000, True), (300, False), (250, True))
+
+
+def test_postgres_estimate_binds_enum_filters():
+    query = select(AnomalyDetection).where(AnomalyDetection.severity == AnomalySeverity.critical)
+    executed = []
+
+    class Connection:
+        async def execute(self, statement):
+            executed.append(statement.compile(dialect=asyncpg.dialect()))
+            return type("Result", (), {"scalar": lambda self: [{"Plan": {"Plan Rows": 77}}]})()
+
+    class PostgresSession:
+        bind = type("Bind", (), {"dialect": asyncpg.dialect()})()
+
+        async def connection(self):
+            return Connection()
+
+    assert asyncio.run(count_rows(PostgresSession(), query, approximate=True)) == (77, False)
+    [compiled] = executed
+    assert str(compiled).startswith("EXPLAIN (FORMAT JSON) SELECT") and "critical" not in str(compiled)
+    # The enum goes to the driver as the value the column stores, not as a Python object
+    [(name, value)] = compiled.construct_params().items()
+    assert compiled._bind_processors[name](value) == "critical"
@@ -0,0 +1,61 @@
+"""
+Tests for the async engine's pool settings and checkout metrics
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend.pool_metrics import PoolMetrics
+
+SETTINGS = SimpleNamespace(db_pool_size=1, db_max_overflow=1, db_pool_timeout_seconds=0.2,
+                           db_pool_recycle_seconds=1800, db_pool_pre_ping=True)
+
+
+def test_in_memory_databases_keep_their_single_connection_pool():
+    options = PoolMetrics("test").engine_options("sqlite+aiosqlite://", SETTINGS)
+    assert "pool_size" not in options and options["pool_pre_ping"] is True
+    asyncio.run(create_async_engine("sqlite+aiosqlite://", **options).dispose())
+
+
+def test_contention_shows_as_checkout_wait_overflow_and_timeouts():
+    url = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'pool.db')}"
+    metrics = PoolMetrics("test")
+
+    async def run():
+        engine = create_async_engine(url, **metrics.engine_options(url, SETTINGS))
+        first, second = await engine.connect(), await engine.connect()  # pool_size + max_overflow
+        stats = metrics.snapshot(engine)
+        assert stats["pool"] == "TimedAsyncAdaptedQueuePool"
+        assert stats["in_use"] == 2 and stats["overflow"] == 1
+
+        with pytest.raises(exc.TimeoutError):
+            await engine.connect()
+        assert metrics.counters["timeouts"] == 1
+
+        # A checkout that has to wait for a connection to come back
+        async def release():
+            await asyncio.sleep(0.1)
+            await second.close()
+
+        releasing = asyncio.create_task(release())
+        started = time.perf_counter()
+        async with engine.connect() as third:
+            await third.execute(text("SELECT 1"))
+        waited = time.perf_counter() - started
+        await releasing
+        await first.close()
+        stats = metrics.snapshot(engine)
+        await engine.dispose()
+        return waited, stats
+
+    waited, stats = asyncio.run(run())
+    assert waited >= 0.09
+    assert stats["checkouts"] == 3 and stats["in_use"] == 0
+    assert stats["checkout_wait_ms"]["max"] >= 90
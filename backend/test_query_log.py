@@ -0,0 +1,100 @@
+"""
+Tests for the slow-query log
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend.query_log import QueryLog
+
+
+def slow_engine(query_log):
+    """SQLite engine with a sleep(ms) function, timed by query_log"""
+    engine = create_engine("sqlite://")
+
+    def sleep(ms):
+        time.sleep(ms / 1000)
+        return ms
+
+    @event.listens_for(engine, "connect")
+    def add_sleep(dbapi_connection, record):
+        dbapi_connection.create_function("sleep", 1, sleep)
+
+    query_log.attach(engine)
+    return engine
+
+
+def test_only_statements_over_the_threshold_are_kept():
+    query_log = QueryLog(threshold_ms=20, keep=3)
+    engine = slow_engine(query_log)
+    with engine.connect() as conn:
+        for ms in (0, 25, 1, 40, 30, 35, 2):
+            conn.execute(text(f"SELECT sleep({ms})"))
+
+    stats = query_log.stats()
+    assert (stats["queries"], stats["slow"]) == (7, 4)
+    # A ring of the three slowest, slowest first; 25 ms made way for the 35 ms statement
+    assert [entry["statement"] for entry in stats["slowest"]] == [
+        "SELECT sleep(40)", "SELECT sleep(35)", "SELECT sleep(30)"]
+    assert all(entry["route"] == "background" and entry["explainable"] is False for entry in stats["slowest"])
+    assert all("parameters" not in entry for entry in stats["slowest"])
+
+
+def test_failed_statements_do_not_shift_later_timings():
+    query_log = QueryLog(threshold_ms=20)
+    engine = slow_engine(query_log)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT sleep(30)"))
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+        assert conn.info["query_started"] == []
+        conn.execute(text("SELECT sleep(0)"))
+
+    stats = query_log.stats()
+    assert stats["errors"] == 3 and stats["queries"] == 2
+    assert stats["slow"] == 1  # the fast statement was not timed from a failed one's start
+
+
+def test_explain_uses_the_captured_parameters():
+    path = os.path.join(tempfile.mkdtemp(), "explain.db")
+    with create_engine(f"sqlite:///{path}").begin() as conn:
+        conn.execute(text("CREATE TABLE events (id INTEGER PRIMARY KEY, kind TEXT)"))
+        conn.execute(text("CREATE INDEX ix_events_kind ON events (kind)"))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    query_log = QueryLog(threshold_ms=0, capture_parameters=True)
+    query_log.attach(engine)
+
+    async def run():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT id FROM events WHERE kind = :kind"), {"kind": "login"})
+            await conn.execute(text("UPDATE events SET kind = 'x' WHERE id = 1"))
+        plans = await query_log.explain_slowest(engine, limit=10)
+        await engine.dispose()
+        return plans
+
+    plans = {plan["statement"]: plan["plan"] for plan in asyncio.run(run())}
+    assert any("ix_events_kind" in line for line in plans["SELECT id FROM events WHERE kind = ?"])
+    assert plans["UPDATE events SET kind = 'x' WHERE id = 1"] is None  # only reads are explained
+
+
+def test_explain_is_for_admins_only():
+    pytest.importorskip("jwt")  # the backend's auth dependencies
+    from fastapi import HTTPException
+    from backend.models import RoleEnum, User
+    from backend.routers.metrics import get_slow_queries
+
+    analyst = User(username="analyst", role=RoleEnum.analyst)
+    assert "slowest" in asyncio.run(get_slow_queries(explain=False, user=analyst))
+    with pytest.raises(HTTPException) as denied:
+        asyncio.run(get_slow_queries(explain=True, user=analyst))
+    assert denied.value.status_code == 403
+    admin = User(username="admin", role=RoleEnum.admin)
+    assert "plans" in asyncio.run(get_slow_queries(explain=True, user=admin))
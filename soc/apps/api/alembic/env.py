@@ -22,6 +22,17 @@ if config.config_file_name is not None:
 from models import Base
 target_metadata = Base.metadata
 
+# Shadow tables SQLite creates for the audit log full-text index (migration
+# 005); they have no model, so autogenerate would otherwise drop them
+FTS_TABLE_PREFIX = "audit_logs_fts"
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == "table" and name.startswith(FTS_TABLE_PREFIX):
+        return False
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -44,6 +55,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -67,7 +79,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object
         )
 
         with context.begin_transaction():
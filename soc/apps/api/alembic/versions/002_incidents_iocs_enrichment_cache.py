@@ -0,0 +1,70 @@
+"""incidents, metrics and iocs tables; enrichment cache columns on iocs
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '002'
+down_revision: Union[str, None] = '001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # metrics, incidents and iocs were defined in models.py but never migrated
+    op.create_table('metrics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('cpu_usage', sa.Integer(), nullable=True),
+    sa.Column('memory_usage', sa.Integer(), nullable=True),
+    sa.Column('disk_usage', sa.Integer(), nullable=True),
+    sa.Column('network_rx', sa.Integer(), nullable=True),
+    sa.Column('network_tx', sa.Integer(), nullable=True),
+    sa.Column('active_connections', sa.Integer(), nullable=True),
+    sa.Column('alerts_count', sa.Integer(), nullable=True),
+    sa.Column('tool_name', sa.String(), nullable=True),
+    sa.Column('tool_status', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('incidents',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('severity', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('assigned_to', sa.String(), nullable=True),
+    sa.Column('tags', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('iocs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.String(), nullable=True),
+    sa.Column('value', sa.String(), nullable=True),
+    sa.Column('severity', sa.String(), nullable=True),
+    sa.Column('source', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('last_seen', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('confidence', sa.Integer(), nullable=True),
+    sa.Column('tags', sa.String(), nullable=True),
+    sa.Column('verdict', sa.String(), nullable=True),
+    sa.Column('details', sa.Text(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('iocs')
+    op.drop_table('incidents')
+    op.drop_table('metrics')
@@ -0,0 +1,43 @@
+"""indexes for the audit log, incident, metric and IOC query paths
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns)
+INDEXES = [
+    ('ix_audit_logs_created_at', 'audit_logs', ['created_at']),
+    ('ix_audit_logs_action_created_at', 'audit_logs', ['action', 'created_at']),
+    ('ix_audit_logs_user_sub_created_at', 'audit_logs', ['user_sub', 'created_at']),
+    ('ix_incidents_created_at', 'incidents', ['created_at']),
+    ('ix_incidents_status_created_at', 'incidents', ['status', 'created_at']),
+    ('ix_incidents_severity_created_at', 'incidents', ['severity', 'created_at']),
+    ('ix_metrics_timestamp', 'metrics', ['timestamp']),
+    ('ix_metrics_tool_name_timestamp', 'metrics', ['tool_name', 'timestamp']),
+    ('ix_iocs_type_value', 'iocs', ['type', 'value']),
+]
+
+
+def upgrade() -> None:
+    # Built without locking out writes on PostgreSQL, which cannot do that inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,67 @@
+"""full-text search index on audit_logs
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same objects as audit_search.POSTGRESQL_DDL / SQLITE_DDL at the time of this revision
+POSTGRESQL_UPGRADE = [
+    "ALTER TABLE audit_logs ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS "
+    "(to_tsvector('simple', coalesce(action, '') || ' ' || coalesce(resource, '') || ' ' || "
+    "coalesce(details, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_audit_logs_search_vector ON audit_logs USING GIN (search_vector)",
+]
+POSTGRESQL_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_audit_logs_search_vector",
+    "ALTER TABLE audit_logs DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS audit_logs_fts USING fts5(action, resource, details, "
+    "content='audit_logs', content_rowid='id', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS audit_logs_fts_insert AFTER INSERT ON audit_logs BEGIN "
+    "INSERT INTO audit_logs_fts(rowid, action, resource, details) "
+    "VALUES (new.id, new.action, new.resource, new.details); END",
+    "CREATE TRIGGER IF NOT EXISTS audit_logs_fts_delete AFTER DELETE ON audit_logs BEGIN "
+    "INSERT INTO audit_logs_fts(audit_logs_fts, rowid, action, resource, details) "
+    "VALUES ('delete', old.id, old.action, old.resource, old.details); END",
+    "CREATE TRIGGER IF NOT EXISTS audit_logs_fts_update AFTER UPDATE ON audit_logs BEGIN "
+    "INSERT INTO audit_logs_fts(audit_logs_fts, rowid, action, resource, details) "
+    "VALUES ('delete', old.id, old.action, old.resource, old.details); "
+    "INSERT INTO audit_logs_fts(rowid, action, resource, details) "
+    "VALUES (new.id, new.action, new.resource, new.details); END",
+    # Index the entries written before this revision
+    "INSERT INTO audit_logs_fts(audit_logs_fts) VALUES ('rebuild')",
+]
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS audit_logs_fts_update",
+    "DROP TRIGGER IF EXISTS audit_logs_fts_delete",
+    "DROP TRIGGER IF EXISTS audit_logs_fts_insert",
+    "DROP TABLE IF EXISTS audit_logs_fts",
+]
+
+
+def _run(statements: dict) -> None:
+    for statement in statements.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    # On PostgreSQL the generated column is computed for existing rows as it is added
+    _run({"postgresql": POSTGRESQL_UPGRADE, "sqlite": SQLITE_UPGRADE})
+
+
+def downgrade() -> None:
+    _run({"postgresql": POSTGRESQL_DOWNGRADE, "sqlite": SQLITE_DOWNGRADE})
@@ -0,0 +1,102 @@
+"""daily audit log rollups maintained by triggers
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same objects as audit_rollup.POSTGRESQL_DDL / SQLITE_DDL at the time of this revision
+POSTGRESQL_UPGRADE = [
+    """CREATE OR REPLACE FUNCTION audit_rollups_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        INSERT INTO audit_rollups (day, action, user_sub, count)
+        SELECT (created_at AT TIME ZONE 'UTC')::date, coalesce(action, ''), coalesce(user_sub, ''), -count(*)
+        FROM old_rows GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+        ON CONFLICT (day, action, user_sub) DO UPDATE SET count = audit_rollups.count + EXCLUDED.count;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO audit_rollups (day, action, user_sub, count)
+        SELECT (created_at AT TIME ZONE 'UTC')::date, coalesce(action, ''), coalesce(user_sub, ''), count(*)
+        FROM new_rows GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+        ON CONFLICT (day, action, user_sub) DO UPDATE SET count = audit_rollups.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END $$""",
+    "CREATE TRIGGER audit_rollups_insert AFTER INSERT ON audit_logs REFERENCING NEW TABLE AS new_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION audit_rollups_apply()",
+    "CREATE TRIGGER audit_rollups_delete AFTER DELETE ON audit_logs REFERENCING OLD TABLE AS old_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION audit_rollups_apply()",
+    "CREATE TRIGGER audit_rollups_update AFTER UPDATE ON audit_logs "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION audit_rollups_apply()",
+    # Count the entries written before this revision. CREATE TRIGGER has locked out
+    # writers until the migration commits, so none are counted twice or missed.
+    "INSERT INTO audit_rollups (day, action, user_sub, count) "
+    "SELECT (created_at AT TIME ZONE 'UTC')::date, coalesce(action, ''), coalesce(user_sub, ''), count(*) "
+    "FROM audit_logs GROUP BY 1, 2, 3",
+]
+POSTGRESQL_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS audit_rollups_update ON audit_logs",
+    "DROP TRIGGER IF EXISTS audit_rollups_delete ON audit_logs",
+    "DROP TRIGGER IF EXISTS audit_rollups_insert ON audit_logs",
+    "DROP FUNCTION IF EXISTS audit_rollups_apply()",
+]
+
+SQLITE_ADD = (
+    "INSERT INTO audit_rollups (day, action, user_sub, count) "
+    "VALUES (date(new.created_at), coalesce(new.action, ''), coalesce(new.user_sub, ''), 1) "
+    "ON CONFLICT (day, action, user_sub) DO UPDATE SET count = count + 1; "
+)
+SQLITE_REMOVE = (
+    "UPDATE audit_rollups SET count = count - 1 WHERE day = date(old.created_at) "
+    "AND action = coalesce(old.action, '') AND user_sub = coalesce(old.user_sub, ''); "
+)
+SQLITE_UPGRADE = [
+    f"CREATE TRIGGER IF NOT EXISTS audit_rollups_insert AFTER INSERT ON audit_logs BEGIN {SQLITE_ADD}END",
+    f"CREATE TRIGGER IF NOT EXISTS audit_rollups_delete AFTER DELETE ON audit_logs BEGIN {SQLITE_REMOVE}END",
+    f"CREATE TRIGGER IF NOT EXISTS audit_rollups_update AFTER UPDATE OF created_at, action, user_sub "
+    f"ON audit_logs BEGIN {SQLITE_REMOVE}{SQLITE_ADD}END",
+    "INSERT INTO audit_rollups (day, action, user_sub, count) "
+    "SELECT date(created_at), coalesce(action, ''), coalesce(user_sub, ''), count(*) "
+    "FROM audit_logs GROUP BY 1, 2, 3",
+]
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS audit_rollups_update",
+    "DROP TRIGGER IF EXISTS audit_rollups_delete",
+    "DROP TRIGGER IF EXISTS audit_rollups_insert",
+]
+
+
+def _run(statements: dict) -> None:
+    for statement in statements.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    op.create_table('audit_rollups',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('action', sa.String(), nullable=False),
+    sa.Column('user_sub', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'action', 'user_sub'),
+    sqlite_with_rowid=False
+    )
+    _run({"postgresql": POSTGRESQL_UPGRADE, "sqlite": SQLITE_UPGRADE})
+
+
+def downgrade() -> None:
+    _run({"postgresql": POSTGRESQL_DOWNGRADE, "sqlite": SQLITE_DOWNGRADE})
+    op.drop_table('audit_rollups')
@@ -0,0 +1,40 @@
+"""minute and hour aggregates of the metrics table
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filled from the existing samples by the first metric rollup run
+    op.create_table('metric_rollups',
+    sa.Column('resolution', sa.Integer(), nullable=False),
+    sa.Column('series', sa.String(), nullable=False),
+    sa.Column('metric', sa.String(), nullable=False),
+    sa.Column('bucket', sa.BigInteger(), nullable=False),
+    sa.Column('min', sa.Float(), nullable=True),
+    sa.Column('max', sa.Float(), nullable=True),
+    sa.Column('sum', sa.Float(), nullable=True),
+    sa.Column('count', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('resolution', 'series', 'metric', 'bucket'),
+    sqlite_with_rowid=False
+    )
+    op.create_index('ix_metric_rollups_resolution_bucket', 'metric_rollups', ['resolution', 'bucket'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_metric_rollups_resolution_bucket', table_name='metric_rollups')
+    op.drop_table('metric_rollups')
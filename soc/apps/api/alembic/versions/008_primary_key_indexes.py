@@ -0,0 +1,29 @@
+"""id indexes the models declare on the audit, incident, metric and IOC tables
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '008'
+down_revision: Union[str, None] = '007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ['audit_logs', 'incidents', 'metrics', 'iocs']
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.create_index(op.f(f'ix_{table}_id'), table, ['id'], unique=False)
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.drop_index(op.f(f'ix_{table}_id'), table_name=table)
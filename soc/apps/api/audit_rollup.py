@@ -0,0 +1,77 @@
+"""
+Daily audit log rollups
+
+The audit summary (counts per action, per user and per day) used to run
+three GROUP BY scans over up to 90 days of audit_logs on every request.
+audit_rollups holds one count per (day, action, user_sub) instead, kept
+current by triggers on audit_logs so every writer is covered: ORM adds, bulk
+Core inserts, updates and deletes alike. The summary reads at most a few
+thousand rollup rows however many entries were written.
+
+- PostgreSQL: statement-level triggers with transition tables, so a bulk
+  insert applies one upsert per key rather than one per entry. Keys are
+  upserted in order to keep concurrent writers from deadlocking.
+- SQLite (local runs): row-level triggers.
+
+Days are UTC calendar days; a missing action or user is counted under ''.
+Migration 006 creates the same objects on existing databases and backfills
+the counts.
+"""
+
+from sqlalchemy import DDL, event
+
+POSTGRESQL_DDL = [
+    """CREATE OR REPLACE FUNCTION audit_rollups_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        INSERT INTO audit_rollups (day, action, user_sub, count)
+        SELECT (created_at AT TIME ZONE 'UTC')::date, coalesce(action, ''), coalesce(user_sub, ''), -count(*)
+        FROM old_rows GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+        ON CONFLICT (day, action, user_sub) DO UPDATE SET count = audit_rollups.count + EXCLUDED.count;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO audit_rollups (day, action, user_sub, count)
+        SELECT (created_at AT TIME ZONE 'UTC')::date, coalesce(action, ''), coalesce(user_sub, ''), count(*)
+        FROM new_rows GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+        ON CONFLICT (day, action, user_sub) DO UPDATE SET count = audit_rollups.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END $$""",
+    "CREATE TRIGGER audit_rollups_insert AFTER INSERT ON audit_logs REFERENCING NEW TABLE AS new_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION audit_rollups_apply()",
+    "CREATE TRIGGER audit_rollups_delete AFTER DELETE ON audit_logs REFERENCING OLD TABLE AS old_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION audit_rollups_apply()",
+    "CREATE TRIGGER audit_rollups_update AFTER UPDATE ON audit_logs "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION audit_rollups_apply()",
+]
+
+_SQLITE_ADD = (
+    "INSERT INTO audit_rollups (day, action, user_sub, count) "
+    "VALUES (date(new.created_at), coalesce(new.action, ''), coalesce(new.user_sub, ''), 1) "
+    "ON CONFLICT (day, action, user_sub) DO UPDATE SET count = count + 1; "
+)
+_SQLITE_REMOVE = (
+    "UPDATE audit_rollups SET count = count - 1 WHERE day = date(old.created_at) "
+    "AND action = coalesce(old.action, '') AND user_sub = coalesce(old.user_sub, ''); "
+)
+
+SQLITE_DDL = [
+    f"CREATE TRIGGER IF NOT EXISTS audit_rollups_insert AFTER INSERT ON audit_logs BEGIN {_SQLITE_ADD}END",
+    f"CREATE TRIGGER IF NOT EXISTS audit_rollups_delete AFTER DELETE ON audit_logs BEGIN {_SQLITE_REMOVE}END",
+    f"CREATE TRIGGER IF NOT EXISTS audit_rollups_update AFTER UPDATE OF created_at, action, user_sub "
+    f"ON audit_logs BEGIN {_SQLITE_REMOVE}{_SQLITE_ADD}END",
+]
+
+def attach(audit_rollups_table, audit_logs_table) -> None:
+    """Create the triggers along with the rollup table (metadata.create_all)
+
+    Databases created with audit_logs alone get no triggers, and so no
+    writes to a table they do not have.
+    """
+    audit_rollups_table.add_is_dependent_on(audit_logs_table)
+    for statement in POSTGRESQL_DDL:
+        event.listen(audit_rollups_table, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+    for statement in SQLITE_DDL:
+        event.listen(audit_rollups_table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
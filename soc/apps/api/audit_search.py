@@ -0,0 +1,117 @@
+"""
+Full-text search over audit log entries
+
+The search box on the audit log page used to run ILIKE '%term%' over three
+columns, a full table scan per keystroke. Entries are now indexed by the
+database as they are written:
+
+- PostgreSQL: a stored generated tsvector column over action, resource and
+  details, with a GIN index.
+- SQLite (local runs): an external-content FTS5 table kept in step with
+  audit_logs by triggers.
+
+Search terms become prefix queries (every word must match the start of a
+token, so "fleet" finds block_hash_fleetdm) and results are ranked by
+relevance, newest first among equals. Scoring every match of a common word
+costs more than the lookup itself (bm25 over 200k of 1M rows: ~400 ms
+against ~10 ms), so match sets larger than RANK_LIMIT are listed newest
+first instead. Other databases fall back to ILIKE. Migration 005 creates
+the same objects on existing databases.
+"""
+
+import re
+from typing import List
+
+from sqlalchemy import DDL, column, desc, event, func, literal_column, or_, table
+from sqlalchemy.sql import Select
+
+FTS_TABLE = "audit_logs_fts"
+SEARCH_VECTOR = "search_vector"
+TS_CONFIG = "simple"  # no stemming or stop words: actions, hashes and hostnames are not prose
+RANK_LIMIT = 5000  # rank by relevance up to this many matches
+
+POSTGRESQL_DDL = [
+    f"ALTER TABLE audit_logs ADD COLUMN IF NOT EXISTS {SEARCH_VECTOR} tsvector GENERATED ALWAYS AS "
+    f"(to_tsvector('{TS_CONFIG}', coalesce(action, '') || ' ' || coalesce(resource, '') || ' ' || "
+    f"coalesce(details, ''))) STORED",
+    f"CREATE INDEX IF NOT EXISTS ix_audit_logs_search_vector ON audit_logs USING GIN ({SEARCH_VECTOR})",
+]
+
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(action, resource, details, "
+    f"content='audit_logs', content_rowid='id', prefix='2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS audit_logs_fts_insert AFTER INSERT ON audit_logs BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, action, resource, details) "
+    f"VALUES (new.id, new.action, new.resource, new.details); END",
+    f"CREATE TRIGGER IF NOT EXISTS audit_logs_fts_delete AFTER DELETE ON audit_logs BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, action, resource, details) "
+    f"VALUES ('delete', old.id, old.action, old.resource, old.details); END",
+    f"CREATE TRIGGER IF NOT EXISTS audit_logs_fts_update AFTER UPDATE ON audit_logs BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, action, resource, details) "
+    f"VALUES ('delete', old.id, old.action, old.resource, old.details); "
+    f"INSERT INTO {FTS_TABLE}(rowid, action, resource, details) "
+    f"VALUES (new.id, new.action, new.resource, new.details); END",
+]
+
+_fts = table(FTS_TABLE, column("rowid"), column("rank"))
+_words = re.compile(r"[^\W_]+")
+
+
+def attach(audit_logs_table) -> None:
+    """Create the search index along with the table (metadata.create_all)"""
+    for statement in POSTGRESQL_DDL:
+        event.listen(audit_logs_table, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+    for statement in SQLITE_DDL:
+        event.listen(audit_logs_table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+
+def search_terms(term: str) -> List[str]:
+    """Words of a search box entry; punctuation and underscores only separate them"""
+    return _words.findall(term.lower())
+
+
+def _match(words: List[str]) -> str:
+    return " AND ".join(f'"{word}"*' for word in words)
+
+
+def _tsquery(words: List[str]):
+    return func.to_tsquery(TS_CONFIG, " & ".join(f"{word}:*" for word in words))
+
+
+def apply_search(query: Select, audit_log, dialect: str, term: str) -> Select:
+    """Restrict `query` to entries matching `term`"""
+    words = search_terms(term)
+    if not words:
+        return query
+
+    if dialect == "postgresql":
+        return query.where(literal_column(f"audit_logs.{SEARCH_VECTOR}").op("@@")(_tsquery(words)))
+
+    if dialect == "sqlite":
+        return query.join(_fts, _fts.c.rowid == audit_log.id).where(literal_column(FTS_TABLE).op("MATCH")(_match(words)))
+
+    pattern = f"%{term}%"
+    return query.where(or_(audit_log.action.ilike(pattern), audit_log.resource.ilike(pattern),
+                           audit_log.details.ilike(pattern)))
+
+
+def search_order(audit_log, dialect: str, term: str, rank: bool = True) -> list:
+    """ORDER BY clauses for a query passed through apply_search
+
+    With rank=False, for match sets over RANK_LIMIT, matches are listed newest first.
+    """
+    words = search_terms(term)
+    newest = desc(audit_log.created_at)
+    if not words:
+        return [newest]
+
+    if dialect == "postgresql":
+        vector = literal_column(f"audit_logs.{SEARCH_VECTOR}")
+        return [desc(func.ts_rank(vector, _tsquery(words))), newest] if rank else [newest]
+
+    if dialect == "sqlite":
+        # FTS5's rank is bm25(), lower is more relevant. Unranked, walking the index
+        # by rowid (= id, insertion order) avoids sorting the whole match set.
+        return [_fts.c.rank, newest] if rank else [desc(_fts.c.rowid)]
+
+    return [newest]
@@ -1,34 +1,42 @@
+import functools
+import inspect
+import time
 import httpx
 from fastapi import HTTPException, Request
 from jose import jwt, JWTError
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import serialization
 import json
 from typing import Dict, List
 from config import settings
 
 
 class JWTMiddleware:
+    # Least time between refetches triggered by unknown key ids, so forged
+    # tokens cannot make every request call Keycloak
+    refetch_interval = 30.0
+
     def __init__(self):
         self.jwks = {}
+        self._loaded_at = 0.0
         self._load_jwks()
 
     def _load_jwks(self):
+        self._loaded_at = time.monotonic()
         try:
-            response = httpx.get(f"{settings.oidc_issuer}/.well-known/jwks_uri")
+            response = httpx.get(f"{settings.oidc_issuer}/.well-known/openid-configuration")
             jwks_uri = response.json()["jwks_uri"]
             jwks_response = httpx.get(jwks_uri)
             self.jwks = jwks_response.json()
         except Exception as e:
             print(f"Failed to load JWKS: {e}")
 
-    def get_public_key(self, kid: str):
-        for key in self.jwks.get("keys", []):
-            if key["kid"] == kid:
-                return serialization.load_pem_public_key(
-                    f'-----BEGIN PUBLIC KEY-----\n{key["n"]}\n-----END PUBLIC KEY-----'.encode(),
-                    backend=default_backend()
-                )
+    def get_public_key(self, kid: str) -> Dict:
+        """JWK for a key id; the key set is refetched once for an unknown id (key rotation)"""
+        for attempt in range(2):
+            for key in self.jwks.get("keys", []):
+                if key["kid"] == kid:
+                    return key
+            if attempt == 0 and time.monotonic() - self._loaded_at >= self.refetch_interval:
+                self._load_jwks()
         raise ValueError("Public key not found")
 
     def validate_token(self, token: str) -> Dict:
@@ -38,7 +46,7 @@ class JWTMiddleware:
             public_key = self.get_public_key(kid)
             payload = jwt.decode(token, public_key, algorithms=["RS256"], audience=settings.oidc_audience)
             return payload
-        except JWTError as e:
+        except (JWTError, KeyError, ValueError) as e:
             raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
 
 
@@ -46,18 +54,33 @@ jwt_middleware = JWTMiddleware()
 
 
 def get_current_user(request: Request) -> Dict:
+    # Validated once per request, even when both requires_roles and the endpoint ask
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
+
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid token")
 
     token = auth_header.split(" ")[1]
-    return jwt_middleware.validate_token(token)
+    user = jwt_middleware.validate_token(token)
+    request.state.user = user
+    return user
 
 
 def requires_roles(required_roles: List[str]):
     def decorator(func):
-        def wrapper(*args, **kwargs):
-            request = kwargs.get('request')
+        signature = inspect.signature(func)
+        request_name = next((name for name, param in signature.parameters.items()
+                             if param.annotation is Request), None)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if request_name is None:
+                request = kwargs.pop("roles_request")
+            else:
+                request = kwargs.get(request_name)
             if not request:
                 raise HTTPException(status_code=500, detail="Request object not found")
 
@@ -66,6 +89,14 @@ def requires_roles(required_roles: List[str]):
             if not any(role in user_roles for role in required_roles):
                 raise HTTPException(status_code=403, detail="Insufficient permissions")
 
-            return func(*args, **kwargs)
+            result = func(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+
+        if request_name is None:
+            # Have FastAPI pass the request to the wrapper for endpoints that don't take one
+            extra = inspect.Parameter("roles_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+            wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), extra])
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for bulk NDJSON alert ingestion
+
+Streams a gzip-compressed NDJSON body through the decoder, correlation and
+batched case creation against a scratch SQLite database, the same path as
+POST /api/incidents/from-alerts/bulk minus the HTTP layer.
+
+Usage:
+    python benchmarks/bench_bulk_ingest.py                       # 200k alerts
+    python benchmarks/bench_bulk_ingest.py --alerts 50000 --batch-size 500
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OIDC_ISSUER", "http://127.0.0.1:9/realms/cyberblue")
+os.environ.setdefault("OIDC_AUDIENCE", "cyberblue-soc-api")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import datagen  # noqa: E402
+from ingest import NDJSONDecoder, alert_batches  # noqa: E402
+from models import AuditLog, Base, Incident  # noqa: E402
+from routers import incidents  # noqa: E402
+
+
+async def body_chunks(body: bytes, size: int):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+async def ingest(body: bytes, db, batch_size: int, chunk_size: int):
+    decoder = NDJSONDecoder()
+    created = correlated = 0
+    async for batch in alert_batches(body_chunks(body, chunk_size), decoder, batch_size):
+        results = await incidents.open_cases_for_alerts(batch, db, "bench", "127.0.0.1")
+        opened = sum(1 for result in results if not result.correlated)
+        created += opened
+        correlated += len(results) - opened
+    # Include the similarity indexing that trails the last batch
+    await asyncio.gather(*incidents._indexing_tasks)
+    return decoder.stats.alerts, created, correlated
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure bulk alert ingestion throughput")
+    parser.add_argument("--alerts", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--chunk-size", type=int, default=64 * 1024, help="bytes per body chunk")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    frame = datagen.alerts_frame(args.alerts, seed=args.seed)
+    ndjson = "\n".join(json.dumps(alert) for alert in datagen.alert_documents(frame)).encode()
+    body = gzip.compress(ndjson, compresslevel=6)
+    print(f"body: {len(ndjson) / 1e6:.1f} MB NDJSON, {len(body) / 1e6:.1f} MB gzip")
+
+    started = time.perf_counter()
+    decoder = NDJSONDecoder()
+    decoded = len(decoder.feed(body)) + len(decoder.close())
+    parse = time.perf_counter() - started
+    print(f"decode only: {decoded:,} alerts in {parse:.2f}s ({decoded / parse:,.0f}/s)")
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[Incident.__table__, AuditLog.__table__])
+    db = sessionmaker(bind=engine)()
+
+    started = time.perf_counter()
+    received, created, correlated = asyncio.run(ingest(body, db, args.batch_size, args.chunk_size))
+    elapsed = time.perf_counter() - started
+    db.close()
+    print(f"ingest: {received:,} alerts in {elapsed:.2f}s ({received / elapsed:,.0f}/s); "
+          f"{created:,} incidents, {correlated:,} correlated")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
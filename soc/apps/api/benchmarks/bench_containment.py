@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark for batched FleetDM containment against the local FleetDM stand-in
+
+Simulates an outbreak: playbook runs arrive at a steady rate, each blocking the
+file hashes of one hash-carrying alert from the seeded datagen alert stream
+(so indicators recur across runs as they do in an outbreak), and compares one
+policy per hash with the batched policy updates.
+
+Usage:
+    python benchmarks/bench_containment.py
+    python benchmarks/bench_containment.py --runs 2000 --rate 500 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OIDC_ISSUER", "http://127.0.0.1:9/realms/cyberblue")
+os.environ.setdefault("OIDC_AUDIENCE", "cyberblue-soc-api")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import datagen  # noqa: E402
+from containment import ContainmentBatcher, FleetDMClient, blocklist_query  # noqa: E402
+from standins import FleetDMStandIn  # noqa: E402
+
+
+def alert_hashes(runs, seed):
+    """File hashes of the first `runs` hash-carrying alerts of the seeded alert stream"""
+    frame = datagen.alerts_frame(runs * 5, seed=seed)
+    hashes = [[alert["syscheck"]["md5_after"], alert["syscheck"]["sha256_after"]]
+              for alert in datagen.alert_documents(frame) if "syscheck" in alert]
+    if len(hashes) < runs:
+        raise SystemExit(f"only {len(hashes)} of {runs * 5} generated alerts carry hashes")
+    return hashes[:runs]
+
+
+async def outbreak(batcher, runs, rate):
+    latencies = []
+
+    async def playbook_run(hashes):
+        started = time.perf_counter()
+        await asyncio.gather(*(batcher.submit(h) for h in hashes))
+        latencies.append(time.perf_counter() - started)
+
+    tasks = []
+    for hashes in runs:
+        tasks.append(asyncio.create_task(playbook_run(hashes)))
+        await asyncio.sleep(1 / rate)
+    await asyncio.gather(*tasks)
+    latencies.sort()
+    return latencies
+
+
+def bench(label, max_batch, window, runs, args):
+    with FleetDMStandIn(latency=args.latency) as fleet:
+        client = FleetDMClient(fleet.base_url, "token", concurrency=args.concurrency)
+
+        async def send(hashes):
+            return await client.create_policy("blocklist", blocklist_query(hashes), "", "")
+
+        batcher = ContainmentBatcher("fleetdm", send, max_batch=max_batch, window=window)
+
+        async def run():
+            started = time.perf_counter()
+            latencies = await outbreak(batcher, runs, args.rate)
+            elapsed = time.perf_counter() - started
+            await client.aclose()
+            return elapsed, latencies
+
+        elapsed, latencies = asyncio.run(run())
+        calls = len(fleet.calls)
+
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{label:<24} {calls:>6} policy calls  {elapsed:6.2f}s  "
+          f"block latency p50 {p50:7.1f} ms  p99 {p99:7.1f} ms")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare per-hash and batched FleetDM policy updates")
+    parser.add_argument("--runs", type=int, default=500, help="playbook runs")
+    parser.add_argument("--rate", type=float, default=250, help="playbook runs started per second")
+    parser.add_argument("--latency", type=float, default=0.02, help="FleetDM response time in seconds")
+    parser.add_argument("--concurrency", type=int, default=2, help="connections to FleetDM")
+    parser.add_argument("--seed", type=int, default=42, help="datagen seed")
+    args = parser.parse_args()
+
+    runs = alert_hashes(args.runs, args.seed)
+    print(f"{len(runs)} playbook runs, {len({h for hashes in runs for h in hashes})} distinct hashes")
+    bench("one policy per hash", 1, 0.0, runs, args)
+    bench("batched (500 ms / 100)", 100, 0.5, runs, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the synthetic SOC dataset generator
+
+Usage:
+    python benchmarks/bench_datagen.py                 # 1M rows per dataset
+    python benchmarks/bench_datagen.py --rows 5000000 --datasets alerts incidents
+    python benchmarks/bench_datagen.py --rows 200000 --load sqlite:////tmp/soc-bench.db
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datagen  # noqa: E402
+
+# Tables for --load, imported lazily because models pulls in the app settings
+TABLES = {
+    'incidents': 'Incident',
+    'audit_logs': 'AuditLog',
+    'metrics': 'Metric',
+}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure synthetic data generation throughput")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--datasets", nargs="*", default=list(datagen.GENERATORS))
+    parser.add_argument("--arrow", action="store_true", help="also time conversion to Arrow batches")
+    parser.add_argument("--load", metavar="DATABASE_URL", help="also time bulk loading into this database")
+    args = parser.parse_args()
+
+    engine = None
+    if args.load:
+        os.environ.setdefault("DATABASE_URL", args.load)
+        os.environ.setdefault("OIDC_ISSUER", "http://localhost")
+        os.environ.setdefault("OIDC_AUDIENCE", "bench")
+        from sqlalchemy import create_engine
+        import models
+        engine = create_engine(args.load)
+        models.Base.metadata.create_all(engine)
+
+    print(f"{'dataset':<16}{'rows':>12}{'seconds':>10}{'rows/s':>14}")
+    for name in args.datasets:
+        started = time.perf_counter()
+        frame = datagen.GENERATORS[name](args.rows, seed=args.seed)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<16}{len(frame):>12,}{elapsed:>10.2f}{len(frame) / elapsed:>14,.0f}")
+
+        if args.arrow:
+            started = time.perf_counter()
+            batches = datagen.to_arrow_batches(frame)
+            print(f"  -> arrow: {len(batches)} batches in {time.perf_counter() - started:.2f}s")
+
+        if engine is not None and name in TABLES:
+            import models
+            started = time.perf_counter()
+            with engine.begin() as conn:
+                datagen.bulk_load(conn, getattr(models, TABLES[name]), frame)
+            elapsed = time.perf_counter() - started
+            print(f"  -> bulk load: {elapsed:.2f}s ({len(frame) / elapsed:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
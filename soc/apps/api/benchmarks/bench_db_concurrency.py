@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark for request handling on blocking vs asyncio database sessions
+
+Serves the same incident listing two ways from one app: through a blocking
+Session on the event loop (how the routers used to query) and through the
+AsyncSession that get_db() now yields. Concurrent clients hit one variant at
+a time while a probe measures /health, which shows whether the loop stays
+responsive. Database round-trip time is simulated with a SQL function that
+sleeps inside the driver, so it lands where a PostgreSQL round trip would:
+in the calling thread for the blocking driver, in aiosqlite's thread for the
+async one. The incidents are the seeded datagen incident set.
+
+Usage:
+    python benchmarks/bench_db_concurrency.py
+    python benchmarks/bench_db_concurrency.py --requests 2000 --concurrency 50 --db-latency 0.005
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OIDC_ISSUER", "http://127.0.0.1:9/realms/cyberblue")
+os.environ.setdefault("OIDC_AUDIENCE", "cyberblue-soc-api")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'concurrency.db')}"
+
+from sqlalchemy import event, func, select  # noqa: E402
+
+import datagen  # noqa: E402
+from database import SessionLocal, async_engine, engine, get_db  # noqa: E402
+from models import Base, Incident  # noqa: E402
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def simulate_round_trips(latency):
+    """Register db_latency() on every connection of both engines; it sleeps in the driver's thread"""
+
+    def register(dbapi_connection, _):
+        dbapi_connection.create_function("db_latency", 0, lambda: time.sleep(latency))
+
+    event.listen(engine, "connect", register)
+    event.listen(async_engine.sync_engine, "connect", register)
+
+
+ROUND_TRIP = select(func.db_latency())
+
+
+def listing(limit):
+    return select(Incident).order_by(Incident.created_at.desc()).limit(limit)
+
+
+def build_app(limit):
+    from fastapi import Depends, FastAPI
+
+    app = FastAPI()
+
+    @app.get("/blocking/incidents")
+    async def blocking_incidents():
+        db = SessionLocal()
+        try:
+            db.execute(ROUND_TRIP)
+            return [inc.id for inc in db.execute(listing(limit)).scalars()]
+        finally:
+            db.close()
+
+    @app.get("/async/incidents")
+    async def async_incidents(db=Depends(get_db)):
+        await db.execute(ROUND_TRIP)
+        return [inc.id for inc in (await db.execute(listing(limit))).scalars()]
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+async def run(app, path, args):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, probes = [], []
+    loaded = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def request():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        async def probe():
+            # Timed from when the probe was due, so time spent waiting for a blocked loop counts
+            while not loaded.is_set():
+                due = time.perf_counter() + 0.01
+                await asyncio.sleep(0.01)
+                await client.get("/health")
+                probes.append(time.perf_counter() - due)
+
+        await client.get(path)  # open the pool's first connection outside the measurement
+        prober = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(request() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - started
+        loaded.set()
+        await prober
+    return elapsed, sorted(latencies), sorted(probes)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare blocking and asyncio database sessions under load")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent clients")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="simulated round trip in seconds")
+    parser.add_argument("--rows", type=int, default=5000, help="incidents in the table")
+    parser.add_argument("--limit", type=int, default=50, help="incidents per listing")
+    parser.add_argument("--seed", type=int, default=42, help="datagen seed")
+    args = parser.parse_args()
+
+    simulate_round_trips(args.db_latency)
+    Base.metadata.create_all(engine, tables=[Incident.__table__])
+    with engine.begin() as conn:
+        datagen.bulk_load(conn, Incident, datagen.incidents_frame(args.rows, seed=args.seed))
+    app = build_app(args.limit)
+
+    print(f"{args.requests} listings, {args.concurrency} clients, "
+          f"{args.db_latency * 1000:.1f} ms simulated round trip")
+    for label, path in (("blocking Session", "/blocking/incidents"), ("AsyncSession", "/async/incidents")):
+        elapsed, latencies, probes = asyncio.run(run(app, path, args))
+        print(f"{label:<17} {args.requests / elapsed:7.1f} req/s  "
+              f"p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  "
+              f"/health under load p99 {percentile(probes, 0.99) * 1000:7.1f} ms")
+    asyncio.run(async_engine.dispose())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for IOC extraction over whole alert documents
+
+Compares the single-pass IOCExtractor against the previous fixed-path hash
+lookup (which recompiled its pattern on every call and only saw four fields).
+
+Usage:
+    python benchmarks/bench_ioc_extract.py
+    python benchmarks/bench_ioc_extract.py --alerts 200000
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datagen  # noqa: E402
+from ioc_extract import IOCExtractor  # noqa: E402
+
+HINTS = {
+    "syscheck.md5_after": "md5", "syscheck.sha1_after": "sha1", "syscheck.sha256_after": "sha256",
+    "data.srcip": "ip", "data.dstip": "ip", "data.url": "url", "data.hostname": "domain",
+}
+IGNORE = ["id", "timestamp", "agent.ip", "manager.name", "decoder.name", "location", "rule.groups"]
+
+
+def previous_extract_hashes(alert_data):
+    hashes = []
+    for path in ["syscheck.md5", "syscheck.sha256", "data.md5", "data.sha256"]:
+        value = alert_data
+        for key in path.split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+        if value and re.match(r'^[a-fA-F0-9]{32}|[a-fA-F0-9]{64}$', value):
+            hashes.append(value)
+    return hashes
+
+
+def with_logs(alerts):
+    """Add the free-text fields real Wazuh alerts carry"""
+    for n, alert in enumerate(alerts):
+        alert["full_log"] = (
+            f"{alert['timestamp']} {alert['agent']['name']} sshd[{1000 + n}]: Failed password for invalid user "
+            f"admin from {alert['data']['srcip']} port {40000 + n % 20000} ssh2; fetched "
+            f"http://cdn{n % 50}.example-bad.net/stage2.bin (version 10.0.19041.{n % 9})"
+        )
+        alert["manager"] = {"name": "wazuh-manager"}
+        alert["decoder"] = {"name": "sshd"}
+        alert["rule"]["groups"] = ["syslog", "sshd", "authentication_failed"]
+        yield alert
+
+
+def bench(label, fn, alerts, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for alert in alerts:
+            fn(alert)
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<28} {best / len(alerts) * 1e6:7.2f} us/alert  {len(alerts) / best:>12,.0f} alerts/s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure IOC extraction cost per alert")
+    parser.add_argument("--alerts", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    alerts = list(with_logs(datagen.alert_documents(datagen.alerts_frame(args.alerts, seed=args.seed))))
+    extractor = IOCExtractor(HINTS, IGNORE)
+
+    bench("previous (hashes, 4 paths)", previous_extract_hashes, alerts, args.repeat)
+    bench("IOCExtractor (all types)", extractor.extract, alerts, args.repeat)
+
+    found = [extractor.extract(alert) for alert in alerts]
+    with_hashes = sum(1 for f in found if f.hashes())
+    print(f"alerts with hashes: previous {sum(1 for a in alerts if previous_extract_hashes(a)):,}, "
+          f"extractor {with_hashes:,} of {len(alerts):,}; "
+          f"indicators per alert {sum(map(len, found)) / len(found):.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
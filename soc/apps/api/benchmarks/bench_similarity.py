@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Build/query benchmark for the incident similarity index
+
+Usage:
+    python benchmarks/bench_similarity.py                  # 1M synthetic incidents
+    python benchmarks/bench_similarity.py --incidents 200000 --queries 5000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datagen  # noqa: E402
+from similarity import SimilarityIndex, incident_text  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure MinHash LSH build and query latency")
+    parser.add_argument("--incidents", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--adds", type=int, default=20000, help="incremental adds after the build")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    frame = datagen.incidents_frame(args.incidents, seed=args.seed)
+    texts = [incident_text(t, d, g) for t, d, g in zip(frame['title'], frame['description'], frame['tags'])]
+
+    index = SimilarityIndex(compact_threshold=10**9)
+    started = time.perf_counter()
+    index.rebuild(enumerate(texts, start=1))
+    build = time.perf_counter() - started
+    print(f"rebuild: {len(index):,} incidents in {build:.1f}s ({len(index) / build:,.0f}/s)")
+
+    started = time.perf_counter()
+    for i in range(args.adds):
+        index.add(len(texts) + i + 1, texts[i])
+    print(f"add:     {args.adds / (time.perf_counter() - started):,.0f} incidents/s")
+
+    started = time.perf_counter()
+    index.compact()
+    print(f"compact: {time.perf_counter() - started:.2f}s")
+
+    rng = np.random.default_rng(args.seed)
+    latencies = []
+    for i in rng.integers(0, len(texts), size=args.queries):
+        started = time.perf_counter()
+        index.similar(texts[i], k=args.k, exclude_id=int(i) + 1)
+        latencies.append(time.perf_counter() - started)
+
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    print(f"query:   p50 {p50:.3f} ms   p95 {p95:.3f} ms   p99 {p99:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the CyberBlue SOC API
+
+Spawns `uvicorn <app>` in a fresh process and measures:
+  - time to the first healthy response from /health (the server accepts traffic)
+  - time until /ready returns 200 (background ML warm-up has finished)
+
+Usage:
+    python benchmarks/bench_startup.py                      # soc/apps/api main:app
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --app backend.main:app --app-dir ../../..
+
+The target app reads its settings from the environment/.env as usual.
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _poll(client: httpx.Client, url: str, deadline: float, interval: float = 0.005) -> bool:
+    while time.perf_counter() < deadline:
+        try:
+            if client.get(url).status_code == 200:
+                return True
+        except httpx.TransportError:
+            pass
+        time.sleep(interval)
+    return False
+
+
+def measure_once(app: str, app_dir: str, timeout: float):
+    """Return (seconds_to_healthy, seconds_to_ready); either may be None on timeout"""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    cmd = [sys.executable, "-m", "uvicorn", app, "--app-dir", app_dir,
+           "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=app_dir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        deadline = started + timeout
+        with httpx.Client(timeout=1.0) as client:
+            healthy = _poll(client, f"{base_url}/health", deadline)
+            to_healthy = time.perf_counter() - started if healthy else None
+            ready = healthy and _poll(client, f"{base_url}/ready", deadline, interval=0.02)
+            to_ready = time.perf_counter() - started if ready else None
+    finally:
+        proc.terminate()
+        try:
+            _, stderr = proc.communicate(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            _, stderr = proc.communicate()
+
+    if to_healthy is None:
+        print(stderr.decode(errors="replace")[-2000:], file=sys.stderr)
+    return to_healthy, to_ready
+
+
+def _fmt(value):
+    return f"{value * 1000:8.1f} ms" if value is not None else "  timeout"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure time-to-first-healthy-response")
+    parser.add_argument("--app", default="main:app")
+    parser.add_argument("--app-dir", default=API_DIR)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    app_dir = os.path.abspath(args.app_dir)
+    healthy_times, ready_times = [], []
+
+    print(f"Benchmarking startup of {args.app} ({args.runs} runs)")
+    for run in range(1, args.runs + 1):
+        to_healthy, to_ready = measure_once(args.app, app_dir, args.timeout)
+        print(f"  run {run}: healthy {_fmt(to_healthy)}   ready {_fmt(to_ready)}")
+        if to_healthy is not None:
+            healthy_times.append(to_healthy)
+        if to_ready is not None:
+            ready_times.append(to_ready)
+
+    if not healthy_times:
+        print("Server never became healthy")
+        return 1
+
+    print(f"time-to-first-healthy-response: median {_fmt(statistics.median(healthy_times))}, "
+          f"min {_fmt(min(healthy_times))}")
+    if ready_times:
+        print(f"time-to-ready (models loaded):  median {_fmt(statistics.median(ready_times))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Load driver for the automated response pipeline, fully offline
+
+Starts the VirusTotal, FleetDM and Keycloak stand-ins, points the API at them
+and at a scratch SQLite database, serves the app with uvicorn on a local
+port, then replays synthetic alerts through POST
+/api/playbooks/auto-incident-response with a pool of concurrent clients.
+Each alert is followed until its job finishes. Reports throughput, latency
+percentiles, outcomes and the calls each integration received.
+
+By default every alert runs the critical response playbook, so enrichment and
+the batched FleetDM containment path both carry load; --playbook high runs the
+selective playbook (blocking only hashes the VirusTotal stand-in flags), and
+--playbook model leaves the choice to the incident model, which without a
+trained model picks the enrichment-only default for every alert. When a
+containment playbook is forced, the driver exits non-zero if FleetDM received
+no requests.
+
+Usage:
+    python benchmarks/load_playbooks.py                          # 500 alerts, 10 clients
+    python benchmarks/load_playbooks.py --playbook model         # as the model would respond
+    python benchmarks/load_playbooks.py --alerts 2000 --latency 0.05 --error-rate 0.02
+    python benchmarks/load_playbooks.py --vt-rate-limit 50 --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from standins import FleetDMStandIn, KeycloakStandIn, VirusTotalStandIn  # noqa: E402
+
+TERMINAL = ("succeeded", "failed")
+CONTAINMENT_PLAYBOOKS = {"critical": "CRITICAL_RESPONSE_PLAYBOOK", "high": "HIGH_RESPONSE_PLAYBOOK"}
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def configure_app(args, virustotal, fleetdm, keycloak):
+    """Point the app's settings at the stand-ins; must run before the app is imported"""
+    os.environ.update({
+        "OIDC_ISSUER": keycloak.issuer,
+        "OIDC_AUDIENCE": keycloak.audience,
+        "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}",
+        "VIRUSTOTAL_BASE_URL": virustotal.api_url,
+        "VIRUSTOTAL_API_KEY": "stand-in",
+        # The stand-in enforces its own limit (--vt-rate-limit); keep the client-side quota out of the way
+        "VIRUSTOTAL_REQUESTS_PER_MINUTE": str(args.vt_quota_per_minute),
+        "VIRUSTOTAL_BURST": str(max(1, args.vt_quota_per_minute // 60)),
+        "FLEETDM_BASE_URL": fleetdm.base_url,
+        "FLEETDM_API_TOKEN": "stand-in",
+        "JOB_WORKERS": str(args.workers),
+        "JOB_POLL_SECONDS": "0.5",
+    })
+    if args.no_correlation:
+        os.environ["ALERT_CORRELATION_WINDOW_SECONDS"] = "0"
+
+
+def force_playbook(name):
+    """Make every response run one of the containment playbooks instead of the model's choice"""
+    from routers import playbooks
+
+    playbook = getattr(playbooks, CONTAINMENT_PLAYBOOKS[name])
+    playbooks.select_playbook = lambda *args, **kwargs: playbook
+
+
+def serve(app):
+    """Run the app with uvicorn in a background thread; returns (server, thread, base_url)"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, name="load-test-api", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("API server failed to start")
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+async def drive(base_url, token, alerts, concurrency, poll_interval, timeout):
+    import httpx
+
+    results = []
+    semaphore = asyncio.Semaphore(concurrency)
+    headers = {"Authorization": f"Bearer {token}"}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=timeout) as client:
+        while (await client.get("/ready")).status_code != 200:
+            await asyncio.sleep(0.1)
+
+        async def follow(alert):
+            response = await client.post("/api/playbooks/auto-incident-response", json=alert)
+            submitted = time.perf_counter()
+            if response.status_code != 202:
+                return f"http_{response.status_code}", submitted
+            job_id = response.json()["job_id"]
+            while True:
+                job = (await client.get(f"/api/playbooks/jobs/{job_id}")).json()
+                if job["status"] in TERMINAL:
+                    break
+                await asyncio.sleep(poll_interval)
+            if job["status"] != "succeeded":
+                return "failed", submitted
+            return (await client.get(f"/api/playbooks/jobs/{job_id}/result")).json().get("status"), submitted
+
+        async def replay(alert):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    outcome, submitted = await follow(alert)
+                except httpx.HTTPError as e:
+                    outcome, submitted = f"client_{type(e).__name__}", time.perf_counter()
+                results.append({"outcome": outcome, "submit": submitted - started,
+                                "total": time.perf_counter() - started})
+
+        started = time.perf_counter()
+        await asyncio.gather(*(replay(alert) for alert in alerts))
+        elapsed = time.perf_counter() - started
+        enrichment_stats = (await client.get("/api/metrics/enrichment")).json()
+        containment_stats = (await client.get("/api/metrics/containment")).json()
+    return elapsed, results, enrichment_stats, containment_stats
+
+
+def integration_calls(name, server):
+    paths = Counter(path.split("?")[0] for _, path in server.calls)
+    summary = {"requests": server.counters["requests"], "errors": server.counters["errors"],
+               "rate_limited": server.counters["rate_limited"]}
+    if name == "virustotal":
+        summary["distinct_hashes"] = len(paths)
+    elif name == "fleetdm":
+        summary["policies"] = len(server.policies)
+    else:
+        summary["paths"] = {path.rsplit("/", 1)[-1]: count for path, count in paths.items()}
+    return summary
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load-test automated incident response against offline stand-ins")
+    parser.add_argument("--alerts", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent clients")
+    parser.add_argument("--workers", type=int, default=4, help="job workers in the API")
+    parser.add_argument("--latency", type=float, default=0.02, help="stand-in response time in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of stand-in requests failing")
+    parser.add_argument("--vt-rate-limit", type=float, default=None, help="VirusTotal stand-in requests/s")
+    parser.add_argument("--vt-quota-per-minute", type=int, default=60000,
+                        help="client-side VirusTotal quota the API is configured with")
+    parser.add_argument("--no-correlation", action="store_true", help="open an incident for every alert")
+    parser.add_argument("--playbook", choices=["critical", "high", "model"], default="critical",
+                        help="response playbook for every alert, or the incident model's choice")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=60, help="per-request client timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    common = {"latency": args.latency, "error_rate": args.error_rate, "seed": args.seed}
+    virustotal = VirusTotalStandIn(rate_limit=args.vt_rate_limit, **common).start()
+    fleetdm = FleetDMStandIn(**common).start()
+    keycloak = KeycloakStandIn(latency=args.latency, seed=args.seed).start()
+    configure_app(args, virustotal, fleetdm, keycloak)
+
+    import datagen
+    from database import engine
+    from main import app
+    from models import Base
+
+    Base.metadata.create_all(engine)
+    if args.playbook != "model":
+        force_playbook(args.playbook)
+    alerts = list(datagen.alert_documents(datagen.alerts_frame(args.alerts, seed=args.seed)))
+    server, thread, base_url = serve(app)
+    try:
+        elapsed, results, enrichment_stats, containment_stats = asyncio.run(
+            drive(base_url, keycloak.token_for("analyst"), alerts, args.concurrency, args.poll_interval,
+                  args.timeout))
+    finally:
+        server.should_exit = True
+        thread.join()
+        for stand_in in (virustotal, fleetdm, keycloak):
+            stand_in.stop()
+
+    totals = sorted(r["total"] * 1000 for r in results)
+    submits = sorted(r["submit"] * 1000 for r in results)
+    report = {
+        "alerts": len(results),
+        "elapsed_s": round(elapsed, 3),
+        "alerts_per_second": round(len(results) / elapsed, 1),
+        "outcomes": dict(Counter(r["outcome"] for r in results)),
+        "latency_ms": {name: round(percentile(totals, q), 1)
+                       for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))},
+        "submit_latency_ms": {name: round(percentile(submits, q), 1) for name, q in (("p50", 0.5), ("p99", 0.99))},
+        "integrations": {name: integration_calls(name, stand_in) for name, stand_in in
+                         (("virustotal", virustotal), ("fleetdm", fleetdm), ("keycloak", keycloak))},
+        "enrichment": enrichment_stats,
+        "containment": containment_stats,
+    }
+
+    print(f"{report['alerts']} alerts in {report['elapsed_s']}s: {report['alerts_per_second']} alerts/s")
+    print(f"outcomes: {report['outcomes']}")
+    print("end-to-end latency ms: " + "  ".join(f"{k} {v}" for k, v in report["latency_ms"].items()))
+    print("submit latency ms:     " + "  ".join(f"{k} {v}" for k, v in report["submit_latency_ms"].items()))
+    for name, calls in report["integrations"].items():
+        print(f"{name:<11} {calls}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.playbook != "model" and any("syscheck" in alert for alert in alerts) \
+            and report["integrations"]["fleetdm"]["requests"] == 0:
+        print(f"error: the {args.playbook} playbook ran on alerts with file hashes, "
+              f"but FleetDM received no requests", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
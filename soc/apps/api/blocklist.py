@@ -0,0 +1,136 @@
+"""
+Membership filter for indicators already blocked on the endpoints
+
+During an outbreak the same hash shows up in thousands of alerts, and every
+matching playbook run would push the same FleetDM policy again. Blocked
+indicators are recorded in the IOC table (source "fleetdm", status "active");
+an in-memory Bloom filter in front of it answers "never blocked" without a
+query for almost every new indicator, and only a filter hit is confirmed
+against the table. The filter is rebuilt from the table at startup.
+"""
+
+import hashlib
+import logging
+import math
+from typing import List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SOURCE = "fleetdm"
+BLOCKED = "active"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings; no false negatives"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and error_rate between 0 and 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def __len__(self) -> int:
+        return self.count
+
+
+def _key(ioc_type: str, value: str) -> str:
+    return f"{ioc_type}:{value.strip().lower()}"
+
+
+class BlockedIndicators:
+    """Bloom filter of blocked indicators, confirmed against the IOC table.
+
+    Until load() has run, every lookup goes to the table, so answers are
+    exact from the first request; the filter only saves queries.
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filter = BloomFilter(capacity, error_rate)
+        self._loaded = False
+        self._added_while_loading: List[str] = []
+        self.counters = {"filtered": 0, "confirmed": 0, "false_positives": 0}
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self, session_factory, chunk_size: int = 10000) -> int:
+        """Rebuild the filter from the IOC table; blocking, run it in a worker thread"""
+        from models import IOC
+
+        db = session_factory()
+        try:
+            query = db.query(IOC.type, IOC.value).filter(IOC.source == BLOCK_SOURCE, IOC.status == BLOCKED)
+            rows: List[Tuple[str, str]] = list(query.yield_per(chunk_size))
+        except Exception as e:
+            logger.error(f"Blocked indicator filter rebuild failed: {e}")
+            return 0
+        finally:
+            db.close()
+
+        # Leave room to grow, so the error rate holds until the next restart
+        bloom = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+        for ioc_type, value in rows:
+            bloom.add(_key(ioc_type, value))
+        added, self._added_while_loading = self._added_while_loading, []
+        for key in added:
+            bloom.add(key)
+        self._filter = bloom
+        self._loaded = True
+        logger.info(f"Loaded {len(rows)} blocked indicators into the membership filter")
+        return len(rows)
+
+    async def is_blocked(self, db: AsyncSession, ioc_type: str, value: str) -> bool:
+        """Whether the indicator is already blocked; exact, a filter hit is confirmed in the table"""
+        from models import IOC
+
+        key = _key(ioc_type, value)
+        if self._loaded and key not in self._filter:
+            self.counters["filtered"] += 1
+            return False
+        found = await db.scalar(
+            select(IOC.id)
+            .where(IOC.type == ioc_type, IOC.value == value.strip().lower(),
+                   IOC.source == BLOCK_SOURCE, IOC.status == BLOCKED)
+            .limit(1)
+        ) is not None
+        self.counters["confirmed" if found else "false_positives"] += 1
+        return found
+
+    def mark_blocked(self, ioc_type: str, value: str, severity: str = "high"):
+        """Add the indicator to the filter and return its IOC row for the caller to commit"""
+        from models import IOC
+
+        key = _key(ioc_type, value)
+        self._filter.add(key)
+        if not self._loaded:
+            self._added_while_loading.append(key)
+        if len(self._filter) == self._filter.capacity:
+            logger.warning("Blocked indicator filter is at capacity; its false positive rate will rise "
+                           "until it is rebuilt at the next restart")
+        return IOC(type=ioc_type, value=value.strip().lower(), source=BLOCK_SOURCE, status=BLOCKED,
+                   severity=severity, confidence=100)
@@ -0,0 +1,96 @@
+"""
+Small in-process caching primitives
+
+TTLCache is a size-bounded LRU whose entries expire individually; SingleFlight
+collapses concurrent calls for the same key into one execution whose result
+every caller shares.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+MISSING = object()
+_ABANDONED = object()  # SingleFlight result when the leader was cancelled
+
+
+class TTLCache:
+    """LRU cache with a per-entry time to live"""
+
+    def __init__(self, maxsize: int, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any:
+        """Cached value, or MISSING if absent or expired"""
+        entry = self._data.get(key)
+        if entry is None:
+            return MISSING
+        expires, value = entry
+        if expires <= self.clock():
+            del self._data[key]
+            return MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        self._data[key] = (self.clock() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class SingleFlight:
+    """Run at most one coroutine per key at a time; concurrent callers await its result
+
+    A leader that is cancelled (a step timeout, a worker shutdown) does not
+    pass its cancellation on: its followers run the call again, one of them
+    as the new leader.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.collapsed = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future: Optional[asyncio.Future] = self._inflight.get(key)
+        if future is not None:
+            self.collapsed += 1
+        while future is not None:
+            result = await asyncio.shield(future)
+            if result is not _ABANDONED:
+                return result
+            future = self._inflight.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await fn()
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved; followers re-raise it themselves
+            raise
+        except BaseException:
+            future.set_result(_ABANDONED)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
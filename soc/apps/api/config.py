@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -8,6 +8,99 @@ class Settings(BaseSettings):
     database_url: str
     cors_origins: List[str] = ["https://soc.local", "https://localhost:3000"]
 
+    # Connection pools, one per engine (asyncio for requests and workers, blocking for threads).
+    # Connections past pool_size are opened on demand up to max_overflow; a checkout waits at
+    # most db_pool_timeout_seconds. Pre-ping and recycling drop connections the server closed.
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout_seconds: float = 30
+    db_pool_recycle_seconds: int = 1800
+    db_pool_pre_ping: bool = True
+
+    # Incident similarity index (MinHash LSH)
+    similarity_num_perm: int = 64
+    similarity_bands: int = 16
+
+    # Alert correlation ahead of case creation; a window of 0 disables it
+    alert_correlation_fields: List[str] = ["rule.id", "agent.id", "data.srcip"]
+    alert_correlation_window_seconds: float = 300
+    alert_correlation_flush_seconds: float = 5
+
+    # Bulk NDJSON alert ingestion: alerts per transaction, and the longest accepted line
+    bulk_ingest_batch_size: int = 1000
+    bulk_ingest_max_line_bytes: int = 1 << 20
+
+    # IOC extraction from alerts: fields whose type is known up front, and fields never scanned
+    ioc_field_hints: Dict[str, str] = {
+        "syscheck.md5_after": "md5",
+        "syscheck.sha1_after": "sha1",
+        "syscheck.sha256_after": "sha256",
+        "syscheck.md5_before": "md5",
+        "syscheck.sha1_before": "sha1",
+        "syscheck.sha256_before": "sha256",
+        "data.md5": "md5",
+        "data.sha1": "sha1",
+        "data.sha256": "sha256",
+        "data.hash": "hash",
+        "data.srcip": "ip",
+        "data.dstip": "ip",
+        "data.url": "url",
+        "data.hostname": "domain",
+    }
+    ioc_ignore_fields: List[str] = ["id", "timestamp", "@timestamp", "agent.ip", "manager.name",
+                                    "decoder.name", "location", "rule.groups"]
+    # The only fields whose hashes containment blocks: the file as it is now. Hashes from
+    # *_before fields (the file before it changed) or free text are only enriched.
+    containment_hash_fields: List[str] = ["syscheck.md5_after", "syscheck.sha1_after", "syscheck.sha256_after",
+                                          "data.md5", "data.sha1", "data.sha256", "data.hash",
+                                          "file.hash.md5", "file.hash.sha1", "file.hash.sha256"]
+
+    # Membership filter of indicators already blocked via FleetDM, sized for this many entries
+    blocklist_capacity: int = 100000
+    blocklist_error_rate: float = 0.001
+
+    # Endpoint containment; without a FleetDM URL, blocking policies are only simulated.
+    # Block requests arriving within the window are pushed as one policy.
+    fleetdm_base_url: str = ""
+    fleetdm_api_token: str = ""
+    fleetdm_timeout_seconds: float = 10
+    fleetdm_batch_size: int = 100
+    fleetdm_batch_window_seconds: float = 0.5
+
+    # Threat-intelligence enrichment
+    virustotal_api_key: str = ""
+    virustotal_base_url: str = "https://www.virustotal.com/api/v3"
+    virustotal_concurrency: int = 4
+    # Provider quota (the public API allows 4 requests/minute)
+    virustotal_requests_per_minute: float = 4
+    virustotal_burst: int = 4
+    enrichment_timeout_seconds: float = 10
+    enrichment_cache_size: int = 10000
+    # Cache lifetime per verdict; "unknown" is the negative cache for never-seen indicators
+    enrichment_ttl_seconds: Dict[str, int] = {
+        "malicious": 7 * 86400,
+        "suspicious": 86400,
+        "harmless": 3 * 86400,
+        "unknown": 3600,
+    }
+
+    # Background jobs (automated incident response); the queue lives in the main database
+    job_workers: int = 4
+    job_poll_seconds: float = 2
+    # A job whose worker died is retried once its lease runs out
+    job_lease_seconds: int = 300
+    job_max_attempts: int = 3
+
+    # Metric retention: raw samples roll up into 1-minute and 1-hour aggregates; each tier is
+    # deleted past its age (0 keeps hourly aggregates forever), metrics_delete_batch_size rows
+    # per transaction. Historical queries use the coarsest tier giving metrics_query_min_points.
+    metrics_raw_retention_days: float = 7
+    metrics_minute_retention_days: float = 30
+    metrics_hour_retention_days: float = 0
+    metrics_rollup_interval_seconds: float = 60
+    metrics_delete_batch_size: int = 5000
+    metrics_query_min_points: int = 100
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,13 @@
+"""
+Shared pytest setup for the API tests: make the app modules importable and
+provide the settings config.Settings() requires when no .env file is present.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("OIDC_ISSUER", "http://127.0.0.1:9/realms/cyberblue")
+os.environ.setdefault("OIDC_AUDIENCE", "cyberblue-soc-api")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
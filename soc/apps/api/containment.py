@@ -0,0 +1,219 @@
+"""
+Endpoint containment through FleetDM
+
+Blocking a hash means pushing a FleetDM policy that fails on any host running
+a process with that hash. During an outbreak, playbook runs block hashes a few
+at a time but in quick succession, so block requests go through a
+ContainmentBatcher: requests arriving within `window` seconds (or until
+`max_batch` hashes are waiting) become one consolidated policy, and every
+caller of the batch gets the same result. Without a FleetDM URL configured,
+policies are simulated and only logged.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+HASH_COLUMNS = {32: "md5", 40: "sha1", 64: "sha256"}
+
+
+class ContainmentError(Exception):
+    """FleetDM rejected the policy or could not be reached"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"fleetdm: {message}")
+        self.status_code = status_code
+
+
+class FleetDMClient:
+    """Pooled HTTP client for the FleetDM REST API"""
+
+    def __init__(self, base_url: str, api_token: str, concurrency: int = 2, timeout: float = 10.0,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url.rstrip("/")
+        self.api_token = api_token
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.base_url)
+
+    def _bind(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"authorization": f"Bearer {self.api_token}", "accept": "application/json"},
+            timeout=self.timeout,
+            transport=self.transport,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+        )
+        self._loop = loop
+
+    async def create_policy(self, name: str, query: str, description: str, resolution: str) -> Dict[str, Any]:
+        """Create a global policy; returns FleetDM's policy object"""
+        self._bind()
+        try:
+            response = await self._client.post("/api/v1/fleet/global/policies", json={
+                "name": name,
+                "query": query,
+                "description": description,
+                "resolution": resolution,
+                "critical": True,
+            })
+        except httpx.HTTPError as e:
+            raise ContainmentError(502, f"request failed: {e}") from e
+        if response.status_code not in (200, 201):
+            raise ContainmentError(response.status_code, f"HTTP {response.status_code}")
+        return response.json().get("policy", {})
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+
+def blocklist_query(hashes: List[str]) -> str:
+    """osquery policy query that fails on hosts running a process with one of the hashes"""
+    by_column: Dict[str, List[str]] = {}
+    for value in hashes:
+        column = HASH_COLUMNS.get(len(value))
+        if column is None or not all(c in "0123456789abcdef" for c in value):
+            raise ValueError(f"Not a lowercase MD5/SHA1/SHA256 hash: {value!r}")
+        by_column.setdefault(column, []).append(f"'{value}'")
+    matches = " OR ".join(f"h.{column} IN ({', '.join(values)})" for column, values in sorted(by_column.items()))
+    return f"SELECT 1 WHERE NOT EXISTS (SELECT 1 FROM processes p JOIN hash h USING (path) WHERE {matches});"
+
+
+class ContainmentBatcher:
+    """Collects submitted values for up to `window` seconds or `max_batch` values,
+    then sends them in one `send_batch(values)` call whose result every caller shares.
+    The same value submitted twice in a window is sent once.
+    """
+
+    def __init__(self, name: str, send_batch: Callable[[List[str]], Awaitable[Any]],
+                 max_batch: int = 100, window: float = 0.5):
+        self.name = name
+        self.send_batch = send_batch
+        self.max_batch = max(1, max_batch)
+        self.window = window
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight = set()
+        self._loop = None
+        self.counters = {"requests": 0, "collapsed": 0, "batches": 0, "values": 0, "failed_batches": 0}
+
+    def _bind(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Futures of a previous (closed) loop can never be resolved again
+            self._pending, self._timer, self._inflight = {}, None, set()
+            self._loop = loop
+
+    async def submit(self, value: str) -> Any:
+        """Queue a value and wait for the result of the batch it is sent in"""
+        self._bind()
+        self.counters["requests"] += 1
+        future = self._pending.get(value)
+        if future is None:
+            future = self._loop.create_future()
+            self._pending[value] = future
+            if len(self._pending) >= self.max_batch:
+                self.flush()
+            elif self._timer is None:
+                self._timer = self._loop.call_later(self.window, self.flush)
+        else:
+            self.counters["collapsed"] += 1
+        # Shielded: one caller giving up must not cancel the result for the others
+        return await asyncio.shield(future)
+
+    def flush(self) -> None:
+        """Send whatever is waiting now instead of at the end of the window"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = self._loop.create_task(self._send(batch), name=f"{self.name}-containment-batch")
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, batch: Dict[str, asyncio.Future]) -> None:
+        self.counters["batches"] += 1
+        self.counters["values"] += len(batch)
+        try:
+            result = await self.send_batch(list(batch))
+        except Exception as e:
+            self.counters["failed_batches"] += 1
+            logger.error(f"{self.name} containment batch of {len(batch)} failed: {e}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    future.exception()  # callers handle it; don't warn about it being unretrieved
+            return
+        for future in batch.values():
+            if not future.done():
+                future.set_result(result)
+
+    async def aclose(self) -> None:
+        """Send the pending batch and wait for batches in flight"""
+        if self._loop is not None and self._loop is asyncio.get_running_loop():
+            self.flush()
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "pending": len(self._pending), "inflight": len(self._inflight)}
+
+
+fleetdm = FleetDMClient(settings.fleetdm_base_url, settings.fleetdm_api_token,
+                        timeout=settings.fleetdm_timeout_seconds)
+
+
+async def send_blocklist_policy(hashes: List[str]) -> Dict[str, Any]:
+    """One FleetDM policy for a batch of hashes; shared result of every block in the batch"""
+    created = datetime.now(timezone.utc)
+    name = f"CyberBlue blocklist {created:%Y%m%dT%H%M%S.%f} ({len(hashes)} hashes)"
+    if not fleetdm.configured:
+        logger.info(f"FleetDM not configured; simulated policy '{name}'")
+        return {"policy_id": None, "policy_name": name, "hashes": len(hashes), "simulated": True}
+    policy = await fleetdm.create_policy(
+        name,
+        blocklist_query(hashes),
+        description="Hashes blocked by CyberBlue SOC response playbooks",
+        resolution="Terminate the process and quarantine the file",
+    )
+    return {"policy_id": policy.get("id"), "policy_name": name, "hashes": len(hashes), "simulated": False}
+
+
+fleetdm_batcher = ContainmentBatcher("fleetdm", send_blocklist_policy,
+                                     max_batch=settings.fleetdm_batch_size,
+                                     window=settings.fleetdm_batch_window_seconds)
+
+
+async def block_hash(hash_value: str) -> Dict[str, Any]:
+    """Block a hash on every host; resolves when the policy of its batch exists"""
+    return await fleetdm_batcher.submit(hash_value.strip().lower())
+
+
+async def aclose() -> None:
+    """Send pending blocks and close the FleetDM client; called on application shutdown"""
+    await fleetdm_batcher.aclose()
+    await fleetdm.aclose()
+
+
+def stats() -> Dict[str, Any]:
+    """Batcher counters for the metrics endpoint"""
+    return {"fleetdm": fleetdm_batcher.stats()}
@@ -0,0 +1,260 @@
+"""
+Alert correlation ahead of case creation
+
+Alerts that share a correlation key (by default rule ID, agent and source IP)
+and arrive within `window_seconds` of the previous one are collapsed onto the
+incident opened for the first of them. Windows live in an in-memory map; the
+alert count and first/last-seen times are written back to the incident's tags
+(`alert_count:N,first_seen:<epoch>,last_seen:<epoch>`) in periodic batches, so
+a storm of identical alerts costs one INSERT plus one UPDATE per flush instead
+of an incident, an audit row and a playbook run per alert.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def alert_field(alert: Dict[str, Any], path: str) -> Any:
+    """Dotted-path lookup into a nested alert document"""
+    value: Any = alert
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def merge_tags(tags: Optional[str], updates: Dict[str, Any]) -> str:
+    """Set key:value entries in a comma-separated tag string, keeping the others"""
+    entries = [tag for tag in (tags or "").split(",") if tag and tag.split(":", 1)[0] not in updates]
+    entries.extend(f"{key}:{value}" for key, value in updates.items())
+    return ",".join(entries)
+
+
+def correlation_tags(count: int, first_seen: float, last_seen: float) -> Dict[str, int]:
+    return {"alert_count": count, "first_seen": int(first_seen), "last_seen": int(last_seen)}
+
+
+@dataclass
+class CorrelationWindow:
+    """Open correlation window; `case` is whatever the create callback returned"""
+    first_seen: float
+    last_seen: float
+    count: int = 1
+    flushed_count: int = 1
+    case: Any = None
+    incident_id: Optional[int] = None
+    tags: Optional[str] = None
+    pending: Optional[asyncio.Future] = field(default=None, repr=False)
+
+
+@dataclass
+class CorrelationResult:
+    case: Any
+    incident_id: int
+    correlated: bool  # False when this alert opened the incident
+    alert_count: int
+
+
+class AlertCorrelator:
+    """In-memory window map from correlation key to open incident"""
+
+    def __init__(self, key_fields: List[str], window_seconds: float, clock: Callable[[], float] = time.time):
+        self.key_fields = list(key_fields)
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self._windows: Dict[Tuple, CorrelationWindow] = {}
+        self._retired: List[CorrelationWindow] = []  # replaced before their counts were flushed
+        self.collapsed_total = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0 and bool(self.key_fields)
+
+    def key_for(self, alert: Dict[str, Any]) -> Optional[Tuple]:
+        """Correlation key, or None when the alert has none of the key fields"""
+        key = tuple(alert_field(alert, path) for path in self.key_fields)
+        if all(part is None for part in key):
+            return None
+        return tuple(None if part is None else str(part) for part in key)
+
+    async def correlate(
+        self,
+        alert: Dict[str, Any],
+        create: Callable[[Dict[str, int]], Awaitable[Tuple[Any, int, Optional[str]]]],
+    ) -> CorrelationResult:
+        """Attach alert to an open window, or open one by awaiting create(initial_tags).
+
+        create() receives the correlation tags for a fresh incident and returns
+        (case, incident_id, incident_tags). Concurrent alerts with the same key
+        wait for the first create() instead of opening incidents of their own.
+        """
+        now = self.clock()
+        key = self.key_for(alert) if self.enabled else None
+
+        window = self._windows.get(key) if key is not None else None
+        if window is not None and window.pending is not None:
+            try:
+                await asyncio.shield(window.pending)
+            except Exception:
+                window = None  # creation failed for the leader; open our own window below
+            else:
+                window = self._windows.get(key)
+
+        if window is not None and now - window.last_seen <= self.window_seconds:
+            window.count += 1
+            window.last_seen = max(window.last_seen, now)
+            self.collapsed_total += 1
+            return CorrelationResult(window.case, window.incident_id, True, window.count)
+
+        if window is not None and window.count != window.flushed_count:
+            self._retired.append(window)
+        window = CorrelationWindow(first_seen=now, last_seen=now)
+        if key is not None:
+            window.pending = asyncio.get_running_loop().create_future()
+            self._windows[key] = window
+        try:
+            window.case, window.incident_id, window.tags = await create(correlation_tags(1, now, now))
+        except Exception as e:
+            if key is not None:
+                self._windows.pop(key, None)
+                window.pending.set_exception(e)
+                window.pending.exception()  # followers handle it; don't warn about it being unretrieved
+            raise
+        if window.pending is not None:
+            window.pending.set_result(None)
+            window.pending = None
+        return CorrelationResult(window.case, window.incident_id, False, 1)
+
+    async def correlate_many(
+        self,
+        alerts: List[Dict[str, Any]],
+        create_many: Callable[[List[Tuple[Dict[str, Any], Dict[str, int]]]],
+                              Awaitable[List[Tuple[Any, int, Optional[str]]]]],
+    ) -> List[CorrelationResult]:
+        """Batch form of correlate(): one create_many() call opens every new incident.
+
+        create_many() receives (alert, initial_tags) pairs for the alerts that
+        open an incident and returns (case, incident_id, incident_tags) for each,
+        in order. Alerts of the batch that share a key collapse onto the first.
+        """
+        now = self.clock()
+        results: List[Optional[CorrelationResult]] = [None] * len(alerts)
+        collapsed: List[Tuple[int, CorrelationWindow, int]] = []  # (position, window, count)
+        leaders: List[Tuple[int, CorrelationWindow, Optional[Tuple]]] = []
+        deferred: List[int] = []
+        opening = set()  # ids of the windows this batch opens
+
+        for position, alert in enumerate(alerts):
+            key = self.key_for(alert) if self.enabled else None
+            window = self._windows.get(key) if key is not None else None
+            if window is not None and window.pending is not None and id(window) not in opening:
+                # Another request is opening this incident. Waiting for it while our
+                # own windows are pending could deadlock, so settle the alert afterwards.
+                deferred.append(position)
+                continue
+
+            if window is not None and now - window.last_seen <= self.window_seconds:
+                window.count += 1
+                window.last_seen = max(window.last_seen, now)
+                self.collapsed_total += 1
+                collapsed.append((position, window, window.count))
+                continue
+
+            if window is not None and window.count != window.flushed_count:
+                self._retired.append(window)
+            window = CorrelationWindow(first_seen=now, last_seen=now)
+            if key is not None:
+                window.pending = asyncio.get_running_loop().create_future()
+                self._windows[key] = window
+                opening.add(id(window))
+            leaders.append((position, window, key))
+
+        try:
+            created = await create_many([(alerts[position], correlation_tags(1, now, now))
+                                         for position, _, _ in leaders]) if leaders else []
+        except Exception as e:
+            for _, window, key in leaders:
+                if key is not None:
+                    self._windows.pop(key, None)
+                    window.pending.set_exception(e)
+                    window.pending.exception()  # followers handle it; don't warn about it being unretrieved
+            raise
+
+        for (position, window, _), (case, incident_id, tags) in zip(leaders, created):
+            window.case, window.incident_id, window.tags = case, incident_id, tags
+            if window.pending is not None:
+                window.pending.set_result(None)
+                window.pending = None
+            results[position] = CorrelationResult(case, incident_id, False, 1)
+        for position, window, count in collapsed:
+            results[position] = CorrelationResult(window.case, window.incident_id, True, count)
+
+        async def create_one(alert: Dict[str, Any], tags: Dict[str, int]):
+            return (await create_many([(alert, tags)]))[0]
+
+        for position in deferred:
+            alert = alerts[position]
+            results[position] = await self.correlate(alert, lambda tags, alert=alert: create_one(alert, tags))
+        return results
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Collect tag updates for windows with unflushed alerts and drop idle windows.
+
+        Returns rows for a bulk UPDATE of incidents (`id`, `tags`).
+        """
+        now = self.clock()
+        retired, self._retired = self._retired, []
+        updates = [self._take_update(window) for window in retired]
+        for key, window in list(self._windows.items()):
+            if window.pending is not None:
+                continue
+            if window.count != window.flushed_count:
+                updates.append(self._take_update(window))
+            if now - window.last_seen > self.window_seconds:
+                del self._windows[key]
+        return updates
+
+    def _take_update(self, window: CorrelationWindow) -> Dict[str, Any]:
+        window.tags = merge_tags(window.tags, correlation_tags(window.count, window.first_seen, window.last_seen))
+        window.flushed_count = window.count
+        return {"id": window.incident_id, "tags": window.tags}
+
+    def open_windows(self) -> int:
+        return len(self._windows)
+
+
+def write_counts(updates: List[Dict[str, Any]], session_factory) -> int:
+    """Bulk-UPDATE incident tags from drain() output; returns incidents updated"""
+    from sqlalchemy import update
+    from models import Incident
+
+    if not updates:
+        return 0
+
+    db = session_factory()
+    try:
+        db.execute(update(Incident), updates)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to flush alert correlation counts: {e}")
+        return 0
+    finally:
+        db.close()
+    return len(updates)
+
+
+async def flush_periodically(correlator: AlertCorrelator, session_factory, interval: float) -> None:
+    """Background task: flush correlation counts every `interval` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        # drain() touches the window map, so it runs on the event loop; only the write is offloaded
+        updates = correlator.drain()
+        if updates:
+            await asyncio.to_thread(write_counts, updates, session_factory)
@@ -1,18 +1,55 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from config import settings
+from pool_metrics import PoolMetrics
 
-engine = create_engine(settings.database_url)
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_database_url(url: str) -> str:
+    """Same database through its asyncio driver (asyncpg, aiosqlite)"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if parsed.get_driver_name() in ("asyncpg", "aiosqlite"):
+        return url
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver configured for {backend} databases")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def sync_database_url(url: str) -> str:
+    """Same database through the default blocking driver"""
+    parsed = make_url(url)
+    return parsed.set(drivername=parsed.get_backend_name()).render_as_string(hide_password=False)
+
+
+# Request handlers and the job workers use the async engine, so queries never
+# block the event loop. The blocking engine serves work that already runs in a
+# worker thread (index rebuilds, cache writes, correlation flushes), seeding
+# and migrations.
+async_pool_metrics = PoolMetrics("async")
+async_engine = create_async_engine(
+    async_database_url(settings.database_url),
+    **async_pool_metrics.engine_options(settings.database_url, settings, asyncio=True),
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+pool_metrics = PoolMetrics("blocking")
+engine = create_engine(sync_database_url(settings.database_url),
+                       **pool_metrics.engine_options(settings.database_url, settings))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+def pool_stats():
+    return {"async": async_pool_metrics.snapshot(async_engine), "blocking": pool_metrics.snapshot(engine)}
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
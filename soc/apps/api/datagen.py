@@ -0,0 +1,445 @@
+"""
+Vectorized synthetic SOC dataset generator
+
+Generates incidents, anomalies, audit logs, metrics and Wazuh-style alerts with
+realistic class mixes and time patterns (business-hours peaks, quieter weekends,
+rule storms dominated by a few noisy rules). Every generator draws whole columns
+from numpy at once - there are no per-row Python loops - so millions of rows take
+seconds.
+
+Output formats:
+  - pandas DataFrames (every *_frame function)
+  - Arrow record batches (to_arrow_batches, requires pyarrow)
+  - direct bulk inserts into a table (bulk_load)
+  - Wazuh alert documents for HTTP load tests (alert_documents)
+
+This module is the data source for the training fallbacks, benchmarks and load
+tests in this app.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+INCIDENT_TYPES = np.array([
+    'malware', 'phishing', 'intrusion', 'data_leak',
+    'denial_of_service', 'privilege_escalation', 'normal',
+])
+INCIDENT_TYPE_WEIGHTS = np.array([0.22, 0.18, 0.20, 0.07, 0.06, 0.09, 0.18])
+
+SEVERITIES = np.array(['low', 'medium', 'high', 'critical'])
+SEVERITY_SCORES = np.array([1, 2, 3, 4])
+
+# Severity mix per incident type (rows follow INCIDENT_TYPES)
+SEVERITY_WEIGHTS = np.array([
+    [0.05, 0.30, 0.45, 0.20],  # malware
+    [0.15, 0.50, 0.30, 0.05],  # phishing
+    [0.05, 0.25, 0.45, 0.25],  # intrusion
+    [0.02, 0.18, 0.45, 0.35],  # data_leak
+    [0.10, 0.40, 0.35, 0.15],  # denial_of_service
+    [0.03, 0.22, 0.45, 0.30],  # privilege_escalation
+    [0.70, 0.25, 0.05, 0.00],  # normal
+])
+
+# Relative alert volume per hour of day: quiet nights, business-hours peak
+HOURLY_PROFILE = np.array([
+    0.35, 0.30, 0.28, 0.27, 0.28, 0.35, 0.50, 0.75,
+    1.00, 1.10, 1.15, 1.15, 1.05, 1.10, 1.15, 1.10,
+    1.05, 0.95, 0.80, 0.65, 0.55, 0.50, 0.45, 0.40,
+])
+WEEKDAY_PROFILE = np.array([1.0, 1.0, 1.0, 1.0, 0.95, 0.45, 0.40])
+
+TITLE_TEMPLATES = {
+    'malware': ['Malware signature detected', 'Trojan dropper quarantined',
+                'Ransomware behaviour observed', 'Suspicious binary with known malware hash'],
+    'phishing': ['Phishing email reported', 'Credential harvesting link clicked',
+                 'Spoofed sender domain detected'],
+    'intrusion': ['Unauthorized access attempt', 'Brute force login failures',
+                  'Exploit attempt against web server', 'Suspicious lateral movement'],
+    'data_leak': ['Possible data exfiltration', 'Large outbound transfer to unknown host',
+                  'Sensitive data leak detected'],
+    'denial_of_service': ['SYN flood detected', 'Denial of service traffic spike'],
+    'privilege_escalation': ['Privilege escalation attempt', 'Unexpected admin group change',
+                             'Sudo abuse detected'],
+    'normal': ['Scheduled scan completed', 'Policy check informational event',
+               'Configuration change audited'],
+}
+
+INCIDENT_STATUSES = np.array(['open', 'investigating', 'resolved', 'closed'])
+
+AUDIT_ACTIONS = np.array([
+    'start_tool', 'stop_tool', 'restart_tool', 'create_incident',
+    'update_incident_status', 'virustotal_enrichment', 'block_hash_fleetdm',
+    'auto_incident_response', 'ai_incident_analysis', 'login', 'login_failed', 'export_data',
+])
+AUDIT_ACTION_WEIGHTS = np.array([
+    0.04, 0.03, 0.02, 0.10, 0.08, 0.15, 0.06, 0.10, 0.07, 0.22, 0.05, 0.08,
+])
+AUDIT_RESOURCE_PREFIX = np.array([
+    'tool', 'tool', 'tool', 'incident', 'incident', 'hash', 'hash',
+    'alert', 'incident', 'user', 'user', 'export',
+])
+
+ANOMALY_TYPES = np.array([
+    'cpu_spike', 'memory_anomaly', 'login_anomaly',
+    'network_traffic', 'data_exfiltration', 'other',
+])
+ANOMALY_TYPE_WEIGHTS = np.array([0.30, 0.25, 0.20, 0.15, 0.05, 0.05])
+
+TOOL_NAMES = np.array([
+    'Velociraptor', 'Wazuh Dashboard', 'Shuffle', 'MISP', 'CyberChef', 'TheHive',
+    'Cortex', 'FleetDM', 'Arkime', 'Caldera', 'Evebox', 'Wireshark',
+])
+
+_HEX_BYTES = np.array([f"{i:02x}" for i in range(256)], dtype="S2")
+
+# numpy >= 2 ships the much faster np.strings ufuncs; np.char works everywhere
+_str_add = getattr(np, 'strings', np.char).add
+
+
+def _rng(seed: Optional[int]) -> np.random.Generator:
+    return np.random.default_rng(seed)
+
+
+def _time_range(start: Optional[datetime], end: Optional[datetime], days: int = 30):
+    end = end or datetime.utcnow().replace(microsecond=0)
+    start = start or end - timedelta(days=days)
+    return start, end
+
+
+def _timestamps(rng: np.random.Generator, n: int, start: datetime, end: datetime) -> np.ndarray:
+    """Draw n sorted datetime64[s] values in [start, end) following the weekly/diurnal profile"""
+    day0 = np.datetime64(start.date(), 's')
+    n_days = max(1, (end.date() - start.date()).days + 1)
+
+    day_weekdays = (np.arange(n_days) + start.weekday()) % 7
+    day_weights = WEEKDAY_PROFILE[day_weekdays]
+    days = rng.choice(n_days, size=n, p=day_weights / day_weights.sum())
+    hours = rng.choice(24, size=n, p=HOURLY_PROFILE / HOURLY_PROFILE.sum())
+    seconds = rng.integers(0, 3600, size=n)
+
+    offsets = days.astype(np.int64) * 86400 + hours.astype(np.int64) * 3600 + seconds
+    lo = int((np.datetime64(start, 's') - day0).astype(np.int64))
+    hi = int((np.datetime64(end, 's') - day0).astype(np.int64))
+    # The first and last day are partial: redraw the instants that fall outside
+    # [start, end) uniformly instead of clipping them into a spike at the edges
+    outside = (offsets < lo) | (offsets >= hi)
+    offsets[outside] = rng.integers(lo, max(hi, lo + 1), size=int(outside.sum()))
+    return np.sort(day0 + offsets.astype('timedelta64[s]'))
+
+
+def _random_hex(rng: np.random.Generator, n: int, nbytes: int) -> np.ndarray:
+    """n random lowercase hex strings of 2 * nbytes characters"""
+    raw = rng.integers(0, 256, size=(n, nbytes), dtype=np.uint8)
+    return _HEX_BYTES[raw].view(f"S{2 * nbytes}").ravel().astype(str)
+
+
+def _concat(*parts) -> np.ndarray:
+    """Element-wise string concatenation of numpy string arrays and str scalars"""
+    result = parts[0]
+    for part in parts[1:]:
+        result = _str_add(result, part)
+    return result
+
+
+def _labels(prefix: str, count: int, width: int = 0) -> np.ndarray:
+    """Small pool of labels like host-0042, indexed by integer draws instead of formatting per row"""
+    return np.array([f"{prefix}{i:0{width}d}" for i in range(count)])
+
+
+def _zipf_choice(rng: np.random.Generator, n_values: int, size: int, a: float = 1.2) -> np.ndarray:
+    """Indices in [0, n_values) where a few values dominate, like noisy rules or busy users"""
+    weights = 1.0 / np.arange(1, n_values + 1) ** a
+    return rng.choice(n_values, size=size, p=weights / weights.sum())
+
+
+def _pick_templates(rng: np.random.Generator, type_idx: np.ndarray, templates: Dict[str, list]) -> np.ndarray:
+    """Pick a random template per row from the list belonging to each row's incident type"""
+    flat = np.array([t for name in INCIDENT_TYPES for t in templates[name]])
+    counts = np.array([len(templates[name]) for name in INCIDENT_TYPES])
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    choice = (rng.random(len(type_idx)) * counts[type_idx]).astype(np.int64)
+    return flat[offsets[type_idx] + choice]
+
+
+def _severity_for_types(rng: np.random.Generator, type_idx: np.ndarray) -> np.ndarray:
+    """Sample a severity index per row from its type's severity mix (inverse CDF, vectorized)"""
+    cdf = np.cumsum(SEVERITY_WEIGHTS, axis=1)[type_idx]
+    return (rng.random(len(type_idx))[:, None] > cdf).sum(axis=1).clip(0, len(SEVERITIES) - 1)
+
+
+def _ipv4(rng: np.random.Generator, n: int, pool_size: int = 5000) -> np.ndarray:
+    """Source IPs drawn from a pool with a heavy tail of repeat offenders"""
+    pool = rng.integers(0x0B000000, 0xDF000000, size=pool_size, dtype=np.int64)
+    pool = np.array(['.'.join(str((ip >> shift) & 0xFF) for shift in (24, 16, 8, 0)) for ip in pool.tolist()])
+    return pool[_zipf_choice(rng, pool_size, n, a=1.05)]
+
+
+def incident_training_frame(n: int = 1000, seed: Optional[int] = None) -> pd.DataFrame:
+    """Feature rows for IncidentAnalysisService training, with an incident_type label column"""
+    rng = _rng(seed)
+    type_idx = rng.choice(len(INCIDENT_TYPES), size=n, p=INCIDENT_TYPE_WEIGHTS)
+    incident_type = INCIDENT_TYPES[type_idx]
+    hour = rng.choice(24, size=n, p=HOURLY_PROFILE / HOURLY_PROFILE.sum())
+
+    # Per-type intensities (rows follow INCIDENT_TYPES)
+    alert_rate = np.array([6, 4, 8, 5, 20, 3, 1])[type_idx]
+    login_fail_rate = np.array([1, 2, 6, 1, 0.5, 3, 0.2])[type_idx]
+    privilege_rate = np.array([0.5, 0.2, 1.5, 0.5, 0.1, 4, 0.1])[type_idx]
+    source_ip_rate = np.array([3, 5, 10, 2, 60, 2, 1])[type_idx]
+    network_prob = np.array([0.3, 0.2, 0.6, 0.8, 0.95, 0.2, 0.05])[type_idx]
+    threat_prob = np.array([0.6, 0.4, 0.7, 0.5, 0.5, 0.6, 0.02])[type_idx]
+
+    # Free text like an incident's title + description, for the hashed text features
+    hosts = _labels('host-', 500, 3)[rng.integers(0, 500, size=n)]
+    titles = _pick_templates(rng, type_idx, TITLE_TEMPLATES)
+    text = _concat(titles, ' on ', hosts, ' - ', _pick_templates(rng, type_idx, TITLE_TEMPLATES))
+
+    return pd.DataFrame({
+        'alert_count': rng.poisson(alert_rate),
+        'severity_score': SEVERITY_SCORES[_severity_for_types(rng, type_idx)],
+        'has_malware_hash': np.isin(incident_type, ['malware', 'phishing']).astype(int),
+        'network_traffic_anomaly': (rng.random(n) < network_prob).astype(int),
+        'login_failure_count': rng.poisson(login_fail_rate),
+        'data_exfiltration_indicators': (incident_type == 'data_leak').astype(int),
+        'privilege_change_count': rng.poisson(privilege_rate),
+        'hour_of_day': hour,
+        'is_business_hours': ((hour >= 8) & (hour < 18)).astype(int),
+        'source_ip_count': rng.poisson(source_ip_rate),
+        'affected_systems': 1 + rng.poisson(np.where(type_idx == 6, 0.2, 3)),
+        'threat_actor_indicators': (rng.random(n) < threat_prob).astype(int),
+        'known_malware_signature': (incident_type == 'malware').astype(int),
+        'text': text,
+        'incident_type': incident_type,
+    })
+
+
+def incidents_frame(n: int, seed: Optional[int] = None, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None, n_hosts: int = 2000) -> pd.DataFrame:
+    """Rows shaped like the incidents table, plus an incident_type label column"""
+    rng = _rng(seed)
+    start, end = _time_range(start, end)
+    type_idx = rng.choice(len(INCIDENT_TYPES), size=n, p=INCIDENT_TYPE_WEIGHTS)
+    created_at = _timestamps(rng, n, start, end)
+
+    hosts = _labels('host-', n_hosts, 4)[_zipf_choice(rng, n_hosts, n, a=0.9)]
+    rule_ids = rng.integers(500, 100000, size=n).astype(str)
+    alert_ids = rng.integers(10**9, 10**10, size=n).astype(str)
+    alert_counts = (1 + rng.poisson(np.array([6, 4, 8, 5, 20, 3, 1])[type_idx])).astype(str)
+    titles = _pick_templates(rng, type_idx, TITLE_TEMPLATES)
+
+    # Older incidents are more likely to be resolved or closed
+    age = (np.datetime64(end, 's') - created_at).astype(np.float64) / 86400.0
+    settled = rng.random(n) < np.clip(age / 7.0, 0.05, 0.95)
+    status_idx = np.where(settled, rng.integers(2, 4, size=n), rng.integers(0, 2, size=n))
+    updated_at = created_at + (rng.exponential(3600 * 6, size=n) * settled).astype('timedelta64[s]')
+
+    return pd.DataFrame({
+        'title': titles,
+        'description': _concat(titles, ' on ', hosts, ' (rule ', rule_ids, ')'),
+        'severity': SEVERITIES[_severity_for_types(rng, type_idx)],
+        'status': INCIDENT_STATUSES[status_idx],
+        'created_at': created_at,
+        'updated_at': np.minimum(updated_at, np.datetime64(end, 's')),
+        'assigned_to': np.where(rng.random(n) < 0.6,
+                                _labels('analyst-', 40).astype(object)[rng.integers(1, 40, size=n)], None),
+        'tags': _concat('source:wazuh,alert_id:', alert_ids, ',alert_count:', alert_counts),
+        'incident_type': INCIDENT_TYPES[type_idx],
+    })
+
+
+def anomalies_frame(n: int, seed: Optional[int] = None, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> pd.DataFrame:
+    """Rows shaped like the anomaly_detections table"""
+    rng = _rng(seed)
+    start, end = _time_range(start, end)
+    type_idx = rng.choice(len(ANOMALY_TYPES), size=n, p=ANOMALY_TYPE_WEIGHTS)
+
+    # Isolation Forest decision scores: mostly mild, a tail of strong outliers
+    score = -rng.beta(1.5, 5.0, size=n)
+    severity = np.select([score < -0.5, score < -0.3, score < -0.1],
+                         ['critical', 'high', 'medium'], default='low')
+    value = (rng.integers(600, 1000, size=n) / 10).astype(str)
+    labels = np.array([t.replace('_', ' ') for t in ANOMALY_TYPES])[type_idx]
+
+    return pd.DataFrame({
+        'timestamp': _timestamps(rng, n, start, end),
+        'type': ANOMALY_TYPES[type_idx],
+        'severity': severity,
+        'score': score,
+        'description': _concat('Detected ', labels, ' at ', value, '%'),
+        'details': None,
+        'source': np.where(type_idx < 2, 'system_metrics', 'network_traffic'),
+        'acknowledged': rng.random(n) < 0.4,
+    })
+
+
+def audit_logs_frame(n: int, seed: Optional[int] = None, start: Optional[datetime] = None,
+                     end: Optional[datetime] = None, n_users: int = 50) -> pd.DataFrame:
+    """Rows shaped like the audit_logs table"""
+    rng = _rng(seed)
+    start, end = _time_range(start, end)
+    action_idx = rng.choice(len(AUDIT_ACTIONS), size=n, p=AUDIT_ACTION_WEIGHTS)
+    users = _labels('user-', n_users, 3)[_zipf_choice(rng, n_users, n, a=1.0)]
+    targets = rng.integers(1, 100000, size=n).astype(str)
+    action_text = np.array([a.replace('_', ' ') for a in AUDIT_ACTIONS])
+
+    return pd.DataFrame({
+        'user_sub': users,
+        'action': AUDIT_ACTIONS[action_idx],
+        'resource': _concat(AUDIT_RESOURCE_PREFIX[action_idx], ':', targets),
+        'details': _concat(action_text[action_idx], ' from ', _ipv4(rng, n, pool_size=500)),
+        'created_at': _timestamps(rng, n, start, end),
+    })
+
+
+def metrics_frame(n: int, seed: Optional[int] = None, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None, tools: np.ndarray = TOOL_NAMES) -> pd.DataFrame:
+    """Rows shaped like the metrics table: one regularly spaced series per tool"""
+    rng = _rng(seed)
+    start, end = _time_range(start, end, days=7)
+    per_tool = max(1, n // len(tools))
+    n = per_tool * len(tools)
+
+    span = (end - start).total_seconds()
+    ticks = np.datetime64(start, 's') + (np.arange(per_tool) * (span / per_tool)).astype('timedelta64[s]')
+    timestamp = np.tile(ticks, len(tools))
+    tool_idx = np.repeat(np.arange(len(tools)), per_tool)
+
+    hour = (timestamp.astype('datetime64[h]').astype(np.int64) % 24).astype(np.float64)
+    diurnal = np.sin((hour - 6) / 24 * 2 * np.pi)
+    base = rng.uniform(15, 45, size=len(tools))[tool_idx]
+    spikes = (rng.random(n) < 0.01) * rng.uniform(20, 50, size=n)
+    cpu = base + 15 * diurnal + rng.normal(0, 5, size=n) + spikes
+
+    return pd.DataFrame({
+        'timestamp': timestamp,
+        'cpu_usage': np.clip(cpu, 0, 100).astype(int),
+        'memory_usage': np.clip(base + 20 + rng.normal(0, 4, size=n), 0, 100).astype(int),
+        'disk_usage': np.clip(rng.uniform(20, 70, size=len(tools))[tool_idx] + rng.normal(0, 1, size=n), 0, 100).astype(int),
+        'network_rx': rng.lognormal(10, 1, size=n).astype(np.int64),
+        'network_tx': rng.lognormal(9.5, 1, size=n).astype(np.int64),
+        'active_connections': rng.poisson(np.clip(20 + 15 * diurnal, 1, None)),
+        'alerts_count': rng.poisson(np.clip(2 + 2 * diurnal, 0.1, None) + spikes / 10),
+        'tool_name': tools[tool_idx],
+        'tool_status': np.where(rng.random(n) < 0.97, 'running', 'stopped'),
+    })
+
+
+def system_metrics_frame(n: int, seed: Optional[int] = None, start: Optional[datetime] = None,
+                         end: Optional[datetime] = None) -> pd.DataFrame:
+    """Rows shaped like the backend system_metrics table: one regularly spaced series"""
+    rng = _rng(seed)
+    start, end = _time_range(start, end, days=7)
+    span = (end - start).total_seconds()
+    timestamp = np.datetime64(start, 's') + (np.arange(n) * (span / n)).astype('timedelta64[s]')
+    hour = (timestamp.astype('datetime64[h]').astype(np.int64) % 24).astype(np.float64)
+    diurnal = np.sin((hour - 6) / 24 * 2 * np.pi)
+    memory_total = 32 * 1024 ** 3
+    memory_percent = np.clip(55 + 10 * diurnal + rng.normal(0, 3, size=n), 0, 100)
+
+    return pd.DataFrame({
+        'timestamp': timestamp,
+        'active_agents': np.clip(8 + rng.integers(-2, 3, size=n), 0, 12),
+        'cpu_percent': np.clip(30 + 20 * diurnal + rng.normal(0, 6, size=n)
+                               + (rng.random(n) < 0.01) * 40, 0, 100),
+        'memory_percent': memory_percent,
+        'memory_used': memory_percent / 100 * memory_total,
+        'memory_total': float(memory_total),
+        'uptime': (timestamp - timestamp[0]).astype(np.float64),
+        'response_time': rng.gamma(2.0, 0.05, size=n),
+    })
+
+
+def alerts_frame(n: int, seed: Optional[int] = None, start: Optional[datetime] = None,
+                 end: Optional[datetime] = None, n_rules: int = 300, n_agents: int = 200,
+                 hash_pool: int = 2000) -> pd.DataFrame:
+    """Flat Wazuh-style alerts; a handful of noisy rules and agents produce most of the volume"""
+    rng = _rng(seed)
+    start, end = _time_range(start, end, days=1)
+
+    rule_idx = _zipf_choice(rng, n_rules, n, a=1.3)
+    rule_level = (rng.integers(3, 16, size=n_rules))[rule_idx]
+    rule_type = rng.choice(len(INCIDENT_TYPES) - 1, size=n_rules,
+                           p=INCIDENT_TYPE_WEIGHTS[:-1] / INCIDENT_TYPE_WEIGHTS[:-1].sum())
+    rule_titles = _pick_templates(rng, rule_type, TITLE_TEMPLATES)
+    agent_idx = _zipf_choice(rng, n_agents, n, a=0.8)
+
+    # File-integrity and malware rules carry hashes drawn from a shared pool,
+    # so the same indicators recur across alerts the way they do in an outbreak
+    carries_hash = np.isin(INCIDENT_TYPES[rule_type[rule_idx]], ['malware', 'phishing']) & (rng.random(n) < 0.8)
+    md5_pool = _random_hex(rng, hash_pool, 16)
+    sha256_pool = _random_hex(rng, hash_pool, 32)
+    hash_idx = _zipf_choice(rng, hash_pool, n, a=1.1)
+
+    return pd.DataFrame({
+        'id': (np.arange(n) + rng.integers(10**9, 2 * 10**9)).astype(str),
+        'timestamp': _timestamps(rng, n, start, end),
+        'rule_id': (rule_idx + 500).astype(str),
+        'rule_level': rule_level,
+        'rule_description': rule_titles[rule_idx],
+        'agent_id': _labels('', n_agents, 3)[agent_idx],
+        'agent_name': _labels('host-', n_agents)[agent_idx],
+        'srcip': _ipv4(rng, n),
+        'md5': np.where(carries_hash, md5_pool[hash_idx], None),
+        'sha256': np.where(carries_hash, sha256_pool[hash_idx], None),
+    })
+
+
+def alert_documents(frame: pd.DataFrame) -> Iterator[Dict[str, Any]]:
+    """Yield nested Wazuh alert dicts (as posted to the playbook endpoints) from alerts_frame rows"""
+    timestamps = pd.to_datetime(frame['timestamp']).dt.strftime('%Y-%m-%dT%H:%M:%S.000+0000')
+    columns = zip(frame['id'], timestamps, frame['rule_id'], frame['rule_level'],
+                  frame['rule_description'], frame['agent_id'], frame['agent_name'],
+                  frame['srcip'], frame['md5'], frame['sha256'])
+    for alert_id, ts, rule_id, level, description, agent_id, agent_name, srcip, md5, sha256 in columns:
+        alert = {
+            'id': alert_id,
+            'timestamp': ts,
+            'rule': {'id': rule_id, 'level': int(level), 'description': description},
+            'agent': {'id': agent_id, 'name': agent_name},
+            'data': {'srcip': srcip},
+        }
+        if isinstance(md5, str):
+            alert['syscheck'] = {'md5_after': md5, 'sha256_after': sha256}
+        yield alert
+
+
+GENERATORS = {
+    'incidents': incidents_frame,
+    'anomalies': anomalies_frame,
+    'audit_logs': audit_logs_frame,
+    'metrics': metrics_frame,
+    'system_metrics': system_metrics_frame,
+    'alerts': alerts_frame,
+}
+
+
+def to_arrow_batches(frame: pd.DataFrame, batch_size: int = 65536) -> list:
+    """Convert a generated frame to a list of pyarrow.RecordBatch"""
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("pyarrow is required for Arrow output (pip install pyarrow)") from e
+    return pa.Table.from_pandas(frame, preserve_index=False).to_batches(max_chunksize=batch_size)
+
+
+def bulk_load(connection, table, frame: pd.DataFrame, chunk_size: int = 10000) -> int:
+    """Insert frame rows into table with executemany, chunk by chunk.
+
+    connection is a synchronous SQLAlchemy Connection; from async code use
+    `await conn.run_sync(lambda sync_conn: bulk_load(sync_conn, table, frame))`.
+    table may be a mapped model class or a Table. Columns the table does not
+    have (such as label columns) are ignored. Returns the number of rows inserted.
+    """
+    table = getattr(table, '__table__', table)
+    columns = [c.name for c in table.columns if c.name in frame.columns]
+    statement = table.insert()
+
+    for offset in range(0, len(frame), chunk_size):
+        chunk = frame.iloc[offset:offset + chunk_size][columns]
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        connection.execute(statement, chunk.to_dict('records'))
+    return len(frame)
@@ -0,0 +1,267 @@
+"""
+Threat-intelligence enrichment providers
+
+Each provider owns one long-lived pooled httpx.AsyncClient, so lookups reuse
+TCP/TLS connections instead of paying the handshake per call, and a semaphore
+that bounds how many lookups are in flight against it at once. Callers fan out
+with lookup_many(), so a multi-hash alert costs about one round trip.
+
+Lookups go through a two-tier EnrichmentCache: an in-process LRU in front of
+the IOC table, with a TTL per verdict and negative caching of hashes the
+provider has never seen. Concurrent lookups of the same hash share one call.
+Cache misses are queued on the provider's EnrichmentScheduler, which keeps
+outbound calls inside the provider's quota and serves critical lookups first.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+import httpx
+
+from cache import MISSING, SingleFlight, TTLCache
+from config import settings
+from database import SessionLocal
+from scheduler import EnrichmentScheduler, Priority
+
+logger = logging.getLogger(__name__)
+
+
+class EnrichmentError(Exception):
+    """Provider returned an error or could not be reached"""
+
+    def __init__(self, provider: str, status_code: int, message: str):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.status_code = status_code
+
+
+class EnrichmentProvider:
+    """Pooled HTTP client plus concurrency limit for one enrichment provider"""
+
+    def __init__(self, name: str, base_url: str, headers: Dict[str, str], concurrency: int,
+                 timeout: float = 10.0, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.headers = headers
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.transport = transport  # override for tests and stand-in servers
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    def _bind(self) -> None:
+        """Create the client and semaphore for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            timeout=self.timeout,
+            transport=self.transport,
+            limits=httpx.Limits(max_connections=self.concurrency,
+                                max_keepalive_connections=self.concurrency),
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._loop = loop
+
+    async def get_json(self, path: str) -> Optional[Dict[str, Any]]:
+        """GET path; None on 404, EnrichmentError on any other failure"""
+        self._bind()
+        async with self._semaphore:
+            try:
+                response = await self._client.get(path)
+            except httpx.HTTPError as e:
+                raise EnrichmentError(self.name, 502, f"request failed: {e}") from e
+
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise EnrichmentError(self.name, response.status_code, f"HTTP {response.status_code}")
+        return response.json()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+
+def verdict_for(report: Optional[Dict[str, Any]]) -> Tuple[str, int]:
+    """(verdict, confidence 0-100) from a VirusTotal report; None means never seen"""
+    if report is None:
+        return "unknown", 0
+    stats = report.get("data", {}).get("attributes", {}).get("last_analysis_stats") or {}
+    flagged = stats.get("malicious", 0) + stats.get("suspicious", 0)
+    total = sum(v for v in stats.values() if isinstance(v, int)) or 1
+    if stats.get("malicious", 0):
+        return "malicious", round(100 * flagged / total)
+    if stats.get("suspicious", 0):
+        return "suspicious", round(100 * flagged / total)
+    return "harmless", 100 - round(100 * flagged / total)
+
+
+VERDICT_SEVERITY = {"malicious": "high", "suspicious": "medium", "harmless": "low", "unknown": "low"}
+
+
+class EnrichmentCache:
+    """In-process LRU in front of the IOC table, with single-flight provider calls.
+
+    Provider errors are not cached; "never seen" answers are, under the
+    "unknown" TTL, so storms of alerts on fresh hashes don't burn quota either.
+    """
+
+    def __init__(self, fetch: Callable[[str, int], Awaitable[Optional[Dict[str, Any]]]], session_factory,
+                 ttls: Dict[str, int], maxsize: int, ioc_type: str = "hash", source: str = "virustotal"):
+        self.fetch = fetch
+        self.session_factory = session_factory
+        self.ttls = ttls
+        self.ioc_type = ioc_type
+        self.source = source
+        self.memory = TTLCache(maxsize)
+        self.flight = SingleFlight()
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+
+    async def get(self, value: str, priority: int = Priority.DEFAULT) -> Optional[Dict[str, Any]]:
+        """Cached report; on a miss the first caller's priority is used for the provider call"""
+        key = value.strip().lower()
+        cached = self.memory.get(key)
+        if cached is not MISSING:
+            self.stats["memory_hits"] += 1
+            return cached
+        return await self.flight.do(key, lambda: self._load(key, priority))
+
+    async def _load(self, key: str, priority: int) -> Optional[Dict[str, Any]]:
+        stored = await asyncio.to_thread(self._read, key)
+        if stored is not None:
+            report, remaining = stored
+            self.stats["db_hits"] += 1
+            self.memory.set(key, report, remaining)
+            return report
+
+        self.stats["misses"] += 1
+        report = await self.fetch(key, priority)
+        verdict, confidence = verdict_for(report)
+        ttl = self.ttls.get(verdict, self.ttls.get("unknown", 3600))
+        self.memory.set(key, report, ttl)
+        await asyncio.to_thread(self._write, key, report, verdict, confidence, ttl)
+        return report
+
+    def _read(self, key: str) -> Optional[Tuple[Optional[Dict[str, Any]], float]]:
+        """(report, seconds until expiry) of a fresh IOC row, else None"""
+        from models import IOC
+
+        db = self.session_factory()
+        try:
+            ioc = (
+                db.query(IOC)
+                .filter(IOC.type == self.ioc_type, IOC.value == key, IOC.source == self.source)
+                .first()
+            )
+            if ioc is None or ioc.expires_at is None or ioc.verdict is None:
+                return None
+            expires_at = ioc.expires_at
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            remaining = (expires_at - datetime.now(timezone.utc)).total_seconds()
+            if remaining <= 0:
+                return None
+            return (json.loads(ioc.details) if ioc.details else None), remaining
+        except Exception as e:
+            logger.warning(f"Enrichment cache read failed for {key}: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _write(self, key: str, report: Optional[Dict[str, Any]], verdict: str, confidence: int, ttl: int) -> None:
+        from models import IOC
+
+        now = datetime.now(timezone.utc)
+        db = self.session_factory()
+        try:
+            ioc = (
+                db.query(IOC)
+                .filter(IOC.type == self.ioc_type, IOC.value == key, IOC.source == self.source)
+                .first()
+            )
+            if ioc is None:
+                ioc = IOC(type=self.ioc_type, value=key, source=self.source)
+                db.add(ioc)
+            ioc.verdict = verdict
+            ioc.severity = VERDICT_SEVERITY.get(verdict, "medium")
+            ioc.confidence = confidence
+            ioc.details = json.dumps(report) if report is not None else None
+            ioc.last_seen = now
+            ioc.expires_at = now + timedelta(seconds=ttl)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Enrichment cache write failed for {key}: {e}")
+        finally:
+            db.close()
+
+
+virustotal = EnrichmentProvider(
+    "virustotal",
+    settings.virustotal_base_url,
+    headers={"accept": "application/json", "x-apikey": settings.virustotal_api_key},
+    concurrency=settings.virustotal_concurrency,
+    timeout=settings.enrichment_timeout_seconds,
+)
+
+
+async def lookup_hash(hash_value: str) -> Optional[Dict[str, Any]]:
+    """VirusTotal file report for a hash, or None if VirusTotal has never seen it"""
+    return await virustotal.get_json(f"/files/{hash_value}")
+
+
+async def _virustotal_batch(values):
+    # VirusTotal v3 has no multi-file report endpoint, so its batches hold one hash
+    (hash_value,) = values
+    return {hash_value: await lookup_hash(hash_value)}
+
+
+virustotal_scheduler = EnrichmentScheduler(
+    "virustotal",
+    _virustotal_batch,
+    rate_per_second=settings.virustotal_requests_per_minute / 60.0,
+    burst=settings.virustotal_burst,
+    batch_size=1,
+    is_rate_limited=lambda exc: isinstance(exc, EnrichmentError) and exc.status_code == 429,
+)
+
+virustotal_cache = EnrichmentCache(virustotal_scheduler.submit, SessionLocal, settings.enrichment_ttl_seconds,
+                                   settings.enrichment_cache_size)
+
+
+async def enrich_hash(hash_value: str, priority: int = Priority.DEFAULT) -> Optional[Dict[str, Any]]:
+    """Cached VirusTotal report for a hash, or None if VirusTotal has never seen it"""
+    return await virustotal_cache.get(hash_value, priority)
+
+
+async def lookup_many(hashes: Iterable[str], priority: int = Priority.DEFAULT) -> Dict[str, Any]:
+    """Enrich hashes concurrently; each value is a report, None, or the EnrichmentError raised"""
+    unique = list(dict.fromkeys(hashes))
+    results = await asyncio.gather(*(enrich_hash(h, priority) for h in unique), return_exceptions=True)
+    return dict(zip(unique, results))
+
+
+async def aclose() -> None:
+    """Stop the schedulers and close pooled connections; called on application shutdown"""
+    await virustotal_scheduler.aclose()
+    await virustotal.aclose()
+
+
+def stats() -> Dict[str, Any]:
+    """Scheduler and cache counters for the metrics endpoint"""
+    return {
+        "virustotal": {
+            "scheduler": virustotal_scheduler.stats(),
+            "cache": {**virustotal_cache.stats, "memory_entries": len(virustotal_cache.memory),
+                      "collapsed": virustotal_cache.flight.collapsed},
+        }
+    }
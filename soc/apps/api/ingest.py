@@ -0,0 +1,122 @@
+"""
+Streaming NDJSON alert ingestion
+
+Bulk clients post alerts as newline-delimited JSON, optionally gzip
+compressed. The body is decompressed and split into lines as it arrives, and
+parsed alerts are handed on in fixed-size batches, so a large upload is never
+held in memory whole and the first batch is being correlated while the rest is
+still on the wire.
+"""
+
+import json
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+GZIP_MAGIC = b"\x1f\x8b"
+MAX_REPORTED_ERRORS = 20
+
+
+class IngestError(ValueError):
+    """The upload itself is unreadable (bad compression, oversized line)"""
+
+
+@dataclass
+class IngestStats:
+    lines: int = 0
+    alerts: int = 0
+    rejected: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    def reject(self, line: int, reason: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": reason})
+
+
+class NDJSONDecoder:
+    """Incremental gzip/plain NDJSON decoder; feed() raw body chunks, get alert dicts back"""
+
+    def __init__(self, gzip: Optional[bool] = None, max_line_bytes: int = 1 << 20):
+        self.gzip = gzip  # None: detect from the first bytes
+        self.max_line_bytes = max_line_bytes
+        self.stats = IngestStats()
+        self._inflate = None
+        self._buffer = b""
+
+    def feed(self, chunk: bytes) -> List[Dict[str, Any]]:
+        if not chunk:
+            return []
+        if self.gzip is None:
+            self.gzip = chunk[:2] == GZIP_MAGIC
+        if self.gzip:
+            if self._inflate is None:
+                self._inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            try:
+                data = self._inflate.decompress(chunk)
+                # Clients may append one gzip member per batch they send
+                while self._inflate.eof and self._inflate.unused_data:
+                    rest = self._inflate.unused_data
+                    self._inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    data += self._inflate.decompress(rest)
+            except zlib.error as e:
+                raise IngestError(f"invalid gzip stream: {e}") from e
+            chunk = data
+        return self._split(self._buffer + chunk)
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Flush the final line, which may lack a trailing newline"""
+        tail = self._buffer
+        if self._inflate is not None:
+            try:
+                tail += self._inflate.flush()
+            except zlib.error as e:
+                raise IngestError(f"invalid gzip stream: {e}") from e
+            if not self._inflate.eof:
+                raise IngestError("truncated gzip stream")
+        self._buffer = b""
+        alerts = self._split(tail)
+        if self._buffer:
+            alerts.extend(self._parse([self._buffer]))
+            self._buffer = b""
+        return alerts
+
+    def _split(self, data: bytes) -> List[Dict[str, Any]]:
+        lines = data.split(b"\n")
+        self._buffer = lines.pop()
+        if len(self._buffer) > self.max_line_bytes:
+            raise IngestError(f"line {self.stats.lines + len(lines) + 1} exceeds {self.max_line_bytes} bytes")
+        return self._parse(lines)
+
+    def _parse(self, lines: List[bytes]) -> List[Dict[str, Any]]:
+        alerts = []
+        for line in lines:
+            self.stats.lines += 1
+            if not line.strip():
+                continue
+            try:
+                alert = json.loads(line)
+            except ValueError as e:
+                self.stats.reject(self.stats.lines, f"invalid JSON: {e}")
+                continue
+            if not isinstance(alert, dict):
+                self.stats.reject(self.stats.lines, "alert must be a JSON object")
+                continue
+            alerts.append(alert)
+        self.stats.alerts += len(alerts)
+        return alerts
+
+
+async def alert_batches(chunks: AsyncIterator[bytes], decoder: NDJSONDecoder,
+                        batch_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Regroup a streamed NDJSON body into lists of at most batch_size alerts"""
+    batch: List[Dict[str, Any]] = []
+    async for chunk in chunks:
+        batch.extend(decoder.feed(chunk))
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    batch.extend(decoder.close())
+    while batch:
+        yield batch[:batch_size]
+        batch = batch[batch_size:]
@@ -0,0 +1,243 @@
+"""
+Durable background jobs
+
+Long-running work (automated incident response) is recorded as a row in the
+jobs table and picked up by a pool of worker tasks, so the request that
+submitted it returns immediately. Workers claim a job with a conditional
+UPDATE (and SKIP LOCKED where the database supports it), so several workers
+and several API processes can drain the same queue. A claim holds a lease;
+if a worker dies mid-job, the job goes back to the queue once the lease runs
+out, up to max_attempts. While a handler runs, its worker renews the lease
+every lease_seconds / 3, so a slow job is not handed to a second worker.
+Handler failures are final: response playbooks are not idempotent, so they
+are not re-run automatically. Outcomes are written only by the claim that
+is still current, so a worker that lost its lease cannot overwrite the
+result of the one that took the job over.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """Job table operations; every method opens its own short session.
+
+    `session_factory` makes AsyncSessions (database.AsyncSessionLocal).
+    """
+
+    def __init__(self, session_factory, lease_seconds: float = 300, max_attempts: int = 3):
+        self.session_factory = session_factory
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    async def enqueue(self, db: AsyncSession, kind: str, payload: Dict[str, Any], user_sub: str, client_ip: str) -> Job:
+        """Insert a queued job in the caller's session and commit it"""
+        job = Job(kind=kind, status=QUEUED, payload=json.dumps(payload, default=str), attempts=0,
+                  user_sub=user_sub, client_ip=client_ip)
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    def _claimable(self, now: datetime):
+        return or_(
+            Job.status == QUEUED,
+            and_(Job.status == RUNNING, Job.lease_expires_at < now, Job.attempts < self.max_attempts),
+        )
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        """Take the oldest claimable job, or None if the queue is empty"""
+        now = _now()
+        async with self.session_factory() as db:
+            try:
+                return await self._claim(db, now)
+            except Exception:
+                await db.rollback()
+                raise
+
+    async def _claim(self, db: AsyncSession, now: datetime) -> Optional[Dict[str, Any]]:
+        # Jobs whose worker died too often are given up on
+        await db.execute(
+            update(Job)
+            .where(Job.status == RUNNING, Job.lease_expires_at < now, Job.attempts >= self.max_attempts)
+            .values(status=FAILED, finished_at=now, error="worker lease expired too many times")
+        )
+        candidates = (await db.execute(
+            select(Job.id)
+            .where(self._claimable(now))
+            .order_by(Job.id)
+            .limit(8)
+            .with_for_update(skip_locked=True)
+        )).scalars().all()
+        for job_id in candidates:
+            claimed = await db.execute(
+                update(Job)
+                .where(Job.id == job_id, self._claimable(now))
+                .values(status=RUNNING, attempts=Job.attempts + 1, started_at=now,
+                        lease_expires_at=now + timedelta(seconds=self.lease_seconds))
+            )
+            if claimed.rowcount == 1:  # otherwise another worker got there first
+                await db.commit()
+                job = await db.get(Job, job_id)
+                return {
+                    "id": job.id,
+                    "kind": job.kind,
+                    "payload": json.loads(job.payload) if job.payload else {},
+                    "user_sub": job.user_sub,
+                    "client_ip": job.client_ip,
+                    "attempts": job.attempts,
+                }
+        await db.commit()
+        return None
+
+    def _held(self, job: Dict[str, Any]):
+        """The claim `job` (as returned by claim()) is still the current one"""
+        return and_(Job.id == job["id"], Job.attempts == job["attempts"], Job.status == RUNNING)
+
+    async def renew(self, job: Dict[str, Any]) -> bool:
+        """Extend the lease of a claimed job; False if it has been taken over or finished"""
+        async with self.session_factory() as db:
+            renewed = await db.execute(update(Job).where(self._held(job))
+                                       .values(lease_expires_at=_now() + timedelta(seconds=self.lease_seconds)))
+            await db.commit()
+            return renewed.rowcount == 1
+
+    async def _finish(self, job: Dict[str, Any], **values: Any) -> bool:
+        async with self.session_factory() as db:
+            finished = await db.execute(update(Job).where(self._held(job))
+                                        .values(finished_at=_now(), lease_expires_at=None, **values))
+            await db.commit()
+            return finished.rowcount == 1
+
+    async def complete(self, job: Dict[str, Any], result: Any) -> bool:
+        """Record a claimed job's result; False if the claim is no longer current"""
+        return await self._finish(job, status=SUCCEEDED, result=json.dumps(result, default=str), error=None)
+
+    async def fail(self, job: Dict[str, Any], error: str) -> bool:
+        """Record a claimed job's error; False if the claim is no longer current"""
+        return await self._finish(job, status=FAILED, error=error)
+
+
+def job_status(job: Job) -> Dict[str, Any]:
+    """Public view of a job row, without its result"""
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class JobWorkerPool:
+    """Worker tasks draining a JobQueue on the running event loop"""
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, JobHandler], concurrency: int,
+                 poll_interval: float = 2.0):
+        self.queue = queue
+        self.handlers = handlers
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        # lost: outcomes not written because another worker had taken the job over
+        self.counters = {"succeeded": 0, "failed": 0, "lost": 0}
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work(), name=f"job-worker-{n}") for n in range(self.concurrency)]
+
+    def notify(self) -> None:
+        """Wake idle workers after a job was enqueued in this process"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _work(self) -> None:
+        while True:
+            # Clear before looking, so a job enqueued while we look still wakes us
+            self._wakeup.clear()
+            try:
+                job = await self.queue.claim()
+            except Exception as e:
+                logger.error(f"Claiming a job failed: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._execute(job)
+
+    async def _heartbeat(self, job: Dict[str, Any]) -> None:
+        """Keep renewing the job's lease until cancelled"""
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                if not await self.queue.renew(job):
+                    logger.warning(f"Job {job['id']} lost its lease while running")
+                    return
+            except Exception as e:
+                logger.error(f"Renewing the lease of job {job['id']} failed: {e}")
+
+    async def _execute(self, job: Dict[str, Any]) -> None:
+        handler = self.handlers.get(job["kind"])
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        error = None
+        try:
+            if handler is None:
+                raise LookupError(f"no handler for job kind '{job['kind']}'")
+            result = await handler(job)
+        except Exception as e:
+            logger.error(f"Job {job['id']} ({job['kind']}) failed: {e}")
+            error = str(e) or type(e).__name__
+        finally:
+            heartbeat.cancel()
+        # A renewal still in flight would otherwise land after the outcome
+        await asyncio.gather(heartbeat, return_exceptions=True)
+
+        if error is None:
+            outcome, written = "succeeded", await self.queue.complete(job, result)
+        else:
+            outcome, written = "failed", await self.queue.fail(job, error)
+        if not written:
+            logger.warning(f"Job {job['id']} was taken over by another worker; its outcome was not recorded")
+        self.counters[outcome if written else "lost"] += 1
+
+    async def stop(self) -> None:
+        """Cancel the workers; jobs they were running are retried after their lease expires"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
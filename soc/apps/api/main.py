@@ -1,5 +1,7 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.middleware import SlowAPIMiddleware
@@ -7,12 +9,20 @@ from slowapi.errors import RateLimitExceeded
 from routers.auth import router as auth_router
 from routers.tools import router as tools_router
 from routers.actions import router as actions_router
-from routers.metrics import router as metrics_router
+from routers.metrics import router as metrics_router, metric_retention
 from routers.audit import router as audit_router
-from routers.incidents import router as incidents_router
+from routers.incidents import router as incidents_router, similarity_index, alert_correlator
 from routers.export import router as export_router
+from routers.playbooks import router as playbooks_router, blocked_indicators, job_workers
+from routers.ai import incident_analysis_service
 from websocket import websocket_status_endpoint
 from config import settings
+from database import AsyncSessionLocal, SessionLocal, async_engine
+from similarity import rebuild_from_db
+from correlation import flush_periodically, write_counts
+from metric_rollup import retain_periodically
+import containment
+import enrichment
 
 app = FastAPI(title="CyberBlue SOC API", version="1.0.0")
 
@@ -37,6 +47,33 @@ app.include_router(metrics_router, prefix="/api", tags=["metrics"])
 app.include_router(audit_router, prefix="/api", tags=["audit"])
 app.include_router(incidents_router, prefix="/api", tags=["incidents"])
 app.include_router(export_router, prefix="/api", tags=["export"])
+app.include_router(playbooks_router, prefix="/api", tags=["playbooks"])
+
+@app.on_event("startup")
+async def startup_event():
+    # Load ML models in the background so the server accepts requests right away
+    app.state.warm_up_task = asyncio.create_task(asyncio.to_thread(incident_analysis_service.warm_up))
+    app.state.similarity_rebuild_task = asyncio.create_task(
+        asyncio.to_thread(rebuild_from_db, similarity_index, SessionLocal)
+    )
+    app.state.correlation_flush_task = asyncio.create_task(
+        flush_periodically(alert_correlator, SessionLocal, settings.alert_correlation_flush_seconds)
+    )
+    app.state.blocklist_load_task = asyncio.create_task(asyncio.to_thread(blocked_indicators.load, SessionLocal))
+    app.state.metric_retention_task = asyncio.create_task(
+        retain_periodically(metric_retention, AsyncSessionLocal, settings.metrics_rollup_interval_seconds)
+    )
+    job_workers.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await job_workers.stop()
+    app.state.correlation_flush_task.cancel()
+    app.state.metric_retention_task.cancel()
+    await asyncio.to_thread(write_counts, alert_correlator.drain(), SessionLocal)
+    await enrichment.aclose()
+    await containment.aclose()
+    await async_engine.dispose()
 
 @app.get("/")
 async def root():
@@ -44,7 +81,14 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
+    return {"status": "healthy", "ml_ready": incident_analysis_service.ready}
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until background model warm-up has finished"""
+    if not incident_analysis_service.ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready"}
 
 @app.websocket("/ws/status")
 async def websocket_status(websocket):
@@ -0,0 +1,329 @@
+"""
+Downsampling and retention tiers for metric time series
+
+Tools write one raw row per sample and nothing used to prune them, so the
+metrics table and every historical query over it grew without bound.
+MetricRetention keeps three tiers per series (tool) and metric (column):
+
+- raw samples, kept for raw_retention seconds;
+- 1-minute aggregates (min, max, sum and count, so averages compose),
+  kept for minute_retention seconds;
+- 1-hour aggregates built from the minute tier, kept for hour_retention
+  seconds (None keeps them forever).
+
+run() is incremental: each tier resumes after the last bucket it holds and
+only closes buckets older than `grace`, so a late sample still lands in its
+minute; it rolls up at most CATCH_UP seconds of samples from the first one
+not rolled up yet, so a backlog is worked off over several runs and a gap in
+the samples costs none. Raw rows and minute aggregates are deleted in
+batches of `batch_size`, one transaction each, and never before the hour
+tier covers them.
+
+history() answers a time range from the coarsest tier that still gives
+`min_points` buckets over it and holds data back to its start. The part of
+the range a tier has not rolled up yet is aggregated on the fly from the raw
+samples, with the same bucketing expression. Given max_points, it merges the
+tier's buckets further into wider ones, still in SQL, for charts.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import BigInteger, and_, delete, func, insert, literal, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+logger = logging.getLogger(__name__)
+
+MINUTE = 60
+HOUR = 3600
+CATCH_UP = 86400
+
+
+class time_bucket(FunctionElement):
+    """Start of the `seconds`-wide bucket holding a timestamp, in seconds since 1970 (UTC)"""
+    type = BigInteger()
+    inherit_cache = True
+    name = "time_bucket"
+    # The width is rendered inline, so it has to be part of the statement cache key
+    _traverse_internals = FunctionElement._traverse_internals + [("seconds", InternalTraversal.dp_plain_obj)]
+
+    def __init__(self, timestamp, seconds: int):
+        self.seconds = seconds
+        super().__init__(timestamp)
+
+
+@compiles(time_bucket)
+def _time_bucket(element, compiler, **kw):
+    timestamp = compiler.process(element.clauses, **kw)
+    return f"CAST(floor(EXTRACT(EPOCH FROM {timestamp}) / {element.seconds:d}) * {element.seconds:d} AS BIGINT)"
+
+
+@compiles(time_bucket, "sqlite")
+def _time_bucket_sqlite(element, compiler, **kw):
+    timestamp = compiler.process(element.clauses, **kw)
+    return f"(CAST(strftime('%s', {timestamp}) AS INTEGER) / {element.seconds:d} * {element.seconds:d})"
+
+
+class bucket_floor(FunctionElement):
+    """Start of the `seconds`-wide bucket holding a bucket start of a finer tier"""
+    type = BigInteger()
+    inherit_cache = True
+    name = "bucket_floor"
+    _traverse_internals = FunctionElement._traverse_internals + [("seconds", InternalTraversal.dp_plain_obj)]
+
+    def __init__(self, bucket, seconds: int):
+        self.seconds = seconds
+        super().__init__(bucket)
+
+
+@compiles(bucket_floor)
+def _bucket_floor(element, compiler, **kw):
+    # Integer division on both PostgreSQL and SQLite; the widths are inlined so the
+    # expression reads the same in the select list and in GROUP BY
+    return f"({compiler.process(element.clauses, **kw)} / {element.seconds:d} * {element.seconds:d})"
+
+
+@dataclass
+class Series:
+    """A raw metrics table: timestamped rows, optionally one series per `key` value"""
+    table: Any
+    timestamp: Any
+    values: Dict[str, Any]  # metric name -> column
+    key: Any = None  # e.g. tool_name; None for a single series
+
+
+@dataclass
+class Point:
+    """One bucket of a series (or one raw sample, with count 1)"""
+    bucket: int  # seconds since 1970
+    min: float
+    max: float
+    sum: float
+    count: int
+
+    @property
+    def avg(self) -> float:
+        return self.sum / self.count
+
+
+class MetricRetention:
+    """Rolls a Series into minute and hour aggregates and prunes the older tiers"""
+
+    def __init__(self, series: Series, rollup, raw_retention: float, minute_retention: float,
+                 hour_retention: Optional[float] = None, batch_size: int = 5000, min_points: int = 100,
+                 grace: float = 60):
+        self.series = series
+        self.rollup = rollup  # model with resolution, bucket, series, metric, min, max, sum, count
+        self.retention = {0: raw_retention, MINUTE: minute_retention, HOUR: hour_retention}
+        self.batch_size = batch_size
+        self.min_points = min_points
+        self.grace = grace
+        self.counters = {"runs": 0, "minute_rows": 0, "hour_rows": 0, "raw_deleted": 0, "minute_deleted": 0,
+                         "failures": 0, "last_run_ms": 0.0}
+
+    def _datetime(self, seconds: float) -> datetime:
+        """Bind value for the raw timestamp column"""
+        value = datetime.fromtimestamp(seconds, timezone.utc)
+        return value if getattr(self.series.timestamp.type, "timezone", False) else value.replace(tzinfo=None)
+
+    async def watermark(self, db: AsyncSession, resolution: int) -> Optional[int]:
+        """End of the last bucket rolled up at `resolution`"""
+        last = await db.scalar(select(func.max(self.rollup.bucket)).where(self.rollup.resolution == resolution))
+        return None if last is None else last + resolution
+
+    async def _roll_minutes(self, db: AsyncSession, now: float) -> int:
+        series = self.series
+        end = int(now - self.grace) // MINUTE * MINUTE
+        # Resume at the first sample not rolled up yet rather than at the watermark,
+        # so a gap in the samples longer than CATCH_UP is skipped, not retried forever
+        first = select(time_bucket(func.min(series.timestamp), MINUTE))
+        watermark = await self.watermark(db, MINUTE)
+        if watermark is not None:
+            first = first.where(series.timestamp >= self._datetime(watermark))
+        start = await db.scalar(first)
+        if start is None or start >= end:
+            return 0
+        # A backlog (the first run over existing samples) is worked off a day per run
+        end = min(end, start + CATCH_UP)
+
+        bucket = time_bucket(series.timestamp, MINUTE)
+        # Inlined rather than bound, so the key reads the same in the select list and in GROUP BY
+        key = func.coalesce(series.key, literal_column("''")) if series.key is not None else None
+        in_range = and_(series.timestamp >= self._datetime(start), series.timestamp < self._datetime(end))
+        rows = 0
+        for metric, column in series.values.items():
+            aggregate = (
+                select(literal(MINUTE), bucket, literal_column("''") if key is None else key, literal(metric),
+                       func.min(column), func.max(column), func.sum(column), func.count(column))
+                .where(in_range)
+                .group_by(*[expression for expression in (bucket, key) if expression is not None])
+                .having(func.count(column) > 0)
+            )
+            result = await db.execute(insert(self.rollup).from_select(self._columns(), aggregate))
+            rows += max(result.rowcount or 0, 0)
+        return rows
+
+    async def _roll_hours(self, db: AsyncSession) -> int:
+        minutes_end = await self.watermark(db, MINUTE)
+        if minutes_end is None:
+            return 0
+        end = minutes_end // HOUR * HOUR
+        start = await self.watermark(db, HOUR)
+        if start is None:
+            first = await db.scalar(select(func.min(self.rollup.bucket)).where(self.rollup.resolution == MINUTE))
+            start = first // HOUR * HOUR
+        if start >= end:
+            return 0
+
+        r = self.rollup
+        hour = bucket_floor(r.bucket, HOUR)
+        aggregate = (
+            select(literal(HOUR), hour, r.series, r.metric, func.min(r.min), func.max(r.max),
+                   func.sum(r.sum), func.sum(r.count))
+            .where(r.resolution == MINUTE, r.bucket >= start, r.bucket < end)
+            .group_by(hour, r.series, r.metric)
+        )
+        result = await db.execute(insert(r).from_select(self._columns(), aggregate))
+        return max(result.rowcount or 0, 0)
+
+    def _columns(self) -> List[str]:
+        return ["resolution", "bucket", "series", "metric", "min", "max", "sum", "count"]
+
+    async def _delete_raw(self, db: AsyncSession, before: float) -> int:
+        table, timestamp = self.series.table, self.series.timestamp
+        cutoff = self._datetime(before)
+        deleted = 0
+        while True:
+            batch = select(table.c.id).where(timestamp < cutoff).limit(self.batch_size).scalar_subquery()
+            result = await db.execute(delete(table).where(table.c.id.in_(batch)))
+            await db.commit()
+            deleted += result.rowcount
+            if result.rowcount < self.batch_size:
+                return deleted
+
+    async def _delete_rollups(self, db: AsyncSession, resolution: int, before: float) -> int:
+        """Delete aggregates older than `before`, an hour of buckets per transaction"""
+        r = self.rollup
+        before = int(before) // resolution * resolution
+        oldest = await db.scalar(select(func.min(r.bucket)).where(r.resolution == resolution))
+        deleted = 0
+        while oldest is not None and oldest < before:
+            upto = min(oldest + HOUR, before)
+            result = await db.execute(delete(r).where(r.resolution == resolution, r.bucket < upto))
+            await db.commit()
+            deleted += result.rowcount
+            oldest = upto
+        return deleted
+
+    async def run(self, db: AsyncSession, now: Optional[float] = None) -> Dict[str, int]:
+        """Roll up new samples, then prune each tier past its retention"""
+        now = time.time() if now is None else now
+        started = time.perf_counter()
+        done = {"minute_rows": await self._roll_minutes(db, now)}
+        done["hour_rows"] = await self._roll_hours(db)
+        await db.commit()
+
+        # Raw samples and minute aggregates go only once the hour tier holds them
+        covered = await self.watermark(db, HOUR) or 0
+        done["raw_deleted"] = await self._delete_raw(db, min(now - self.retention[0], covered))
+        done["minute_deleted"] = await self._delete_rollups(db, MINUTE, min(now - self.retention[MINUTE], covered))
+        if self.retention[HOUR] is not None:
+            await self._delete_rollups(db, HOUR, now - self.retention[HOUR])
+
+        self.counters["runs"] += 1
+        for name, count in done.items():
+            self.counters[name] += count
+        self.counters["last_run_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return done
+
+    def pick_tier(self, start: float, end: float, now: Optional[float] = None) -> int:
+        """Coarsest resolution with min_points buckets over [start, end) that still holds `start`"""
+        now = time.time() if now is None else now
+        held = [resolution for resolution, retention in self.retention.items()
+                if retention is None or now - retention <= start]
+        for resolution in sorted(held, reverse=True):
+            if resolution == 0 or (end - start) / resolution >= self.min_points:
+                return resolution
+        # Nothing fine enough reaches back that far: the finest tier that does
+        return min(held) if held else HOUR
+
+    @staticmethod
+    def bucket_width(resolution: int, start: float, end: float, max_points: int) -> int:
+        """Narrowest multiple of `resolution` (whole seconds for raw samples) giving at most max_points buckets"""
+        step = resolution or 1
+        return max(math.ceil((end - start) / max_points / step), 1) * step
+
+    async def history(self, db: AsyncSession, metric: str, start: float, end: Optional[float] = None,
+                      key: Optional[str] = None, resolution: Optional[int] = None,
+                      now: Optional[float] = None, max_points: Optional[int] = None) -> Tuple[int, List[Point]]:
+        """Points of `metric` over [start, end) and the width of their buckets (0: raw samples)
+
+        With max_points, the tier's buckets (or raw samples) are merged in SQL
+        into wider epoch-aligned buckets, so at most about max_points come back.
+        """
+        now = time.time() if now is None else now
+        end = now if end is None else end
+        resolution = self.pick_tier(start, end, now) if resolution is None else resolution
+        width = resolution if max_points is None else self.bucket_width(resolution, start, end, max_points)
+        series, column = self.series, self.series.values[metric]
+
+        def raw_filter(query, since: float):
+            query = query.where(series.timestamp >= self._datetime(since), series.timestamp < self._datetime(end),
+                                column.isnot(None))
+            if key is not None and series.key is not None:
+                query = query.where(series.key == key)
+            return query
+
+        if width == 0:
+            sample = time_bucket(series.timestamp, 1)
+            rows = (await db.execute(raw_filter(select(sample, column), start).order_by(series.timestamp))).all()
+            return 0, [Point(at, value, value, value, 1) for at, value in rows]
+
+        points = []
+        rolled_until = start
+        if resolution:
+            r = self.rollup
+            rolled_until = min(await self.watermark(db, resolution) or start, end)
+            bucket = bucket_floor(r.bucket, width) if width != resolution else r.bucket
+            stored = select(bucket, func.min(r.min), func.max(r.max), func.sum(r.sum), func.sum(r.count)) \
+                .where(r.resolution == resolution, r.metric == metric,
+                       r.bucket >= start // resolution * resolution, r.bucket < rolled_until)
+            if key is not None:
+                stored = stored.where(r.series == key)
+            points = [Point(*row) for row in (await db.execute(stored.group_by(bucket).order_by(bucket))).all()]
+
+        if rolled_until < end:
+            bucket = time_bucket(series.timestamp, width)
+            live = raw_filter(select(bucket, func.min(column), func.max(column), func.sum(column), func.count(column)),
+                              max(start, rolled_until))
+            live = [Point(*row) for row in (await db.execute(live.group_by(bucket).order_by(bucket))).all()]
+            if points and live and points[-1].bucket == live[0].bucket:
+                # A wide bucket straddling the watermark: part stored, part still raw
+                last, first = points.pop(), live[0]
+                live[0] = Point(last.bucket, min(last.min, first.min), max(last.max, first.max),
+                                last.sum + first.sum, last.count + first.count)
+            points += live
+        return width, points
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters)
+
+
+async def retain_periodically(retention: MetricRetention, session_factory, interval: float) -> None:
+    """Background task: run() every `interval` seconds"""
+    while True:
+        try:
+            async with session_factory() as db:
+                await retention.run(db)
+        except Exception as e:
+            retention.counters["failures"] += 1
+            logger.error(f"Metric rollup failed: {e}")
+        await asyncio.sleep(interval)
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Text, Date, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
+import audit_rollup
+import audit_search
 
 
 class User(Base):
@@ -53,14 +55,40 @@ class AuditLog(Base):
     action = Column(String)
     resource = Column(String)
     details = Column(Text)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    # Filters on action or user, newest first
+    __table_args__ = (
+        Index("ix_audit_logs_action_created_at", "action", "created_at"),
+        Index("ix_audit_logs_user_sub_created_at", "user_sub", "created_at"),
+    )
+
+
+# Full-text index over action, resource and details, maintained by the database
+audit_search.attach(AuditLog.__table__)
+
+
+class AuditRollup(Base):
+    """Audit entries per UTC day, action and user, maintained by triggers on audit_logs"""
+    __tablename__ = "audit_rollups"
+
+    day = Column(Date, primary_key=True)
+    action = Column(String, primary_key=True)
+    user_sub = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    # Stored in key order on SQLite, so a range of days is read without index lookups
+    __table_args__ = {"sqlite_with_rowid": False}
+
+
+audit_rollup.attach(AuditRollup.__table__, AuditLog.__table__)
 
 
 class Metric(Base):
     __tablename__ = "metrics"
 
     id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     cpu_usage = Column(Integer)  # Percentage
     memory_usage = Column(Integer)  # Percentage
     disk_usage = Column(Integer)  # Percentage
@@ -71,6 +99,31 @@ class Metric(Base):
     tool_name = Column(String)  # Which tool this metric relates to
     tool_status = Column(String)  # Current status of the tool
 
+    # One tool's series over a time range
+    __table_args__ = (
+        Index("ix_metrics_tool_name_timestamp", "tool_name", "timestamp"),
+    )
+
+
+class MetricRollup(Base):
+    """Per-minute and per-hour aggregates of the metrics table (see metric_rollup.py)"""
+    __tablename__ = "metric_rollups"
+
+    resolution = Column(Integer, primary_key=True)  # Seconds per bucket
+    series = Column(String, primary_key=True)  # Tool name
+    metric = Column(String, primary_key=True)  # Metric column
+    bucket = Column(BigInteger, primary_key=True)  # Bucket start, seconds since 1970 (UTC)
+    min = Column(Float)
+    max = Column(Float)
+    sum = Column(Float)
+    count = Column(Integer)
+
+    # Newest bucket per resolution: where the next rollup resumes
+    __table_args__ = (
+        Index("ix_metric_rollups_resolution_bucket", "resolution", "bucket"),
+        {"sqlite_with_rowid": False},
+    )
+
 
 class Incident(Base):
     __tablename__ = "incidents"
@@ -80,11 +133,17 @@ class Incident(Base):
     description = Column(Text)
     severity = Column(String)  # low, medium, high, critical
     status = Column(String, default="open")  # open, investigating, resolved, closed
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     assigned_to = Column(String)  # User sub
     tags = Column(String)  # JSON array of tags
 
+    # Listings filtered by status or severity, newest first
+    __table_args__ = (
+        Index("ix_incidents_status_created_at", "status", "created_at"),
+        Index("ix_incidents_severity_created_at", "severity", "created_at"),
+    )
+
 
 class IOC(Base):
     __tablename__ = "iocs"
@@ -98,4 +157,30 @@ class IOC(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     last_seen = Column(DateTime(timezone=True))
     confidence = Column(Integer, default=50)  # 0-100
-    tags = Column(String)  # JSON array of tags
\ No newline at end of file
+    tags = Column(String)  # JSON array of tags
+    verdict = Column(String)  # Enrichment verdict: malicious, suspicious, harmless, unknown
+    details = Column(Text)  # Provider report (JSON)
+    expires_at = Column(DateTime(timezone=True))  # When the cached enrichment goes stale
+
+    # Indicator lookups: enrichment cache, blocklist confirmation
+    __table_args__ = (
+        Index("ix_iocs_type_value", "type", "value"),
+    )
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String)  # Handler name, e.g. auto_incident_response
+    status = Column(String, default="queued", index=True)  # queued, running, succeeded, failed
+    payload = Column(Text)  # JSON
+    result = Column(Text)  # JSON
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    user_sub = Column(String)  # Who enqueued it
+    client_ip = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    lease_expires_at = Column(DateTime(timezone=True))  # Running jobs past this are reclaimed
@@ -0,0 +1,188 @@
+"""
+Declarative playbook engine
+
+A Playbook is a DAG of Steps. Each step starts as soon as every step it
+depends on has succeeded, so independent steps (enrich, block, notify, ...)
+run concurrently on the event loop. Steps carry their own timeout and retry
+policy; a step whose dependency failed is skipped rather than run on missing
+input. Every run records per-step status, attempts and timing.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TIMED_OUT = "timed_out"
+SKIPPED = "skipped"
+
+
+@dataclass
+class PlaybookContext:
+    """Inputs shared by all steps of a run; step outputs are collected in `outputs`"""
+    alert_data: Dict[str, Any]
+    uow: Any = None  # UnitOfWork collecting the run's audit entries and changes
+    extra: Dict[str, Any] = field(default_factory=dict)
+    outputs: Dict[str, Any] = field(default_factory=dict)
+
+
+StepAction = Callable[[PlaybookContext], Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class Step:
+    """One playbook step.
+
+    The action may return a list of action lines, a single line, or None.
+    """
+    name: str
+    action: StepAction
+    depends_on: Sequence[str] = ()
+    timeout: float = 30.0
+    retries: int = 0
+    retry_delay: float = 0.5
+
+
+@dataclass
+class StepResult:
+    name: str
+    status: str = SKIPPED
+    attempts: int = 0
+    started_ms: Optional[float] = None  # offset from the start of the run
+    duration_ms: Optional[float] = None
+    actions: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "attempts": self.attempts,
+            "started_ms": self.started_ms,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+        }
+
+
+@dataclass
+class PlaybookRun:
+    playbook: str
+    steps: Dict[str, StepResult]
+    duration_ms: float
+
+    @property
+    def actions(self) -> List[str]:
+        """Action lines of all steps, in declaration order"""
+        lines = []
+        for result in self.steps.values():
+            lines.extend(result.actions)
+            if result.status in (FAILED, TIMED_OUT):
+                lines.append(f"Step '{result.name}' {result.status}: {result.error}")
+        return lines
+
+    @property
+    def succeeded(self) -> bool:
+        return all(result.status == SUCCEEDED for result in self.steps.values())
+
+    def timings(self) -> Dict[str, Dict[str, Any]]:
+        return {name: result.as_dict() for name, result in self.steps.items()}
+
+
+class Playbook:
+    """Named DAG of steps; validated on construction"""
+
+    def __init__(self, name: str, steps: Iterable[Step]):
+        self.name = name
+        self.steps: Dict[str, Step] = {}
+        for step in steps:
+            if step.name in self.steps:
+                raise ValueError(f"Playbook '{name}': duplicate step '{step.name}'")
+            self.steps[step.name] = step
+        for step in self.steps.values():
+            missing = [dep for dep in step.depends_on if dep not in self.steps]
+            if missing:
+                raise ValueError(f"Playbook '{name}': step '{step.name}' depends on unknown {missing}")
+        self._check_acyclic()
+
+    def _check_acyclic(self) -> None:
+        remaining = {name: set(step.depends_on) for name, step in self.steps.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Playbook '{self.name}': dependency cycle among {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    async def run(self, context: PlaybookContext) -> PlaybookRun:
+        """Execute the DAG; never raises for step failures"""
+        started = time.perf_counter()
+        results = {name: StepResult(name) for name in self.steps}
+        pending = dict(self.steps)
+        running: Dict[asyncio.Task, str] = {}
+
+        def launch_ready() -> None:
+            progressed = True
+            while progressed:  # skipping a step can settle the steps that depend on it
+                progressed = False
+                for name, step in list(pending.items()):
+                    if any(dep in pending or dep in running.values() for dep in step.depends_on):
+                        continue
+                    del pending[name]
+                    progressed = True
+                    failed = [dep for dep in step.depends_on if results[dep].status != SUCCEEDED]
+                    if failed:
+                        results[name].error = f"dependency {', '.join(failed)} did not succeed"
+                    else:
+                        task = asyncio.create_task(self._run_step(step, context, results[name], started))
+                        running[task] = name
+
+        launch_ready()
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                running.pop(task)
+            launch_ready()
+
+        return PlaybookRun(self.name, results, round((time.perf_counter() - started) * 1000, 2))
+
+    async def _run_step(self, step: Step, context: PlaybookContext, result: StepResult, run_started: float) -> None:
+        step_started = time.perf_counter()
+        result.started_ms = round((step_started - run_started) * 1000, 2)
+
+        for attempt in range(1, step.retries + 2):
+            result.attempts = attempt
+            try:
+                output = await asyncio.wait_for(step.action(context), timeout=step.timeout)
+            except asyncio.TimeoutError:
+                result.status, result.error = TIMED_OUT, f"no result after {step.timeout}s"
+            except Exception as e:
+                result.status, result.error = FAILED, str(e) or type(e).__name__
+            else:
+                result.status, result.error = SUCCEEDED, None
+                context.outputs[step.name] = output
+                if isinstance(output, str):
+                    result.actions = [output]
+                elif isinstance(output, list):
+                    result.actions = [line for line in output if isinstance(line, str)]
+                break
+
+            if attempt <= step.retries:
+                logger.warning(f"Playbook {self.name}: step {step.name} attempt {attempt} "
+                               f"{result.status} ({result.error}), retrying")
+                await asyncio.sleep(step.retry_delay * attempt)
+
+        result.duration_ms = round((time.perf_counter() - step_started) * 1000, 2)
+
+
+def note(name: str, message: str, depends_on: Sequence[str] = ()) -> Step:
+    """Step that only records an action line (placeholder for an integration)"""
+    async def action(context: PlaybookContext) -> str:
+        return message
+
+    return Step(name, action, depends_on=depends_on, timeout=5.0)
@@ -0,0 +1,88 @@
+"""
+Connection pool sizing and contention metrics
+
+Engines are created with the pool settings from config, and their pool class
+is wrapped so every checkout is timed: when all connections are in use, a
+request waits in checkout until one is returned or the pool timeout expires.
+Wait percentiles, timeouts and the pool's in-use and overflow counts show
+whether pool_size/max_overflow fit the load.
+"""
+
+import time
+from collections import deque
+from typing import Any, Dict
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+def is_memory_database(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+class PoolMetrics:
+    """Checkout timings of one engine's pool"""
+
+    def __init__(self, name: str, window: int = 1000):
+        self.name = name
+        self.counters = {"checkouts": 0, "timeouts": 0}
+        self.max_wait_ms = 0.0
+        self._waits = deque(maxlen=window)  # recent checkout times in ms
+
+    def record(self, seconds: float, timed_out: bool = False) -> None:
+        wait_ms = seconds * 1000
+        self.counters["timeouts" if timed_out else "checkouts"] += 1
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self._waits.append(wait_ms)
+
+    def pool_class(self, base=QueuePool):
+        """Subclass of `base` reporting checkout times here; survives engine.dispose()"""
+        metrics = self
+
+        class TimedPool(base):
+            def connect(self):
+                started = time.perf_counter()
+                try:
+                    connection = super().connect()
+                except exc.TimeoutError:
+                    metrics.record(time.perf_counter() - started, timed_out=True)
+                    raise
+                metrics.record(time.perf_counter() - started)
+                return connection
+
+        TimedPool.__name__ = f"Timed{base.__name__}"
+        return TimedPool
+
+    def engine_options(self, url: str, settings, asyncio: bool = False) -> Dict[str, Any]:
+        """create_engine()/create_async_engine() pool arguments for `url`"""
+        options = {"pool_pre_ping": settings.db_pool_pre_ping, "pool_recycle": settings.db_pool_recycle_seconds}
+        if is_memory_database(url):
+            # One shared connection (StaticPool/SingletonThreadPool); nothing to size
+            return options
+        options.update(
+            poolclass=self.pool_class(AsyncAdaptedQueuePool if asyncio else QueuePool),
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout_seconds,
+        )
+        return options
+
+    def snapshot(self, engine) -> Dict[str, Any]:
+        pool = getattr(engine, "sync_engine", engine).pool
+        waits = sorted(self._waits)
+
+        def percentile(q):
+            return round(waits[min(len(waits) - 1, int(len(waits) * q))], 2) if waits else 0.0
+
+        stats = {
+            "pool": type(pool).__name__,
+            **self.counters,
+            "checkout_wait_ms": {"p50": percentile(0.5), "p99": percentile(0.99),
+                                 "max": round(self.max_wait_ms, 2)},
+        }
+        if isinstance(pool, QueuePool):
+            stats.update(size=pool.size(), in_use=pool.checkedout(), idle=pool.checkedin(),
+                         overflow=max(0, pool.overflow()))
+        return stats
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 from models import Tool, AuditLog
 from auth import get_current_user, requires_roles
@@ -17,12 +18,13 @@ async def perform_action(
     tool_id: int,
     operation: str,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if operation not in ["start", "stop", "restart"]:
         raise HTTPException(status_code=400, detail="Invalid operation")
 
-    tool = db.query(Tool).filter(Tool.id == tool_id).first()
+    result = await db.execute(select(Tool).where(Tool.id == tool_id))
+    tool = result.scalars().first()
     if not tool:
         raise HTTPException(status_code=404, detail="Tool not found")
 
@@ -35,7 +37,7 @@ async def perform_action(
         new_status = "restarting"
 
     tool.status = new_status
-    db.commit()
+    await db.commit()
 
     # Log the action with IP address
     user_data = get_current_user(request)
@@ -47,6 +49,6 @@ async def perform_action(
         details=f"Changed status to {new_status} from IP {client_ip}"
     )
     db.add(audit_log)
-    db.commit()
+    await db.commit()
 
     return {"message": f"Tool {operation} successful", "status": new_status}
\ No newline at end of file
@@ -1,18 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 from models import AuditLog, Incident
 from auth import get_current_user, requires_roles
-from typing import Dict, Any, List
+from typing import Dict, Any, List, TYPE_CHECKING
 import httpx
 import json
 import logging
 from datetime import datetime
-from sklearn.ensemble import RandomForestClassifier
-import joblib
 import os
-import pandas as pd
-import numpy as np
+
+# The ML stack (sklearn, pandas, numpy, joblib) is imported lazily inside the
+# methods that need it, so importing this router stays cheap at API startup.
+if TYPE_CHECKING:
+    import pandas as pd
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -25,27 +27,61 @@ class IncidentAnalysisService:
         os.makedirs(self.model_dir, exist_ok=True)
         self.model_path = os.path.join(self.model_dir, "incident_classifier.pkl")
         self.model = None
-        self._load_model()
+        self._featurizer = None
+        self.ready = False  # True once warm_up() has finished
+
+    @property
+    def featurizer(self):
+        """Hashed numeric + text featurizer shared by training and inference"""
+        if self._featurizer is None:
+            from text_features import IncidentFeaturizer
+            self._featurizer = IncidentFeaturizer()
+        return self._featurizer
+
+    def warm_up(self) -> None:
+        """Import the ML stack and load the persisted model.
+
+        Blocking; meant to run in a worker thread after the server has started
+        accepting requests. Until it finishes, analyze_incident() falls back to
+        rule-based analysis.
+        """
+        try:
+            import sklearn.linear_model  # noqa: F401 - pay the import cost here, not on the first request
+            import pandas  # noqa: F401
+            self.featurizer  # noqa: B018 - builds the hashing vectorizer
+            self._load_model()
+        except Exception as e:
+            logger.error(f"Incident analysis warm-up failed: {e}")
+        finally:
+            self.ready = True
 
     def _load_model(self):
         """Load trained incident analysis model"""
+        import joblib
+
         if os.path.exists(self.model_path):
             try:
-                self.model = joblib.load(self.model_path)
+                model = joblib.load(self.model_path)
+                if getattr(model, 'n_features_in_', None) != self.featurizer.n_features:
+                    # Trained before the hashed text features existed; retrain instead
+                    logger.warning("Ignoring incident analysis model with an outdated feature layout")
+                    return
+                self.model = model
                 logger.info("Loaded incident analysis model")
             except Exception as e:
                 logger.error(f"Failed to load model: {e}")
                 self.model = None
 
-    async def _load_security_data_from_sources(self, db) -> pd.DataFrame:
+    async def _load_security_data_from_sources(self, db) -> "pd.DataFrame":
         """Load real security data from CyberBlueSOC sources (Wazuh, Suricata, TheHive)"""
-
-        # Import required models
-        from models import Incident, AuditLog, AnomalyDetection, SystemMetrics
+        import pandas as pd
 
         training_data = []
 
         try:
+            # Import required models; a deployment without some of them trains on synthetic data
+            from models import Incident, AuditLog, AnomalyDetection, SystemMetrics
+
             # 1. Load incident data from TheHive/CyberBlueSOC incidents
             incidents_result = await db.execute(
                 select(Incident).order_by(desc(Incident.created_at)).limit(1000)
@@ -80,7 +116,7 @@ class IncidentAnalysisService:
 
             # 4. Load audit logs for behavioral patterns
             audit_result = await db.execute(
-                select(AuditLog).order_by(desc(AuditLog.timestamp)).limit(1000)
+                select(AuditLog).order_by(desc(AuditLog.created_at)).limit(1000)
             )
             audit_logs = audit_result.scalars().all()
 
@@ -124,6 +160,7 @@ class IncidentAnalysisService:
             'affected_systems': 1,  # Default, could be enhanced
             'threat_actor_indicators': 1 if any(word in description for word in ['threat', 'actor', 'attack']) else 0,
             'known_malware_signature': 1 if 'malware' in description or 'signature' in description else 0,
+            'text': ' '.join(filter(None, [incident.title, incident.description, incident.tags])),
             'incident_type': self._classify_incident_type(description, tags)
         }
 
@@ -145,6 +182,7 @@ class IncidentAnalysisService:
             'affected_systems': 1,
             'threat_actor_indicators': 1 if 'anomaly' in description else 0,
             'known_malware_signature': 0,
+            'text': anomaly.description or '',
             'incident_type': self._classify_anomaly_type(anomaly.type, description)
         }
 
@@ -164,6 +202,7 @@ class IncidentAnalysisService:
             'affected_systems': 0,
             'threat_actor_indicators': 0,
             'known_malware_signature': 0,
+            'text': '',
             'incident_type': 'normal'  # Normal system behavior
         }
 
@@ -186,6 +225,7 @@ class IncidentAnalysisService:
             'affected_systems': 1,
             'threat_actor_indicators': 1 if 'security' in action else 0,
             'known_malware_signature': 0,
+            'text': f"{audit_log.action or ''} {audit_log.resource or ''}",
             'incident_type': self._classify_audit_action(action, resource)
         }
 
@@ -237,7 +277,7 @@ class IncidentAnalysisService:
         else:
             return 'normal'
 
-    def _normalize_training_data(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _normalize_training_data(self, df: "pd.DataFrame") -> "pd.DataFrame":
         """Normalize training data features"""
         # Remove outliers and normalize numerical features
         numerical_cols = ['alert_count', 'severity_score', 'login_failure_count',
@@ -247,7 +287,7 @@ class IncidentAnalysisService:
             if col in df.columns:
                 # Clip outliers to 99th percentile
                 upper_limit = df[col].quantile(0.99)
-                df[col] = df[col].clip(upper=None, upper=upper_limit)
+                df[col] = df[col].clip(upper=upper_limit)
 
                 # Normalize to 0-1 range
                 if df[col].max() > 0:
@@ -255,40 +295,17 @@ class IncidentAnalysisService:
 
         return df
 
-    def _create_synthetic_training_data(self) -> pd.DataFrame:
+    def _create_synthetic_training_data(self, n_samples: int = 1000) -> "pd.DataFrame":
         """Create synthetic training data as fallback"""
-        # [existing synthetic data creation code]
-        data = []
-        incident_types = ['malware', 'phishing', 'intrusion', 'data_leak', 'denial_of_service', 'privilege_escalation', 'normal']
-
-        for i in range(1000):
-            incident_type = np.random.choice(incident_types)
-            severity_level = np.random.choice(['low', 'medium', 'high', 'critical'])
-
-            features = {
-                'alert_count': np.random.poisson(5),
-                'severity_score': {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}[severity_level],
-                'has_malware_hash': 1 if incident_type in ['malware', 'phishing'] else 0,
-                'network_traffic_anomaly': np.random.choice([0, 1]),
-                'login_failure_count': np.random.poisson(3),
-                'data_exfiltration_indicators': 1 if incident_type == 'data_leak' else 0,
-                'privilege_change_count': np.random.poisson(2),
-                'hour_of_day': np.random.randint(0, 24),
-                'is_business_hours': 1 if np.random.randint(0, 24) in range(8, 18) else 0,
-                'source_ip_count': np.random.poisson(10),
-                'affected_systems': np.random.poisson(5),
-                'threat_actor_indicators': np.random.choice([0, 1]),
-                'known_malware_signature': 1 if incident_type == 'malware' else 0,
-                'incident_type': incident_type
-            }
-            data.append(features)
+        from datagen import incident_training_frame
 
-        df = pd.DataFrame(data)
-        return df
+        return incident_training_frame(n_samples)
 
     async def train_model(self, db) -> None:
         """Train the incident analysis model using real CyberBlueSOC data"""
         logger.info("Training incident analysis model with CyberBlueSOC security data...")
+        import joblib
+        import numpy as np
 
         try:
             # Load real security data from CyberBlueSOC sources
@@ -298,34 +315,21 @@ class IncidentAnalysisService:
                 logger.warning("Insufficient training data, falling back to synthetic data")
                 df = self._create_synthetic_training_data()
 
-            # Prepare features and labels
-            X = df.drop('incident_type', axis=1)
-            y = df['incident_type']
-
             # Handle class imbalance
             from sklearn.utils import class_weight
+            y = df['incident_type']
             class_weights = class_weight.compute_class_weight('balanced', classes=np.unique(y), y=y)
             class_weight_dict = dict(zip(np.unique(y), class_weights))
 
-            # Train Random Forest model with class weights
-            self.model = RandomForestClassifier(
-                n_estimators=200,
-                random_state=42,
-                max_depth=15,
-                min_samples_split=5,
-                min_samples_leaf=2,
-                class_weight=class_weight_dict,
-                n_jobs=-1  # Use all available cores
-            )
-
-            self.model.fit(X, y)
+            # Linear model fitted batch by batch on the sparse features
+            self.model, validation = self._fit_streaming(df, class_weight=class_weight_dict, epochs=10)
 
             # Save model
             joblib.dump(self.model, self.model_path)
             logger.info(f"Incident analysis model trained with {len(df)} samples and saved")
 
             # Log training statistics
-            self._log_training_stats(X, y)
+            self._log_training_stats(y, validation)
 
         except Exception as e:
             logger.error(f"Failed to train model with real data: {e}")
@@ -335,41 +339,74 @@ class IncidentAnalysisService:
     def _train_with_synthetic_data(self) -> None:
         """Fallback training with synthetic data"""
         logger.info("Training with synthetic data as fallback...")
+        import joblib
 
         df = self._create_synthetic_training_data()
-        X = df.drop('incident_type', axis=1)
-        y = df['incident_type']
-
-        self.model = RandomForestClassifier(
-            n_estimators=100,
-            random_state=42,
-            max_depth=10
-        )
-        self.model.fit(X, y)
+        self.model, _ = self._fit_streaming(df, epochs=5)
 
         joblib.dump(self.model, self.model_path)
         logger.info("Fallback model trained with synthetic data")
 
-    def _log_training_stats(self, X, y) -> None:
+    def _fit_streaming(self, df: "pd.DataFrame", class_weight: Dict[str, float] = None, epochs: int = 5):
+        """Fit a scaler and a linear classifier over the featurizer's batches
+
+        Only one batch of sparse features exists at a time, and the model's
+        size is set by the number of hashed features, so memory does not grow
+        with the number of incidents trained on. Returns the model (a
+        MaxAbsScaler + SGDClassifier pipeline) and progressive-validation
+        (true, predicted) labels: each batch of the first epoch is predicted
+        before the model learns from it.
+        """
+        import numpy as np
+        from sklearn.linear_model import SGDClassifier
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import MaxAbsScaler
+
+        # SGD needs the sources interleaved; the frame holds labels and raw fields only
+        df = df.sample(frac=1, random_state=42).reset_index(drop=True)
+        labels = df['incident_type'].to_numpy()
+        classes = np.unique(labels)
+
+        scaler = MaxAbsScaler()
+        for X in self.featurizer.transform_batches(df):
+            scaler.partial_fit(X)
+
+        classifier = SGDClassifier(loss='log_loss', alpha=1e-5, class_weight=class_weight, random_state=42)
+        validation = ([], [])
+        for epoch in range(epochs):
+            offset = 0
+            for X in self.featurizer.transform_batches(df):
+                X, y = scaler.transform(X), labels[offset:offset + X.shape[0]]
+                offset += X.shape[0]
+                if epoch == 0 and offset > X.shape[0]:
+                    validation[0].extend(y)
+                    validation[1].extend(classifier.predict(X))
+                classifier.partial_fit(X, y, classes=classes)
+
+        return make_pipeline(scaler, classifier), validation
+
+    def _log_training_stats(self, y, validation) -> None:
         """Log training statistics"""
         try:
-            from sklearn.metrics import classification_report
+            import numpy as np
+            from sklearn.metrics import f1_score
             from collections import Counter
 
             # Basic statistics
-            logger.info(f"Training set size: {len(X)} samples")
-            logger.info(f"Feature count: {X.shape[1]}")
+            logger.info(f"Training set size: {len(y)} samples")
+            logger.info(f"Feature count: {self.featurizer.n_features}")
             logger.info(f"Class distribution: {Counter(y)}")
 
-            # Cross-validation score
-            from sklearn.model_selection import cross_val_score
-            cv_scores = cross_val_score(self.model, X, y, cv=5, scoring='f1_macro')
-            logger.info(f"Cross-validation F1-macro: {cv_scores.mean():.3f} (+/- {cv_scores.std() * 2:.3f})")
+            # Progressive validation: batches scored before the model had seen them
+            if validation[0]:
+                score = f1_score(validation[0], validation[1], average='macro')
+                logger.info(f"Progressive validation F1-macro: {score:.3f} ({len(validation[0])} samples)")
 
-            # Feature importance
-            feature_importance = dict(zip(X.columns, self.model.feature_importances_))
-            top_features = sorted(feature_importance.items(), key=lambda x: x[1], reverse=True)[:5]
-            logger.info(f"Top 5 important features: {top_features}")
+            # Largest weights across classes
+            weights = np.abs(self.model[-1].coef_).max(axis=0)
+            top_features = [(self.featurizer.feature_name(i), weights[i])
+                            for i in weights.argsort()[::-1][:5]]
+            logger.info(f"Top 5 weighted features: {top_features}")
 
         except Exception as e:
             logger.warning(f"Could not compute training statistics: {e}")
@@ -381,15 +418,12 @@ class IncidentAnalysisService:
             return self._fallback_analysis(incident_data)
 
         try:
-            # Extract features from incident data
+            # Extract features from incident data into a sparse row
             features = self._extract_features(incident_data)
-
-            # Convert to DataFrame
-            features_df = pd.DataFrame([features])
+            X = self.featurizer.transform([features])
 
             # Predict incident type
-            predictions = self.model.predict(features_df)
-            probabilities = self.model.predict_proba(features_df)
+            probabilities = self.model.predict_proba(X)
 
             # Get confidence scores
             confidence_scores = {cls: prob for cls, prob in zip(self.model.classes_, probabilities[0])}
@@ -430,7 +464,9 @@ class IncidentAnalysisService:
             'source_ip_count': incident_data.get('source_ips', 1),
             'affected_systems': incident_data.get('affected_systems', 1),
             'threat_actor_indicators': 1 if 'threat' in description or 'actor' in description else 0,
-            'known_malware_signature': 1 if 'malware' in description or 'virus' in description else 0
+            'known_malware_signature': 1 if 'malware' in description or 'virus' in description else 0,
+            'text': ' '.join(filter(None, [incident_data.get('title'), incident_data.get('description'),
+                                           incident_data.get('tags')]))
         }
 
     def _severity_to_score(self, severity: str) -> int:
@@ -542,12 +578,12 @@ incident_analysis_service = IncidentAnalysisService()
 async def analyze_incident(
     incident_id: int,
     req: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """AI-powered incident analysis using real-time ML models"""
 
     # Get incident details
-    incident = db.query(Incident).filter(Incident.id == incident_id).first()
+    incident = (await db.execute(select(Incident).where(Incident.id == incident_id))).scalars().first()
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
 
@@ -586,7 +622,7 @@ async def analyze_incident(
         ai_severity = analysis_result.get('severity_assessment')
         if ai_severity != incident.severity:
             incident.severity = ai_severity
-            db.commit()
+            await db.commit()
             analysis_result['severity_updated'] = True
 
     # Broadcast AI analysis result via WebSocket
@@ -614,7 +650,7 @@ async def analyze_incident(
         })
     )
     db.add(audit_log)
-    db.commit()
+    await db.commit()
 
     return {
         "incident_id": incident_id,
@@ -623,13 +659,13 @@ async def analyze_incident(
         "model_source": "CyberBlueSOC_trained"
     }
 
-async def _enrich_incident_data(incident_data: Dict[str, Any], incident: Incident, db) -> None:
+async def _enrich_incident_data(incident_data: Dict[str, Any], incident: Incident, db: AsyncSession) -> None:
     """Enrich incident data with related security context"""
 
     # Get related audit logs
-    recent_audits = db.query(AuditLog).filter(
-        AuditLog.timestamp >= incident.created_at
-    ).limit(10).all()
+    recent_audits = (await db.execute(select(AuditLog).where(
+        AuditLog.created_at >= incident.created_at
+    ).limit(10))).scalars().all()
 
     # Extract security patterns from audit logs
     security_indicators = {
@@ -655,9 +691,9 @@ async def _enrich_incident_data(incident_data: Dict[str, Any], incident: Inciden
     # Get related system metrics if available
     try:
         from models import SystemMetrics
-        recent_metrics = db.query(SystemMetrics).filter(
+        recent_metrics = (await db.execute(select(SystemMetrics).where(
             SystemMetrics.timestamp >= incident.created_at
-        ).order_by(SystemMetrics.timestamp.desc()).limit(5).all()
+        ).order_by(SystemMetrics.timestamp.desc()).limit(5))).scalars().all()
 
         if recent_metrics:
             avg_cpu = sum(m.cpu_percent for m in recent_metrics) / len(recent_metrics)
@@ -673,7 +709,7 @@ async def _enrich_incident_data(incident_data: Dict[str, Any], incident: Inciden
 @requires_roles(["admin"])
 async def train_incident_model(
     req: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Train the AI incident analysis model using real CyberBlueSOC security data"""
 
@@ -692,7 +728,7 @@ async def train_incident_model(
             details=f"Trained incident analysis AI model using CyberBlueSOC security data from {client_ip}"
         )
         db.add(audit_log)
-        db.commit()
+        await db.commit()
 
         return {
             "message": "Incident analysis model trained successfully with CyberBlueSOC security data",
@@ -708,7 +744,7 @@ async def train_incident_model(
 async def deploy_model_to_cloud(
     cloud_provider: str = "aws",  # aws, gcp, azure
     req: Request = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Deploy trained model to cloud AI service for scalable inference"""
 
@@ -738,7 +774,7 @@ async def deploy_model_to_cloud(
             details=f"Deployed incident analysis model to {cloud_provider} from {client_ip}"
         )
         db.add(audit_log)
-        db.commit()
+        await db.commit()
 
         return {
             "message": f"Model deployed to {cloud_provider} successfully",
@@ -783,6 +819,7 @@ async def get_incident_analysis_status():
     """Get status of AI incident analysis service"""
 
     return {
+        "ready": incident_analysis_service.ready,
         "model_available": incident_analysis_service.model is not None,
         "model_path": incident_analysis_service.model_path,
         "model_exists": os.path.exists(incident_analysis_service.model_path)
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
-from models import AuditLog
-from typing import List, Dict, Any
+from models import AuditLog, AuditRollup
+from audit_search import RANK_LIMIT, apply_search, search_order, search_terms
+from pagination import InvalidCursor, count_rows, keyset, split_page
+from typing import List, Dict, Any, Optional
+import datetime
 
 router = APIRouter()
 
@@ -15,32 +18,50 @@ async def get_audit_logs(
     search: str = Query(""),
     action: str = Query("all"),
     user: str = Query("all"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None),
+    approximate_count: bool = Query(False),
+    db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
-    """Get paginated audit logs with filtering"""
+    """Get paginated audit logs with filtering
 
-    query = db.query(AuditLog)
+    Pass the returned next_cursor to get the following page; page alone
+    still works but reads every row before the page. Searches are ordered by
+    relevance and paged by page number, with an exact count.
+    """
+
+    query = select(AuditLog)
+    dialect = db.bind.dialect.name
 
     # Apply filters
-    if search:
-        query = query.filter(
-            (AuditLog.action.ilike(f"%{search}%")) |
-            (AuditLog.resource.ilike(f"%{search}%")) |
-            (AuditLog.details.ilike(f"%{search}%"))
-        )
+    query = apply_search(query, AuditLog, dialect, search)
 
     if action != "all":
-        query = query.filter(AuditLog.action == action)
+        query = query.where(AuditLog.action == action)
 
     if user != "all":
-        query = query.filter(AuditLog.user_sub == user)
+        query = query.where(AuditLog.user_sub == user)
 
     # Get total count
-    total_count = query.count()
+    searching = bool(search_terms(search))
+    total_count, count_is_exact = await count_rows(db, query, approximate_count and not searching)
     total_pages = (total_count + per_page - 1) // per_page
 
-    # Apply pagination
-    logs = query.order_by(desc(AuditLog.created_at)).offset((page - 1) * per_page).limit(per_page).all()
+    next_cursor = None
+    if searching:
+        # A search ranks the matches by relevance unless there are too many to score
+        ordering = search_order(AuditLog, dialect, search, rank=total_count <= RANK_LIMIT)
+        result = await db.execute(query.order_by(*ordering).offset((page - 1) * per_page).limit(per_page))
+        logs = result.scalars().all()
+    elif cursor or page == 1:
+        try:
+            query = keyset(query, AuditLog.created_at, AuditLog.id, cursor, per_page)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        logs, next_cursor = split_page((await db.execute(query)).scalars().all(), per_page)
+    else:
+        query = query.order_by(desc(AuditLog.created_at), desc(AuditLog.id))
+        result = await db.execute(query.offset((page - 1) * per_page).limit(per_page + 1))
+        logs, next_cursor = split_page(result.scalars().all(), per_page)
 
     return {
         "logs": [
@@ -54,51 +75,38 @@ async def get_audit_logs(
             }
             for log in logs
         ],
+        "next_cursor": next_cursor,
         "total_pages": total_pages,
         "current_page": page,
-        "total_count": total_count
+        "total_count": total_count,
+        "total_count_exact": count_is_exact
     }
 
 
 @router.get("/audit-logs/summary")
 async def get_audit_summary(
     days: int = Query(7, ge=1, le=90),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
-    """Get audit log summary statistics"""
-
-    import datetime
-    from sqlalchemy import func
-
-    time_ago = datetime.datetime.utcnow() - datetime.timedelta(days=days)
-
-    # Get action counts
-    action_counts = db.query(
-        AuditLog.action,
-        func.count(AuditLog.id).label('count')
-    ).filter(
-        AuditLog.created_at >= time_ago
-    ).group_by(AuditLog.action).all()
-
-    # Get user activity counts
-    user_counts = db.query(
-        AuditLog.user_sub,
-        func.count(AuditLog.id).label('count')
-    ).filter(
-        AuditLog.created_at >= time_ago
-    ).group_by(AuditLog.user_sub).all()
-
-    # Get daily activity
-    daily_activity = db.query(
-        func.date(AuditLog.created_at).label('date'),
-        func.count(AuditLog.id).label('count')
-    ).filter(
-        AuditLog.created_at >= time_ago
-    ).group_by(func.date(AuditLog.created_at)).all()
+    """Get audit log summary statistics
+
+    Read from the daily rollups, so the window is whole UTC days: today and
+    the `days` - 1 days before it.
+    """
+
+    since = datetime.datetime.utcnow().date() - datetime.timedelta(days=days - 1)
+    total = func.sum(AuditRollup.count).label('count')
+
+    def totals(key):
+        return select(key, total).where(AuditRollup.day >= since).group_by(key).having(total > 0)
+
+    action_counts = (await db.execute(totals(AuditRollup.action))).all()
+    user_counts = (await db.execute(totals(AuditRollup.user_sub))).all()
+    daily_activity = (await db.execute(totals(AuditRollup.day).order_by(AuditRollup.day))).all()
 
     return {
         "action_counts": {action: count for action, count in action_counts},
         "user_counts": {user: count for user, count in user_counts},
         "daily_activity": [{"date": str(date), "count": count} for date, count in daily_activity],
         "time_range": f"Last {days} days"
-    }
\ No newline at end of file
+    }
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from auth import get_current_user
 from database import get_db
 from models import User, UserRole, Role
@@ -8,28 +9,27 @@ router = APIRouter()
 
 
 @router.get("/me")
-async def me(request: Request, db: Session = Depends(get_db)):
+async def me(request: Request, db: AsyncSession = Depends(get_db)):
     user_data = get_current_user(request)
     sub = user_data["sub"]
 
     # Get or create user
-    user = db.query(User).filter(User.sub == sub).first()
+    result = await db.execute(select(User).where(User.sub == sub))
+    user = result.scalars().first()
     if not user:
         user = User(
             sub=sub,
             email=user_data.get("email", "")
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
 
     # Get user roles
-    roles = []
-    user_roles = db.query(UserRole).filter(UserRole.user_id == user.id).all()
-    for ur in user_roles:
-        role = db.query(Role).filter(Role.id == ur.role_id).first()
-        if role:
-            roles.append(role.name)
+    result = await db.execute(
+        select(Role.name).join(UserRole, UserRole.role_id == Role.id).where(UserRole.user_id == user.id)
+    )
+    roles = list(result.scalars().all())
 
     return {
         "subject": sub,
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 from models import Tool
 from auth import requires_roles
@@ -14,20 +15,20 @@ router = APIRouter()
 async def export_tools_csv(
     status: str = Query("all", description="Filter by status: all, running, stopped"),
     category: str = Query("all", description="Filter by category"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Export visible tools to CSV format"""
 
     # Build query with filters
-    query = db.query(Tool)
+    query = select(Tool)
 
     if status != "all":
-        query = query.filter(Tool.status == status)
+        query = query.where(Tool.status == status)
 
     if category != "all":
-        query = query.filter(Tool.category == category)
+        query = query.where(Tool.category == category)
 
-    tools = query.all()
+    tools = (await db.execute(query)).scalars().all()
 
     if not tools:
         raise HTTPException(status_code=404, detail="No tools found matching the criteria")
@@ -80,19 +81,19 @@ async def export_tools_csv(
 async def export_tools_json(
     status: str = Query("all"),
     category: str = Query("all"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> List[dict]:
     """Export visible tools to JSON format"""
 
-    query = db.query(Tool)
+    query = select(Tool)
 
     if status != "all":
-        query = query.filter(Tool.status == status)
+        query = query.where(Tool.status == status)
 
     if category != "all":
-        query = query.filter(Tool.category == category)
+        query = query.where(Tool.category == category)
 
-    tools = query.all()
+    tools = (await db.execute(query)).scalars().all()
 
     return [
         {
@@ -1,18 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 from models import Incident, AuditLog
 from auth import get_current_user, requires_roles
-from typing import List, Dict, Any
+from pagination import InvalidCursor, count_rows, keyset, split_page
+from typing import List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel
+from datetime import datetime, timezone
+import asyncio
+import logging
+import time
+from config import settings
+from correlation import AlertCorrelator, CorrelationResult, merge_tags
+from ingest import IngestError, NDJSONDecoder, alert_batches
+from similarity import SimilarityIndex, incident_text
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Rebuilt from the incidents table at startup, then kept current on create
+similarity_index = SimilarityIndex(num_perm=settings.similarity_num_perm, bands=settings.similarity_bands)
+
+# Collapses alert storms onto one incident per correlation key and window
+alert_correlator = AlertCorrelator(settings.alert_correlation_fields, settings.alert_correlation_window_seconds)
 
 class CreateCaseRequest(BaseModel):
     title: str
     description: str
     severity: str = "medium"
-    alert_id: str = None
+    alert_id: Optional[str] = None
     source: str = "cyberbluesoc"
 
 class IncidentResponse(BaseModel):
@@ -22,42 +39,51 @@ class IncidentResponse(BaseModel):
     severity: str
     status: str
     created_at: str
-    assigned_to: str = None
-    tags: str = None
+    assigned_to: Optional[str] = None
+    tags: Optional[str] = None
+    alert_count: Optional[int] = None
+    correlated: bool = False
 
 @router.post("/incidents", response_model=IncidentResponse)
 @requires_roles(["admin", "analyst"])
 async def create_incident(
     request: CreateCaseRequest,
     req: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new incident/case from alert or manual creation"""
 
     user_data = get_current_user(req)
     client_ip = req.client.host if req.client else "unknown"
 
+    return await open_incident(request, db, user_data["sub"], client_ip)
+
+async def open_incident(request: CreateCaseRequest, db: AsyncSession, user_sub: str, client_ip: str,
+                        extra_tags: Dict[str, Any] = None) -> IncidentResponse:
+    """Insert an incident, audit it and add it to the similarity index"""
+
     # Create incident
     incident = Incident(
         title=request.title,
         description=request.description,
         severity=request.severity,
-        tags=f"source:{request.source}" + (f",alert_id:{request.alert_id}" if request.alert_id else "")
+        tags=incident_tags(request, extra_tags)
     )
 
     db.add(incident)
-    db.commit()
-    db.refresh(incident)
+    await db.flush()  # assigns the id for the audit entry; both rows go in one commit
 
     # Log the action
     audit_log = AuditLog(
-        user_sub=user_data["sub"],
+        user_sub=user_sub,
         action="create_incident",
         resource=f"incident:{incident.id}",
         details=f"Created incident '{request.title}' from {client_ip}"
     )
     db.add(audit_log)
-    db.commit()
+    await db.commit()
+    await db.refresh(incident)
+    similarity_index.add(incident.id, incident_text(incident.title, incident.description, incident.tags))
 
     return IncidentResponse(
         id=incident.id,
@@ -70,24 +96,105 @@ async def create_incident(
         tags=incident.tags
     )
 
+def incident_tags(request: CreateCaseRequest, extra_tags: Dict[str, Any] = None) -> str:
+    tags = f"source:{request.source}" + (f",alert_id:{request.alert_id}" if request.alert_id else "")
+    if extra_tags:
+        tags = merge_tags(tags, extra_tags)
+    return tags
+
+async def open_incidents(cases: List[Tuple[CreateCaseRequest, Dict[str, Any]]], db: AsyncSession,
+                         user_sub: str, client_ip: str, index: bool = True) -> List[IncidentResponse]:
+    """Batch form of open_incident(): one multi-row INSERT per table, one commit.
+
+    With index=False the caller adds the incidents to the similarity index itself.
+    """
+
+    if not cases:
+        return []
+
+    created_at = datetime.now(timezone.utc)
+    rows = [
+        {
+            "title": request.title,
+            "description": request.description,
+            "severity": request.severity,
+            "status": "open",
+            "tags": incident_tags(request, extra_tags),
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+        for request, extra_tags in cases
+    ]
+    try:
+        ids = (await db.scalars(insert(Incident).returning(Incident.id, sort_by_parameter_order=True),
+                                rows)).all()
+        await db.execute(insert(AuditLog), [
+            {
+                "user_sub": user_sub,
+                "action": "create_incident",
+                "resource": f"incident:{incident_id}",
+                "details": f"Created incident '{row['title']}' from {client_ip}",
+            }
+            for incident_id, row in zip(ids, rows)
+        ])
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    if index:
+        similarity_index.add_many(ids, [incident_text(row["title"], row["description"], row["tags"])
+                                        for row in rows])
+
+    return [
+        IncidentResponse(
+            id=incident_id,
+            title=row["title"],
+            description=row["description"],
+            severity=row["severity"],
+            status=row["status"],
+            created_at=created_at.isoformat(),
+            tags=row["tags"]
+        )
+        for incident_id, row in zip(ids, rows)
+    ]
+
 @router.get("/incidents")
 @requires_roles(["admin", "analyst", "manager"])
 async def get_incidents(
+    response: Response,
     status: str = None,
     severity: str = None,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    count: Optional[str] = Query(None, pattern="^(exact|approximate)$"),
+    db: AsyncSession = Depends(get_db)
 ) -> List[IncidentResponse]:
-    """Get incidents/cases with filtering"""
+    """Get incidents/cases with filtering
 
-    query = db.query(Incident)
+    The cursor for the next page comes back in the X-Next-Cursor header;
+    with count set, the total in X-Total-Count (X-Total-Count-Exact says
+    whether it is exact).
+    """
+
+    query = select(Incident)
 
     if status:
-        query = query.filter(Incident.status == status)
+        query = query.where(Incident.status == status)
     if severity:
-        query = query.filter(Incident.severity == severity)
+        query = query.where(Incident.severity == severity)
+
+    if count:
+        total, exact = await count_rows(db, query, approximate=count == "approximate")
+        response.headers["X-Total-Count"] = str(total)
+        response.headers["X-Total-Count-Exact"] = str(exact).lower()
 
-    incidents = query.order_by(Incident.created_at.desc()).limit(limit).all()
+    try:
+        query = keyset(query, Incident.created_at, Incident.id, cursor, limit)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    incidents, next_cursor = split_page((await db.execute(query)).scalars().all(), limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
 
     return [
         IncidentResponse(
@@ -103,20 +210,61 @@ async def get_incidents(
         for inc in incidents
     ]
 
+@router.get("/incidents/{incident_id}/similar")
+@requires_roles(["admin", "analyst", "manager"])
+async def get_similar_incidents(
+    incident_id: int,
+    k: int = 10,
+    min_similarity: float = 0.0,
+    db: AsyncSession = Depends(get_db)
+):
+    """Top-k near-duplicate incidents by estimated text similarity"""
+
+    if not 1 <= k <= 100:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 100")
+
+    incident = (await db.execute(select(Incident).where(Incident.id == incident_id))).scalars().first()
+    if not incident:
+        raise HTTPException(status_code=404, detail="Incident not found")
+
+    matches = similarity_index.similar(
+        incident_text(incident.title, incident.description, incident.tags),
+        k=k, exclude_id=incident_id, min_similarity=min_similarity
+    )
+    found = {inc.id: inc for inc in (await db.execute(
+        select(Incident).where(Incident.id.in_([m[0] for m in matches]))
+    )).scalars().all()}
+
+    return {
+        "incident_id": incident_id,
+        "index_ready": similarity_index.ready,
+        "similar": [
+            {
+                "id": match_id,
+                "similarity": score,
+                "title": found[match_id].title,
+                "severity": found[match_id].severity,
+                "status": found[match_id].status,
+                "created_at": found[match_id].created_at.isoformat() if found[match_id].created_at else None,
+            }
+            for match_id, score in matches if match_id in found
+        ]
+    }
+
 @router.put("/incidents/{incident_id}/status")
 @requires_roles(["admin", "analyst"])
 async def update_incident_status(
     incident_id: int,
     status: str,
     req: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update incident status"""
 
     if status not in ["open", "investigating", "resolved", "closed"]:
         raise HTTPException(status_code=400, detail="Invalid status")
 
-    incident = db.query(Incident).filter(Incident.id == incident_id).first()
+    incident = (await db.execute(select(Incident).where(Incident.id == incident_id))).scalars().first()
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
 
@@ -126,7 +274,7 @@ async def update_incident_status(
     old_status = incident.status
     incident.status = status
 
-    db.commit()
+    await db.commit()
 
     # Log the action
     audit_log = AuditLog(
@@ -136,7 +284,7 @@ async def update_incident_status(
         details=f"Changed status from '{old_status}' to '{status}' from {client_ip}"
     )
     db.add(audit_log)
-    db.commit()
+    await db.commit()
 
     return {"message": f"Incident status updated to {status}"}
 
@@ -145,10 +293,82 @@ async def update_incident_status(
 async def create_case_from_alert(
     alert_data: Dict[str, Any],
     req: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create incident from Wazuh alert or other alert source"""
 
+    user_data = get_current_user(req)
+    client_ip = req.client.host if req.client else "unknown"
+
+    result = await open_case_for_alert(alert_data, db, user_data["sub"], client_ip)
+    return result.case.model_copy(update={"alert_count": result.alert_count, "correlated": result.correlated})
+
+@router.post("/incidents/from-alerts/bulk")
+@requires_roles(["admin", "analyst"])
+async def ingest_alerts_bulk(
+    req: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Bulk-create incidents from a stream of alerts.
+
+    The body is newline-delimited JSON, one alert per line, optionally gzip
+    compressed. Alerts are correlated and turned into cases in batches of
+    bulk_ingest_batch_size, each committed in one transaction; a batch that
+    fails is rolled back and reported without stopping the rest.
+    """
+
+    # One token check for the whole upload rather than one per alert
+    user_data = get_current_user(req)
+    client_ip = req.client.host if req.client else "unknown"
+
+    encoding = req.headers.get("content-encoding", "").lower()
+    decoder = NDJSONDecoder(gzip=True if encoding == "gzip" else None,
+                            max_line_bytes=settings.bulk_ingest_max_line_bytes)
+    started = time.perf_counter()
+    totals = {"created": 0, "correlated": 0, "failed": 0, "batches": 0}
+    batch_errors = []
+
+    try:
+        async for batch in alert_batches(req.stream(), decoder, settings.bulk_ingest_batch_size):
+            totals["batches"] += 1
+            try:
+                results = await open_cases_for_alerts(batch, db, user_data["sub"], client_ip)
+            except Exception as e:
+                logger.error(f"Bulk ingest batch {totals['batches']} failed: {e}")
+                totals["failed"] += len(batch)
+                batch_errors.append({"batch": totals["batches"], "alerts": len(batch), "error": str(e)})
+                continue
+            correlated = sum(1 for result in results if result.correlated)
+            totals["correlated"] += correlated
+            totals["created"] += len(results) - correlated
+    except IngestError as e:
+        raise HTTPException(status_code=400, detail=f"Unreadable alert stream after "
+                                                    f"{decoder.stats.alerts} alerts: {e}")
+
+    elapsed = time.perf_counter() - started
+    stats = decoder.stats
+    db.add(AuditLog(
+        user_sub=user_data["sub"],
+        action="bulk_ingest_alerts",
+        resource="incidents",
+        details=f"Ingested {stats.alerts} alerts ({totals['created']} incidents, "
+                f"{totals['correlated']} correlated, {stats.rejected} rejected) from {client_ip}"
+    ))
+    await db.commit()
+
+    return {
+        "received": stats.alerts,
+        **totals,
+        "rejected": stats.rejected,
+        "errors": stats.errors,
+        "batch_errors": batch_errors,
+        "duration_ms": round(elapsed * 1000, 2),
+        "alerts_per_second": round(stats.alerts / elapsed) if elapsed > 0 else None
+    }
+
+def case_request_from_alert(alert_data: Dict[str, Any]) -> CreateCaseRequest:
+    """Map a Wazuh-style alert onto a new case"""
+
     # Extract alert information
     alert_id = alert_data.get("id", "unknown")
     title = alert_data.get("rule", {}).get("description", f"Security Alert {alert_id}")
@@ -165,8 +385,7 @@ async def create_case_from_alert(
     else:
         severity = "low"
 
-    # Create the incident
-    create_request = CreateCaseRequest(
+    return CreateCaseRequest(
         title=f"[ALERT] {title}",
         description=description,
         severity=severity,
@@ -174,4 +393,42 @@ async def create_case_from_alert(
         source="wazuh"
     )
 
-    return await create_incident(create_request, req, db)
\ No newline at end of file
+async def open_case_for_alert(alert_data: Dict[str, Any], db: AsyncSession, user_sub: str,
+                              client_ip: str) -> CorrelationResult:
+    """Open an incident for an alert, or attach it to the open incident for its correlation key.
+
+    Correlated alerts touch neither the database nor the similarity index; their
+    count and first/last-seen times reach the incident's tags on the next flush.
+    """
+
+    async def create(correlation_tags: Dict[str, Any]):
+        case = await open_incident(case_request_from_alert(alert_data), db, user_sub, client_ip,
+                                   extra_tags=correlation_tags)
+        return case, case.id, case.tags
+
+    return await alert_correlator.correlate(alert_data, create)
+
+# Similarity indexing of bulk-ingested incidents, running behind the ingest
+_indexing_tasks = set()
+
+async def open_cases_for_alerts(alerts: List[Dict[str, Any]], db: AsyncSession, user_sub: str,
+                                client_ip: str) -> List[CorrelationResult]:
+    """Batch form of open_case_for_alert(): all new incidents go in one transaction.
+
+    The new incidents are added to the similarity index in the background,
+    overlapping with the next batch instead of delaying it.
+    """
+
+    async def create_many(leaders):
+        cases = [(case_request_from_alert(alert), correlation_tags) for alert, correlation_tags in leaders]
+        created = await open_incidents(cases, db, user_sub, client_ip, index=False)
+        task = asyncio.create_task(asyncio.to_thread(
+            similarity_index.add_many,
+            [case.id for case in created],
+            [incident_text(case.title, case.description, case.tags) for case in created],
+        ))
+        _indexing_tasks.add(task)
+        task.add_done_callback(_indexing_tasks.discard)
+        return [(case, case.id, case.tags) for case in created]
+
+    return await alert_correlator.correlate_many(alerts, create_many)
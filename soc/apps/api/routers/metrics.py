@@ -1,32 +1,51 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from database import get_db
-from models import Metric, Tool, Incident, AuditLog
+from sqlalchemy import desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, pool_stats
+from models import Metric, MetricRollup, Tool, Incident, AuditLog
+from config import settings
+from metric_rollup import MetricRetention, Series
 from typing import Dict, List, Any
 import datetime
+import time
+import containment
+import enrichment
 
 router = APIRouter()
 
+DAY = 86400
+metric_retention = MetricRetention(
+    Series(Metric.__table__, Metric.timestamp,
+           {name: getattr(Metric, name) for name in ("cpu_usage", "memory_usage", "disk_usage", "network_rx",
+                                                     "network_tx", "active_connections", "alerts_count")},
+           key=Metric.tool_name),
+    MetricRollup,
+    raw_retention=settings.metrics_raw_retention_days * DAY,
+    minute_retention=settings.metrics_minute_retention_days * DAY,
+    hour_retention=settings.metrics_hour_retention_days * DAY or None,
+    batch_size=settings.metrics_delete_batch_size,
+    min_points=settings.metrics_query_min_points,
+)
+
 
 @router.get("/metrics")
-async def get_system_metrics(db: Session = Depends(get_db)) -> Dict[str, Any]:
+async def get_system_metrics(db: AsyncSession = Depends(get_db)) -> Dict[str, Any]:
     """Get comprehensive system metrics for the dashboard"""
 
     # Get current tool statuses
-    tools = db.query(Tool).all()
+    tools = (await db.execute(select(Tool))).scalars().all()
     tools_status = {tool.name: tool.status for tool in tools}
 
     # Get recent metrics (last 24 hours)
     one_day_ago = datetime.datetime.utcnow() - datetime.timedelta(days=1)
-    recent_metrics = db.query(Metric).filter(
+    recent_metrics = (await db.execute(select(Metric).where(
         Metric.timestamp >= one_day_ago
-    ).order_by(desc(Metric.timestamp)).limit(100).all()
+    ).order_by(desc(Metric.timestamp)).limit(100))).scalars().all()
 
     # Get incidents count
-    incidents_count = db.query(Incident).filter(
+    incidents_count = await db.scalar(select(func.count(Incident.id)).where(
         Incident.status.in_(['open', 'investigating'])
-    ).count()
+    ))
 
     # Calculate system health
     running_tools = sum(1 for status in tools_status.values() if status == 'running')
@@ -40,9 +59,9 @@ async def get_system_metrics(db: Session = Depends(get_db)) -> Dict[str, Any]:
         overall_health = 'critical'
 
     # Calculate uptime (simplified - last restart time)
-    last_restart = db.query(AuditLog).filter(
+    last_restart = (await db.execute(select(AuditLog).where(
         AuditLog.action.like('%restart%')
-    ).order_by(desc(AuditLog.created_at)).first()
+    ).order_by(desc(AuditLog.created_at)).limit(1))).scalars().first()
 
     uptime = "Unknown"
     if last_restart:
@@ -50,9 +69,9 @@ async def get_system_metrics(db: Session = Depends(get_db)) -> Dict[str, Any]:
         uptime = f"{uptime_delta.days}d {uptime_delta.seconds//3600}h"
 
     # Last backup (simplified - last successful backup log)
-    last_backup = db.query(AuditLog).filter(
+    last_backup = (await db.execute(select(AuditLog).where(
         AuditLog.action.like('%backup%')
-    ).order_by(desc(AuditLog.created_at)).first()
+    ).order_by(desc(AuditLog.created_at)).limit(1))).scalars().first()
 
     last_backup_str = "Never"
     if last_backup:
@@ -83,7 +102,7 @@ async def get_system_metrics(db: Session = Depends(get_db)) -> Dict[str, Any]:
 
 
 @router.post("/metrics/collect")
-async def collect_system_metrics(db: Session = Depends(get_db)):
+async def collect_system_metrics(db: AsyncSession = Depends(get_db)):
     """Collect current system metrics (called by monitoring service)"""
 
     # This would typically be called by a system monitoring service
@@ -91,7 +110,7 @@ async def collect_system_metrics(db: Session = Depends(get_db)):
     import random
 
     # Get current tool statuses
-    tools = db.query(Tool).all()
+    tools = (await db.execute(select(Tool))).scalars().all()
 
     # Create metrics for each tool
     for tool in tools:
@@ -108,29 +127,51 @@ async def collect_system_metrics(db: Session = Depends(get_db)):
         )
         db.add(metric)
 
-    db.commit()
+    await db.commit()
     return {"message": "Metrics collected successfully"}
 
 
 @router.get("/metrics/performance")
-async def get_performance_metrics(hours: int = 24, db: Session = Depends(get_db)) -> Dict[str, Any]:
-    """Get performance metrics for the specified time period"""
+async def get_performance_metrics(hours: int = 24, db: AsyncSession = Depends(get_db)) -> Dict[str, Any]:
+    """Get performance metrics for the specified time period
 
-    time_ago = datetime.datetime.utcnow() - datetime.timedelta(hours=hours)
+    Aggregated from the coarsest retention tier that covers the period.
+    """
 
-    metrics = db.query(Metric).filter(
-        Metric.timestamp >= time_ago
-    ).order_by(Metric.timestamp).all()
+    start = time.time() - hours * 3600
+    series = {}
+    for metric in ("cpu_usage", "memory_usage", "alerts_count"):
+        resolution, series[metric] = await metric_retention.history(db, metric, start)
 
-    # Aggregate metrics
-    cpu_avg = sum(m.cpu_usage for m in metrics) / len(metrics) if metrics else 0
-    memory_avg = sum(m.memory_usage for m in metrics) / len(metrics) if metrics else 0
-    alerts_total = sum(m.alerts_count for m in metrics)
+    def average(points):
+        count = sum(p.count for p in points)
+        return sum(p.sum for p in points) / count if count else 0
 
     return {
         "time_range": f"Last {hours} hours",
-        "cpu_average": round(cpu_avg, 2),
-        "memory_average": round(memory_avg, 2),
-        "total_alerts": alerts_total,
-        "data_points": len(metrics)
-    }
\ No newline at end of file
+        "cpu_average": round(average(series["cpu_usage"]), 2),
+        "memory_average": round(average(series["memory_usage"]), 2),
+        "total_alerts": int(sum(p.sum for p in series["alerts_count"])),
+        "data_points": sum(p.count for p in series["cpu_usage"]),
+        "resolution_seconds": resolution
+    }
+
+@router.get("/metrics/enrichment")
+async def get_enrichment_metrics() -> Dict[str, Any]:
+    """Enrichment scheduler queue depth, wait times and cache hit counters"""
+    return enrichment.stats()
+
+@router.get("/metrics/database")
+async def get_database_metrics() -> Dict[str, Any]:
+    """Connection pools: checkout wait times and timeouts, connections in use and overflow"""
+    return pool_stats()
+
+@router.get("/metrics/retention")
+async def get_retention_metrics() -> Dict[str, Any]:
+    """Metric rollups: aggregates written and raw samples deleted, and the last run's duration"""
+    return metric_retention.stats()
+
+@router.get("/metrics/containment")
+async def get_containment_metrics() -> Dict[str, Any]:
+    """FleetDM block batching: requests, batches sent and hashes per batch"""
+    return containment.stats()
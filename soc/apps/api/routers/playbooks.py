@@ -1,18 +1,36 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from database import get_db
-from models import AuditLog
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings
+from database import AsyncSessionLocal, get_db
+from models import AuditLog, Incident, Job
 from auth import get_current_user, requires_roles
 from typing import Dict, Any, List
-import httpx
 import json
 import logging
 from datetime import datetime
+import asyncio
+import containment
+import enrichment
+from enrichment import EnrichmentError, verdict_for
+from scheduler import Priority
+from playbook_engine import Playbook, PlaybookContext, Step, note
+from ioc_extract import IOCExtractor, is_valid
+from jobs import FAILED as JOB_FAILED, SUCCEEDED as JOB_SUCCEEDED, JobQueue, JobWorkerPool, job_status
+from unit_of_work import UnitOfWork
+from blocklist import BlockedIndicators
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-VIRUSTOTAL_API_KEY = "your-virustotal-api-key"  # Should be in environment variables
+AUTO_INCIDENT_RESPONSE = "auto_incident_response"
+
+# Enrichment verdicts for which a selective block step blocks a hash
+BLOCK_VERDICTS = ("malicious", "suspicious")
+
+ioc_extractor = IOCExtractor(settings.ioc_field_hints, settings.ioc_ignore_fields)
+blocked_indicators = BlockedIndicators(settings.blocklist_capacity, settings.blocklist_error_rate)
 
 # Import AI analysis service
 try:
@@ -26,7 +44,7 @@ except ImportError:
 async def enrich_with_virustotal(
     payload: Dict[str, Any],
     req: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Enrich IOC with VirusTotal data"""
 
@@ -38,45 +56,59 @@ async def enrich_with_virustotal(
     client_ip = req.client.host if req.client else "unknown"
 
     try:
-        # Call VirusTotal API
-        url = f"https://www.virustotal.com/api/v3/files/{hash_value}"
-        headers = {
-            "accept": "application/json",
-            "x-apikey": VIRUSTOTAL_API_KEY
-        }
+        vt_data = await enrichment.enrich_hash(hash_value)
+    except EnrichmentError as e:
+        raise HTTPException(status_code=e.status_code, detail=f"VirusTotal API error: {e}")
+    if vt_data is None:
+        raise HTTPException(status_code=404, detail="Hash not found on VirusTotal")
+
+    # Log the enrichment
+    audit_log = AuditLog(
+        user_sub=user_data["sub"],
+        action="virustotal_enrichment",
+        resource=f"hash:{hash_value}",
+        details=f"Enriched hash with VirusTotal data from {client_ip}"
+    )
+    db.add(audit_log)
+    await db.commit()
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            if response.status_code == 200:
-                vt_data = response.json()
-
-                # Log the enrichment
-                audit_log = AuditLog(
-                    user_sub=user_data["sub"],
-                    action="virustotal_enrichment",
-                    resource=f"hash:{hash_value}",
-                    details=f"Enriched hash with VirusTotal data from {client_ip}"
-                )
-                db.add(audit_log)
-                db.commit()
-
-                return {
-                    "hash": hash_value,
-                    "virustotal": vt_data,
-                    "enriched": True
-                }
-            else:
-                raise HTTPException(status_code=response.status_code, detail="VirusTotal API error")
+    return {
+        "hash": hash_value,
+        "virustotal": vt_data,
+        "enriched": True
+    }
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Enrichment failed: {str(e)}")
+async def enrich_hashes(hashes: List[str], uow: UnitOfWork,
+                        priority: int = Priority.DEFAULT) -> Dict[str, Any]:
+    """Enrich all hashes of an alert concurrently through the shared VirusTotal client"""
+    if not hashes:
+        return {}
+
+    results = await enrichment.lookup_many(hashes, priority)
+    for hash_value, result in results.items():
+        if isinstance(result, dict):
+            uow.audit("virustotal_enrichment", f"hash:{hash_value}",
+                      f"Enriched hash with VirusTotal data from {uow.client_ip}")
+    return results
+
+def enrichment_actions(prefix: str, results: Dict[str, Any]) -> List[str]:
+    """Playbook action lines for enrich_hashes() results"""
+    actions = []
+    for hash_value, result in results.items():
+        if isinstance(result, Exception):
+            actions.append(f"{prefix}: VirusTotal enrichment failed for hash {hash_value}: {result}")
+        elif result is None:
+            actions.append(f"{prefix}: Hash {hash_value} unknown to VirusTotal")
+        else:
+            actions.append(f"{prefix}: Enriched hash {hash_value} with VirusTotal")
+    return actions
 
 @router.post("/playbooks/block-hash")
 @requires_roles(["admin", "analyst"])
 async def block_hash_via_fleetdm(
     payload: Dict[str, Any],
     req: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Block hash via FleetDM endpoint management"""
 
@@ -87,415 +119,413 @@ async def block_hash_via_fleetdm(
     user_data = get_current_user(req)
     client_ip = req.client.host if req.client else "unknown"
 
+    if not is_valid_hash(hash_value):
+        raise HTTPException(status_code=400, detail="Invalid hash format")
+
     try:
-        # This would integrate with FleetDM API to create a policy/rule
-        # For now, simulate the blocking action
-
-        # Log the blocking action
-        audit_log = AuditLog(
-            user_sub=user_data["sub"],
-            action="block_hash_fleetdm",
-            resource=f"hash:{hash_value}",
-            details=f"Blocked hash via FleetDM policy from {client_ip}"
-        )
-        db.add(audit_log)
-        db.commit()
+        async with UnitOfWork(db, user_data["sub"], client_ip) as uow:
+            return await block_hash(hash_value, uow)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Blocking failed: {str(e)}")
+
+async def block_hash(hash_value: str, uow: UnitOfWork) -> Dict[str, Any]:
+    """Block a hash via FleetDM unless it already is; the block is recorded with the unit of work"""
 
+    async with uow.db_lock:
+        already_blocked = await blocked_indicators.is_blocked(uow.db, "hash", hash_value)
+    if already_blocked:
         return {
             "hash": hash_value,
-            "action": "blocked",
+            "action": "skipped",
             "method": "fleetdm_policy",
-            "status": "success"
+            "status": "already_blocked"
         }
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Blocking failed: {str(e)}")
+    # Pushed together with the other hashes blocked in the same batching window
+    policy = await containment.block_hash(hash_value)
+    uow.add(blocked_indicators.mark_blocked("hash", hash_value))
 
-@router.post("/playbooks/auto-incident-response")
+    # Log the blocking action
+    uow.audit("block_hash_fleetdm", f"hash:{hash_value}",
+              f"Blocked hash via FleetDM policy {policy['policy_name']} from {uow.client_ip}")
+
+    return {
+        "hash": hash_value,
+        "action": "blocked",
+        "method": "fleetdm_policy",
+        "status": "success",
+        "policy_id": policy["policy_id"],
+        "batch_size": policy["hashes"]
+    }
+
+@router.post("/playbooks/auto-incident-response", status_code=202)
 @requires_roles(["admin", "analyst"])
 async def auto_incident_response(
     alert_data: Dict[str, Any],
     req: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """AI-powered automated incident response playbook with dynamic adjustments"""
+    """Queue the AI-powered automated incident response for an alert.
 
-    alert_id = alert_data.get("id")
-    rule_level = alert_data.get("rule", {}).get("level", 5)
+    Returns 202 with a job ID right away; poll /playbooks/jobs/{job_id} for
+    progress and /playbooks/jobs/{job_id}/result for the outcome.
+    """
 
     user_data = get_current_user(req)
     client_ip = req.client.host if req.client else "unknown"
 
+    job = await job_queue.enqueue(db, AUTO_INCIDENT_RESPONSE, alert_data, user_data["sub"], client_ip)
+    job_workers.notify()
+
+    return {
+        "job_id": job.id,
+        "alert_id": alert_data.get("id"),
+        "status": job.status,
+        "status_url": f"/api/playbooks/jobs/{job.id}",
+        "result_url": f"/api/playbooks/jobs/{job.id}/result"
+    }
+
+@router.get("/playbooks/jobs/{job_id}")
+@requires_roles(["admin", "analyst"])
+async def get_job(
+    job_id: int,
+    req: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Status of a queued playbook job"""
+
+    get_current_user(req)
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
+
+@router.get("/playbooks/jobs/{job_id}/result")
+@requires_roles(["admin", "analyst"])
+async def get_job_result(
+    job_id: int,
+    req: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Result of a finished playbook job; 202 while it is still queued or running"""
+
+    get_current_user(req)
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == JOB_FAILED:
+        raise HTTPException(status_code=500, detail=f"Automated response failed: {job.error}")
+    if job.status != JOB_SUCCEEDED:
+        return JSONResponse(status_code=202, content=jsonable_encoder(job_status(job)))
+    return json.loads(job.result)
+
+async def run_auto_incident_response_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Job handler: run the response in a session of its own"""
+    async with AsyncSessionLocal() as db:
+        return await run_auto_incident_response(job["payload"], db, job["user_sub"], job["client_ip"])
+
+async def run_auto_incident_response(
+    alert_data: Dict[str, Any],
+    db: AsyncSession,
+    user_sub: str,
+    client_ip: str
+) -> Dict[str, Any]:
+    """AI-powered automated incident response playbook with dynamic adjustments"""
+
+    alert_id = alert_data.get("id")
+    rule_level = alert_data.get("rule", {}).get("level", 5)
+
     actions_taken = []
     ai_recommendations = {}
 
     try:
-        # Step 1: Create incident case first
-        from routers.incidents import create_case_from_alert
-        incident_result = await create_case_from_alert(alert_data, req, db)
+        # Step 1: Create incident case first, unless the alert correlates with an open one
+        from routers.incidents import open_case_for_alert
+        correlation = await open_case_for_alert(alert_data, db, user_sub, client_ip)
+        incident_result = correlation.case
+        if correlation.correlated:
+            # The response already ran for the alert that opened this incident
+            return {
+                "alert_id": alert_id,
+                "actions_taken": [f"Correlated with incident case {incident_result.id}"],
+                "incident_id": incident_result.id,
+                "alert_count": correlation.alert_count,
+                "status": "correlated"
+            }
         actions_taken.append(f"Created incident case {incident_result.id}")
 
-        # Step 2: AI Analysis if available
-        if incident_analysis_service:
-            # Prepare incident data for AI analysis
-            incident_data = {
-                'id': incident_result.id,
-                'title': incident_result.title,
-                'description': incident_result.description,
-                'severity': incident_result.severity,
-                'created_at': incident_result.created_at.isoformat(),
-                'tags': incident_result.tags
-            }
+        # Everything after case creation is written in one transaction when the run ends
+        async with UnitOfWork(db, user_sub, client_ip) as uow:
+            # Step 2: AI Analysis if available
+            if incident_analysis_service:
+                # Prepare incident data for AI analysis
+                incident_data = {
+                    'id': incident_result.id,
+                    'title': incident_result.title,
+                    'description': incident_result.description,
+                    'severity': incident_result.severity,
+                    'created_at': incident_result.created_at,
+                    'tags': incident_result.tags
+                }
 
-            # Perform AI analysis
-            ai_analysis = incident_analysis_service.analyze_incident(incident_data)
-            ai_recommendations = {
-                'predicted_type': ai_analysis.get('predicted_type'),
-                'confidence': ai_analysis.get('confidence', 0),
-                'recommended_actions': ai_analysis.get('recommended_actions', []),
-                'risk_score': ai_analysis.get('risk_score', 50),
-                'severity_assessment': ai_analysis.get('severity_assessment')
-            }
+                # Perform AI analysis
+                ai_analysis = incident_analysis_service.analyze_incident(incident_data)
+                ai_recommendations = {
+                    'predicted_type': ai_analysis.get('predicted_type'),
+                    'confidence': ai_analysis.get('confidence', 0),
+                    'recommended_actions': ai_analysis.get('recommended_actions', []),
+                    'risk_score': ai_analysis.get('risk_score', 50),
+                    'severity_assessment': ai_analysis.get('severity_assessment')
+                }
 
-            actions_taken.append(f"AI analysis completed: {ai_analysis.get('predicted_type', 'unknown')} "
-                               f"(confidence: {ai_analysis.get('confidence', 0):.2f})")
-
-            # Adjust severity based on AI assessment if confidence is high
-            if ai_analysis.get('confidence', 0) > 0.7:
-                adjusted_severity = ai_analysis.get('severity_assessment')
-                if adjusted_severity != incident_result.severity:
-                    # Update incident severity
-                    incident = db.query(Incident).filter(Incident.id == incident_result.id).first()
-                    if incident:
-                        old_severity = incident.severity
-                        incident.severity = adjusted_severity
-                        db.commit()
-
-                        actions_taken.append(f"Severity adjusted from {old_severity} to {adjusted_severity} "
-                                           f"based on AI analysis")
-                        rule_level = max(rule_level, {'low': 5, 'medium': 8, 'high': 12, 'critical': 15}.get(adjusted_severity, 8))
-
-        # Step 3: Dynamic playbook execution based on analysis
-        playbook_result = await execute_dynamic_playbook(
-            alert_data, rule_level, ai_recommendations, req, db
-        )
-        actions_taken.extend(playbook_result.get('actions', []))
-
-        # Step 4: Log automated response with AI insights
-        audit_details = {
-            'alert_id': alert_id,
-            'actions_taken': actions_taken,
-            'incident_id': incident_result.id,
-            'ai_analysis': ai_recommendations,
-            'rule_level': rule_level,
-            'client_ip': client_ip
-        }
+                actions_taken.append(f"AI analysis completed: {ai_analysis.get('predicted_type', 'unknown')} "
+                                   f"(confidence: {ai_analysis.get('confidence', 0):.2f})")
+
+                # Adjust severity based on AI assessment if confidence is high
+                if ai_analysis.get('confidence', 0) > 0.7:
+                    adjusted_severity = ai_analysis.get('severity_assessment')
+                    if adjusted_severity != incident_result.severity:
+                        # Update incident severity
+                        incident = await db.get(Incident, incident_result.id)
+                        if incident:
+                            old_severity = incident.severity
+                            incident.severity = adjusted_severity
+
+                            actions_taken.append(f"Severity adjusted from {old_severity} to {adjusted_severity} "
+                                               f"based on AI analysis")
+                            rule_level = max(rule_level, {'low': 5, 'medium': 8, 'high': 12, 'critical': 15}.get(adjusted_severity, 8))
+
+            # Step 3: Dynamic playbook execution based on analysis
+            playbook_result = await execute_dynamic_playbook(
+                alert_data, rule_level, ai_recommendations, uow
+            )
+            actions_taken.extend(playbook_result.get('actions', []))
+
+            # Step 4: Log automated response with AI insights
+            audit_details = {
+                'alert_id': alert_id,
+                'actions_taken': actions_taken,
+                'incident_id': incident_result.id,
+                'ai_analysis': ai_recommendations,
+                'rule_level': rule_level,
+                'client_ip': client_ip
+            }
 
-        audit_log = AuditLog(
-            user_sub=user_data["sub"],
-            action="auto_incident_response",
-            resource=f"alert:{alert_id}",
-            details=json.dumps(audit_details)
-        )
-        db.add(audit_log)
-        db.commit()
+            uow.audit("auto_incident_response", f"alert:{alert_id}", json.dumps(audit_details))
 
-        return {
-            "alert_id": alert_id,
-            "actions_taken": actions_taken,
-            "incident_id": incident_result.id,
-            "ai_analysis": ai_recommendations,
-            "status": "completed",
-            "playbook_result": playbook_result
-        }
+            return {
+                "alert_id": alert_id,
+                "actions_taken": actions_taken,
+                "incident_id": incident_result.id,
+                "ai_analysis": ai_recommendations,
+                "status": "completed",
+                "playbook_result": playbook_result
+            }
 
     except Exception as e:
         logger.error(f"Automated response failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Automated response failed: {str(e)}")
+        raise
 
 def extract_hashes_from_alert(alert_data: Dict[str, Any]) -> list:
-    """Extract MD5/SHA256 hashes from alert data"""
-    hashes = []
-
-    # Look for hashes in various fields
-    fields_to_check = ["syscheck.md5", "syscheck.sha256", "data.md5", "data.sha256"]
+    """Extract MD5/SHA1/SHA256 hashes from anywhere in the alert, SHA256 first"""
+    return ioc_extractor.extract(alert_data).hashes()
 
-    for field in fields_to_check:
-        value = get_nested_value(alert_data, field.split("."))
-        if value and is_valid_hash(value):
-            hashes.append(value)
-
-    return hashes
-
-def get_nested_value(data: Dict[str, Any], keys: list) -> Any:
-    """Get nested dictionary value"""
-    for key in keys:
-        if isinstance(data, dict) and key in data:
-            data = data[key]
-        else:
-            return None
-    return data
+def extract_blockable_hashes(alert_data: Dict[str, Any]) -> list:
+    """Hashes of the alert's file as it is now, from the containment hash fields only"""
+    return ioc_extractor.extract_fields(alert_data, settings.containment_hash_fields).hashes()
 
 def is_valid_hash(value: str) -> bool:
-    """Check if string is a valid MD5 or SHA256 hash"""
-    import re
-    return bool(re.match(r'^[a-fA-F0-9]{32}|[a-fA-F0-9]{64}$', value))
+    """Check if string is a valid MD5, SHA1 or SHA256 hash"""
+    return is_valid("hash", value)
 
 async def execute_dynamic_playbook(
     alert_data: Dict[str, Any],
     rule_level: int,
     ai_recommendations: Dict[str, Any],
-    req: Request,
-    db: Session
+    uow: UnitOfWork
 ) -> Dict[str, Any]:
     """Execute dynamic playbook based on AI analysis and incident parameters"""
 
-    actions = []
     predicted_type = ai_recommendations.get('predicted_type', 'unknown')
     confidence = ai_recommendations.get('confidence', 0)
     risk_score = ai_recommendations.get('risk_score', 50)
 
+    playbook = select_playbook(predicted_type, confidence, risk_score, rule_level)
+    run = await playbook.run(PlaybookContext(alert_data, uow))
+
+    return {
+        'actions': run.actions,
+        'playbook': playbook.name,
+        'duration_ms': run.duration_ms,
+        'steps': run.timings(),
+        'predicted_type': predicted_type,
+        'confidence': confidence,
+        'risk_score': risk_score,
+        'rule_level': rule_level
+    }
+
+def select_playbook(predicted_type: str, confidence: float, risk_score: float, rule_level: int) -> Playbook:
+    """Pick the response playbook from the AI prediction and alert severity"""
+
     # Adaptive response based on AI predictions with confidence thresholds
     if predicted_type in ['malware', 'intrusion'] and confidence > 0.6:
         # High-confidence malware/intrusion detection
         if rule_level >= 12 or risk_score > 75:
             # Critical response: Immediate containment
-            actions.extend(await execute_critical_response_playbook(alert_data, req, db))
+            return CRITICAL_RESPONSE_PLAYBOOK
         elif rule_level >= 8 or risk_score > 60:
             # High response: Investigation and blocking
-            actions.extend(await execute_high_response_playbook(alert_data, req, db))
+            return HIGH_RESPONSE_PLAYBOOK
         else:
             # Medium response: Enrichment and monitoring
-            actions.extend(await execute_medium_response_playbook(alert_data, req, db))
+            return MEDIUM_RESPONSE_PLAYBOOK
 
     elif predicted_type == 'phishing' and confidence > 0.5:
-        # Phishing response playbook
-        actions.extend(await execute_phishing_response_playbook(alert_data, req, db))
+        return PHISHING_RESPONSE_PLAYBOOK
 
     elif predicted_type == 'data_leak' and confidence > 0.7:
-        # Data exfiltration response
-        actions.extend(await execute_data_leak_response_playbook(alert_data, req, db))
+        return DATA_LEAK_RESPONSE_PLAYBOOK
 
     elif predicted_type == 'denial_of_service' and confidence > 0.6:
-        # DoS response playbook
-        actions.extend(await execute_dos_response_playbook(alert_data, req, db))
+        return DOS_RESPONSE_PLAYBOOK
 
     elif predicted_type == 'privilege_escalation' and confidence > 0.5:
-        # Privilege escalation response
-        actions.extend(await execute_privilege_escalation_playbook(alert_data, req, db))
-
-    else:
-        # Default response for low confidence or unknown types
-        actions.extend(await execute_default_response_playbook(alert_data, req, db))
-
-    return {
-        'actions': actions,
-        'predicted_type': predicted_type,
-        'confidence': confidence,
-        'risk_score': risk_score,
-        'rule_level': rule_level
-    }
-
-async def execute_critical_response_playbook(alert_data: Dict[str, Any], req: Request, db: Session) -> List[str]:
-    """Critical response playbook for high-severity incidents"""
-    actions = []
-
-    try:
-        # Immediate threat intelligence enrichment
-        hashes = extract_hashes_from_alert(alert_data)
-        for hash_val in hashes:
-            vt_result = await enrich_with_virustotal({"hash": hash_val}, req, db)
-            actions.append(f"Critical: Enriched hash {hash_val} with VirusTotal")
-
-        # Immediate blocking
-        for hash_val in hashes:
-            block_result = await block_hash_via_fleetdm({"hash": hash_val}, req, db)
-            actions.append(f"Critical: Blocked hash {hash_val} via FleetDM")
-
-        # Isolate affected systems (placeholder for EDR integration)
-        actions.append("Critical: Initiated system isolation procedures")
-
-        # Escalate to incident response team
-        actions.append("Critical: Escalated to incident response team")
-
-        # Enable enhanced monitoring
-        actions.append("Critical: Enabled enhanced monitoring and logging")
-
-    except Exception as e:
-        actions.append(f"Critical response error: {str(e)}")
-
-    return actions
-
-async def execute_high_response_playbook(alert_data: Dict[str, Any], req: Request, db: Session) -> List[str]:
-    """High response playbook for medium-high severity incidents"""
-    actions = []
-
-    try:
-        # Threat intelligence enrichment
-        hashes = extract_hashes_from_alert(alert_data)
-        for hash_val in hashes:
-            vt_result = await enrich_with_virustotal({"hash": hash_val}, req, db)
-            actions.append(f"High: Enriched hash {hash_val} with VirusTotal")
-
-        # Selective blocking based on confidence
-        for hash_val in hashes:
-            block_result = await block_hash_via_fleetdm({"hash": hash_val}, req, db)
-            actions.append(f"High: Blocked hash {hash_val} via FleetDM")
-
-        # Network traffic analysis
-        actions.append("High: Initiated network traffic analysis")
-
-        # User behavior monitoring
-        actions.append("High: Enhanced user behavior monitoring")
-
-    except Exception as e:
-        actions.append(f"High response error: {str(e)}")
-
-    return actions
-
-async def execute_medium_response_playbook(alert_data: Dict[str, Any], req: Request, db: Session) -> List[str]:
-    """Medium response playbook for standard incidents"""
-    actions = []
-
-    try:
-        # Basic threat intelligence enrichment
-        hashes = extract_hashes_from_alert(alert_data)
-        if hashes:
-            for hash_val in hashes:
-                vt_result = await enrich_with_virustotal({"hash": hash_val}, req, db)
-                actions.append(f"Medium: Enriched hash {hash_val} with VirusTotal")
-
-        # Monitoring and alerting
-        actions.append("Medium: Increased monitoring frequency")
-        actions.append("Medium: Enabled additional alerting rules")
-
-        # Log analysis
-        actions.append("Medium: Scheduled detailed log analysis")
-
-    except Exception as e:
-        actions.append(f"Medium response error: {str(e)}")
-
-    return actions
-
-async def execute_phishing_response_playbook(alert_data: Dict[str, Any], req: Request, db: Session) -> List[str]:
-    """Phishing-specific response playbook"""
-    actions = []
-
-    try:
-        # Email quarantine and analysis
-        actions.append("Phishing: Quarantined suspicious emails")
-
-        # URL/domain blocking
-        actions.append("Phishing: Blocked suspicious URLs and domains")
-
-        # User education notification
-        actions.append("Phishing: Sent user awareness notification")
-
-        # Credential monitoring
-        actions.append("Phishing: Enabled credential compromise monitoring")
-
-    except Exception as e:
-        actions.append(f"Phishing response error: {str(e)}")
-
-    return actions
-
-async def execute_data_leak_response_playbook(alert_data: Dict[str, Any], req: Request, db: Session) -> List[str]:
-    """Data exfiltration response playbook"""
-    actions = []
-
-    try:
-        # Data flow analysis
-        actions.append("Data Leak: Initiated data flow analysis")
-
-        # Access pattern review
-        actions.append("Data Leak: Reviewing access patterns and permissions")
-
-        # Encryption verification
-        actions.append("Data Leak: Verified data encryption status")
-
-        # External communication monitoring
-        actions.append("Data Leak: Enhanced external communication monitoring")
-
-        # Legal compliance notification
-        actions.append("Data Leak: Initiated compliance notification procedures")
-
-    except Exception as e:
-        actions.append(f"Data leak response error: {str(e)}")
-
-    return actions
-
-async def execute_dos_response_playbook(alert_data: Dict[str, Any], req: Request, db: Session) -> List[str]:
-    """Denial of Service response playbook"""
-    actions = []
-
-    try:
-        # Traffic analysis and filtering
-        actions.append("DoS: Implemented traffic filtering rules")
-
-        # Rate limiting
-        actions.append("DoS: Enabled rate limiting on affected services")
-
-        # CDN/WAF activation
-        actions.append("DoS: Activated CDN and WAF protections")
-
-        # Resource scaling
-        actions.append("DoS: Initiated resource scaling procedures")
-
-        # ISP coordination
-        actions.append("DoS: Coordinated with ISP for traffic mitigation")
-
-    except Exception as e:
-        actions.append(f"DoS response error: {str(e)}")
-
-    return actions
-
-async def execute_privilege_escalation_playbook(alert_data: Dict[str, Any], req: Request, db: Session) -> List[str]:
-    """Privilege escalation response playbook"""
-    actions = []
-
-    try:
-        # Access review
-        actions.append("Privilege: Initiated comprehensive access review")
-
-        # Session invalidation
-        actions.append("Privilege: Invalidated suspicious sessions")
-
-        # Multi-factor authentication enforcement
-        actions.append("Privilege: Enforced MFA for affected accounts")
-
-        # Audit logging enhancement
-        actions.append("Privilege: Enhanced audit logging for privileged operations")
-
-        # Password reset requirements
-        actions.append("Privilege: Required password resets for compromised accounts")
-
-    except Exception as e:
-        actions.append(f"Privilege escalation response error: {str(e)}")
-
-    return actions
-
-async def execute_default_response_playbook(alert_data: Dict[str, Any], req: Request, db: Session) -> List[str]:
-    """Default response playbook for standard monitoring and alerting"""
-    actions = []
-
-    try:
-        # Basic enrichment
-        hashes = extract_hashes_from_alert(alert_data)
-        if hashes:
-            for hash_val in hashes:
-                vt_result = await enrich_with_virustotal({"hash": hash_val}, req, db)
-                actions.append(f"Default: Enriched hash {hash_val} with VirusTotal")
-
-        # Monitoring enhancement
-        actions.append("Default: Enhanced monitoring and alerting")
-
-        # Incident documentation
-        actions.append("Default: Documented incident for review")
-
-        # Follow-up scheduling
-        actions.append("Default: Scheduled follow-up investigation")
-
-    except Exception as e:
-        actions.append(f"Default response error: {str(e)}")
-
-    return actions
\ No newline at end of file
+        return PRIVILEGE_ESCALATION_PLAYBOOK
+
+    # Default response for low confidence or unknown types
+    return DEFAULT_RESPONSE_PLAYBOOK
+
+# Playbook steps. Steps without depends_on run concurrently.
+
+def enrich_step(prefix: str, priority: int) -> Step:
+    """Enrich the alert's hashes with VirusTotal"""
+    async def action(context: PlaybookContext) -> List[str]:
+        hashes = extract_hashes_from_alert(context.alert_data)
+        results = await enrich_hashes(hashes, context.uow, priority)
+        context.extra["enrichment"] = results
+        if results and all(isinstance(result, Exception) for result in results.values()):
+            # Nothing came back; fail so the step's retry policy applies
+            raise next(iter(results.values()))
+        return enrichment_actions(prefix, results)
+
+    return Step("enrich", action, timeout=60.0, retries=1)
+
+def block_step(prefix: str, selective: bool = False) -> Step:
+    """Block the hashes of the alert's file via FleetDM.
+
+    A selective step runs after the enrich step and blocks only the hashes
+    VirusTotal flagged (BLOCK_VERDICTS); hashes it has no verdict for are left alone.
+    """
+    async def action(context: PlaybookContext) -> List[str]:
+        # Never a hash from a *_before field (the legitimate file) or one found in free text
+        hashes = extract_blockable_hashes(context.alert_data)
+        lines = []
+        if selective:
+            enriched = context.extra.get("enrichment", {})
+            verdicts = {hash_val: verdict_for(result)[0] for hash_val, result in enriched.items()
+                        if not isinstance(result, BaseException)}
+            lines = [f"{prefix}: Hash {hash_val} not blocked, VirusTotal verdict "
+                     f"{verdicts.get(hash_val, 'unavailable')}"
+                     for hash_val in hashes if verdicts.get(hash_val) not in BLOCK_VERDICTS]
+            hashes = [hash_val for hash_val in hashes if verdicts.get(hash_val) in BLOCK_VERDICTS]
+        if not hashes:
+            return lines
+        # Hashes blocked by an earlier attempt are still pending in the unit of work, where
+        # is_blocked cannot see them; a retry only blocks the ones that failed
+        blocked = context.extra.setdefault("blocked_hashes", {})
+
+        async def block(hash_val: str) -> Dict[str, Any]:
+            if hash_val not in blocked:
+                blocked[hash_val] = await block_hash(hash_val, context.uow)
+            return blocked[hash_val]
+
+        # Let every block finish before failing the attempt, so none is still running into the retry
+        results = await asyncio.gather(*(block(hash_val) for hash_val in hashes), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return [f"{prefix}: Hash {hash_val} already blocked via FleetDM" if result["status"] == "already_blocked"
+                else f"{prefix}: Blocked hash {hash_val} via FleetDM"
+                for hash_val, result in zip(hashes, results)] + lines
+
+    return Step("block", action, depends_on=("enrich",) if selective else (), timeout=15.0, retries=2)
+
+# Critical response playbook for high-severity incidents: containment does not
+# wait for enrichment
+CRITICAL_RESPONSE_PLAYBOOK = Playbook("critical_response", [
+    enrich_step("Critical", Priority.CRITICAL),
+    block_step("Critical"),
+    note("isolate", "Critical: Initiated system isolation procedures"),
+    note("escalate", "Critical: Escalated to incident response team"),
+    note("monitor", "Critical: Enabled enhanced monitoring and logging"),
+])
+
+# High response playbook for medium-high severity incidents: blocking is
+# selective, so it waits for the enrichment verdicts and blocks only flagged hashes
+HIGH_RESPONSE_PLAYBOOK = Playbook("high_response", [
+    enrich_step("High", Priority.HIGH),
+    block_step("High", selective=True),
+    note("network_analysis", "High: Initiated network traffic analysis"),
+    note("user_monitoring", "High: Enhanced user behavior monitoring"),
+])
+
+# Medium response playbook for standard incidents
+MEDIUM_RESPONSE_PLAYBOOK = Playbook("medium_response", [
+    enrich_step("Medium", Priority.MEDIUM),
+    note("monitor", "Medium: Increased monitoring frequency"),
+    note("alerting", "Medium: Enabled additional alerting rules"),
+    note("log_analysis", "Medium: Scheduled detailed log analysis"),
+])
+
+# Phishing-specific response playbook
+PHISHING_RESPONSE_PLAYBOOK = Playbook("phishing_response", [
+    note("quarantine", "Phishing: Quarantined suspicious emails"),
+    note("block_urls", "Phishing: Blocked suspicious URLs and domains"),
+    note("notify_users", "Phishing: Sent user awareness notification"),
+    note("credential_monitoring", "Phishing: Enabled credential compromise monitoring"),
+])
+
+# Data exfiltration response playbook
+DATA_LEAK_RESPONSE_PLAYBOOK = Playbook("data_leak_response", [
+    note("data_flow_analysis", "Data Leak: Initiated data flow analysis"),
+    note("access_review", "Data Leak: Reviewing access patterns and permissions"),
+    note("encryption_check", "Data Leak: Verified data encryption status"),
+    note("egress_monitoring", "Data Leak: Enhanced external communication monitoring"),
+    note("compliance", "Data Leak: Initiated compliance notification procedures"),
+])
+
+# Denial of Service response playbook
+DOS_RESPONSE_PLAYBOOK = Playbook("dos_response", [
+    note("traffic_filtering", "DoS: Implemented traffic filtering rules"),
+    note("rate_limiting", "DoS: Enabled rate limiting on affected services"),
+    note("cdn_waf", "DoS: Activated CDN and WAF protections"),
+    note("scaling", "DoS: Initiated resource scaling procedures"),
+    note("isp", "DoS: Coordinated with ISP for traffic mitigation"),
+])
+
+# Privilege escalation response playbook
+PRIVILEGE_ESCALATION_PLAYBOOK = Playbook("privilege_escalation_response", [
+    note("access_review", "Privilege: Initiated comprehensive access review"),
+    note("invalidate_sessions", "Privilege: Invalidated suspicious sessions"),
+    note("enforce_mfa", "Privilege: Enforced MFA for affected accounts"),
+    note("audit_logging", "Privilege: Enhanced audit logging for privileged operations"),
+    note("password_reset", "Privilege: Required password resets for compromised accounts",
+         depends_on=["invalidate_sessions"]),
+])
+
+# Default response playbook for standard monitoring and alerting
+DEFAULT_RESPONSE_PLAYBOOK = Playbook("default_response", [
+    enrich_step("Default", Priority.DEFAULT),
+    note("monitor", "Default: Enhanced monitoring and alerting"),
+    note("document", "Default: Documented incident for review"),
+    note("follow_up", "Default: Scheduled follow-up investigation", depends_on=["document"]),
+])
+
+# Durable queue for automated responses, drained by workers started with the app
+job_queue = JobQueue(AsyncSessionLocal, lease_seconds=settings.job_lease_seconds, max_attempts=settings.job_max_attempts)
+job_workers = JobWorkerPool(
+    job_queue,
+    {AUTO_INCIDENT_RESPONSE: run_auto_incident_response_job},
+    concurrency=settings.job_workers,
+    poll_interval=settings.job_poll_seconds,
+)
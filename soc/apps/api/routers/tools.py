@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 from models import Tool
 
@@ -7,8 +8,9 @@ router = APIRouter()
 
 
 @router.get("/tools")
-async def get_tools(db: Session = Depends(get_db)):
-    tools = db.query(Tool).all()
+async def get_tools(db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(Tool))
+    tools = result.scalars().all()
     return [
         {
             "id": tool.id,
@@ -4,7 +4,7 @@ Pushes AI-powered security notifications to the frontend dashboard
 """
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 from auth import get_current_user_ws
 import json
@@ -78,7 +78,7 @@ class ConnectionManager:
 manager = ConnectionManager()
 
 @router.websocket("/ws/ai-alerts")
-async def websocket_ai_alerts(websocket: WebSocket, db: Session = Depends(get_db)):
+async def websocket_ai_alerts(websocket: WebSocket, db: AsyncSession = Depends(get_db)):
     """WebSocket endpoint for real-time AI-powered security alerts"""
 
     try:
@@ -0,0 +1,241 @@
+"""
+Quota-aware scheduling of enrichment lookups
+
+Every provider gets one EnrichmentScheduler: a priority queue drained by a
+single dispatcher task that spends tokens from the provider's TokenBucket. The
+bucket refills at the provider's quota, so bursts queue up instead of turning
+into 429s. Critical-playbook lookups sit in a lane ahead of default ones, and
+up to `batch_size` queued lookups go out in one call for providers that accept
+several indicators per request. If the provider still answers 429, the batch
+goes back to the front of its lane and the bucket pauses.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Queue lanes; lower values are dispatched first"""
+    CRITICAL = 0
+    HIGH = 1
+    MEDIUM = 2
+    DEFAULT = 3
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def _refill(self) -> None:
+        now = self.clock()
+        if now > self._updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def delay(self, n: float = 1) -> float:
+        """Seconds until n tokens can be taken"""
+        self._refill()
+        wait = max(0.0, self._paused_until - self.clock())
+        if self.tokens < n:
+            wait = max(wait, (n - self.tokens) / self.rate)
+        return wait
+
+    def take(self, n: float = 1) -> None:
+        self._refill()
+        self.tokens -= n
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for a while, e.g. after the provider answered 429"""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+        self._paused_until = max(self._paused_until, self.clock() + seconds)
+
+
+class _Request:
+    __slots__ = ("priority", "seq", "value", "future", "enqueued", "attempts")
+
+    def __init__(self, priority: int, seq: int, value: str, future: asyncio.Future, enqueued: float):
+        self.priority = priority
+        self.seq = seq
+        self.value = value
+        self.future = future
+        self.enqueued = enqueued
+        self.attempts = 0
+
+    def __lt__(self, other: "_Request") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class EnrichmentScheduler:
+    """Priority queue of lookups for one provider, dispatched at its quota.
+
+    `fetch_batch(values)` performs one provider request and returns a dict of
+    value -> result; `is_rate_limited(exc)` tells a quota rejection apart from
+    other failures.
+    """
+
+    def __init__(self, name: str, fetch_batch: Callable[[List[str]], Awaitable[Dict[str, Any]]],
+                 rate_per_second: float, burst: float, batch_size: int = 1, max_attempts: int = 3,
+                 is_rate_limited: Callable[[Exception], bool] = lambda exc: False,
+                 retry_after: Optional[float] = None):
+        self.name = name
+        self.fetch_batch = fetch_batch
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max_attempts
+        self.is_rate_limited = is_rate_limited
+        self.retry_after = retry_after if retry_after is not None else 1.0 / rate_per_second
+        self._heap: List[_Request] = []
+        self._seq = itertools.count()
+        self._waits = deque(maxlen=1000)
+        self._inflight = set()
+        self._loop = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.counters = {"submitted": 0, "calls": 0, "completed": 0, "failed": 0, "rate_limited": 0}
+
+    async def submit(self, value: str, priority: int = Priority.DEFAULT) -> Any:
+        """Queue a lookup and wait for its result"""
+        self._ensure_dispatcher()
+        priority = min(max(int(priority), Priority.CRITICAL), Priority.DEFAULT)
+        future = self._loop.create_future()
+        heapq.heappush(self._heap, _Request(priority, next(self._seq), value, future, time.monotonic()))
+        self.counters["submitted"] += 1
+        self._wakeup.set()
+        return await future
+
+    def _ensure_dispatcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._dispatcher is not None and not self._dispatcher.done():
+            return
+        if self._loop is not loop:
+            self._heap = []  # futures of a previous (closed) loop can never be awaited again
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._dispatcher = loop.create_task(self._run(), name=f"{self.name}-enrichment-scheduler")
+
+    async def _run(self) -> None:
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self.bucket.delay(1)
+            if delay > 0:
+                # Sleep without committing to a batch, so anything more urgent
+                # queued meanwhile still goes first
+                await asyncio.sleep(delay)
+                continue
+
+            batch = self._pop_batch()
+            if not batch:
+                continue
+            self.bucket.take(1)
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    def _pop_batch(self) -> List[_Request]:
+        batch, values = [], set()
+        while self._heap and len(values) < self.batch_size:
+            request = heapq.heappop(self._heap)
+            if request.future.done():  # caller went away
+                continue
+            batch.append(request)
+            values.add(request.value)
+        now = time.monotonic()
+        for request in batch:
+            if request.attempts == 0:
+                self._waits.append(now - request.enqueued)
+        return batch
+
+    async def _dispatch(self, batch: List[_Request]) -> None:
+        values = list(dict.fromkeys(request.value for request in batch))
+        self.counters["calls"] += 1
+        try:
+            results = await self.fetch_batch(values)
+        except Exception as e:
+            if self.is_rate_limited(e):
+                self.counters["rate_limited"] += 1
+                self.bucket.pause(self.retry_after)
+                retry = [request for request in batch if request.attempts + 1 < self.max_attempts]
+                for request in retry:
+                    request.attempts += 1
+                    heapq.heappush(self._heap, request)  # keeps its seq, so it returns to the front of its lane
+                if retry:
+                    self._wakeup.set()
+                batch = [request for request in batch if request not in retry]
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            self.counters["failed"] += len(batch)
+            return
+
+        for request in batch:
+            if request.future.done():
+                continue
+            if request.value in results:
+                request.future.set_result(results[request.value])
+                self.counters["completed"] += 1
+            else:
+                request.future.set_exception(KeyError(request.value))
+                self.counters["failed"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, wait times and throughput counters"""
+        by_lane = {priority.name.lower(): 0 for priority in Priority}
+        for request in self._heap:
+            if not request.future.done():
+                by_lane[Priority(request.priority).name.lower()] += 1
+
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 4) if waits else 0.0
+
+        return {
+            "provider": self.name,
+            "queue_depth": sum(by_lane.values()),
+            "queue_depth_by_priority": by_lane,
+            "in_flight": len(self._inflight),
+            "tokens_available": round(self.bucket.available(), 3),
+            "rate_per_second": self.bucket.rate,
+            "batch_size": self.batch_size,
+            "wait_seconds": {
+                "samples": len(waits),
+                "avg": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(waits[-1], 4) if waits else 0.0,
+            },
+            **self.counters,
+        }
+
+    async def aclose(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+        for request in self._heap:
+            if not request.future.done():
+                request.future.cancel()
+        self._heap = []
+        self._dispatcher = None
+        self._loop = None
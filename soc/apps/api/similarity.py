@@ -0,0 +1,311 @@
+"""
+In-memory MinHash LSH index for "have we seen this incident before?"
+
+Each incident's title, description and tags are reduced to a set of word and
+word-bigram shingles, summarised by a MinHash signature, and bucketed by LSH
+bands. Incidents sharing at least one band bucket are candidates; candidates
+are ranked by the fraction of matching signature slots (estimated Jaccard).
+
+Layout, tuned for around a million incidents:
+  - a compacted segment of numpy arrays: per band, bucket keys sorted with the
+    row positions they point at (lookups are np.searchsorted), plus the low 16
+    bits of every signature slot for ranking (b-bit MinHash)
+  - a small delta segment of plain dicts/lists for incidents added since the
+    last compaction; it is merged into the arrays in a background thread once
+    it grows past `compact_threshold`
+
+With the default 64 permutations / 16 bands that is about 256 bytes per
+incident. Signatures use crc32 shingle hashes, so they are deterministic, but
+the index is never persisted; it is rebuilt from the incidents table at startup.
+"""
+
+import logging
+import re
+import threading
+import zlib
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9_.\-]*")
+_PRIME = np.uint64(4294967291)  # largest prime below 2**32, keeps a*x+b inside uint64
+_EMPTY = np.uint32(0xFFFFFFFF)
+
+
+def incident_text(title: Optional[str], description: Optional[str], tags: Optional[str]) -> str:
+    """Text the index is built from"""
+    return " ".join(filter(None, [title, description, tags]))
+
+
+def shingles(text: str) -> List[int]:
+    """crc32 hashes of the distinct lowercase word unigrams and bigrams in text"""
+    tokens = _TOKEN_RE.findall(text.lower())
+    grams = set(tokens)
+    grams.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return [zlib.crc32(gram.encode()) for gram in grams]
+
+
+class _Segment(NamedTuple):
+    ids: np.ndarray    # (n,) int64, ascending
+    sigs: np.ndarray   # (n, num_perm) uint16
+    keys: np.ndarray   # (bands, n) uint32, each row sorted
+    pos: np.ndarray    # (bands, n) int32, row positions matching keys
+
+
+class SimilarityIndex:
+    """MinHash LSH index of incident ids"""
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 1,
+                 compact_threshold: int = 20000, max_bucket: int = 250):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.compact_threshold = compact_threshold
+        self.max_bucket = max_bucket  # newest entries taken from one hot bucket
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._band_coeff = rng.integers(1, 2**63, size=self.rows, dtype=np.uint64) | np.uint64(1)
+
+        self._lock = threading.Lock()
+        self._main = self._empty_segment()
+        self._delta_ids: List[int] = []
+        self._delta_sigs: List[np.ndarray] = []
+        self._delta_keys: List[np.ndarray] = []
+        self._delta_buckets = {}  # (band, key) -> [delta positions]
+        self._compacting = False
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._main.ids) + len(self._delta_ids)
+
+    # Signatures
+
+    def signatures(self, texts: Iterable[str], chunk_size: int = 1000) -> np.ndarray:
+        """(n, num_perm) uint32 MinHash signatures; rows of texts without shingles are all _EMPTY"""
+        texts = list(texts)
+        out = np.full((len(texts), self.num_perm), _EMPTY, dtype=np.uint32)
+
+        for start in range(0, len(texts), chunk_size):
+            hashed = [shingles(text) for text in texts[start:start + chunk_size]]
+            lengths = np.fromiter(map(len, hashed), dtype=np.int64, count=len(hashed))
+            if not lengths.any():
+                continue
+            flat = np.fromiter((h for row in hashed for h in row), dtype=np.uint64, count=int(lengths.sum()))
+            permuted = (flat[:, None] * self._a + self._b) % _PRIME
+            nonempty = np.flatnonzero(lengths)
+            offsets = (np.cumsum(lengths) - lengths)[nonempty]
+            out[start + nonempty] = np.minimum.reduceat(permuted, offsets, axis=0)
+
+        return out
+
+    def _band_keys(self, sigs: np.ndarray) -> np.ndarray:
+        """(n, bands) uint32 bucket keys, one per band of rows signature slots"""
+        banded = sigs.reshape(len(sigs), self.bands, self.rows).astype(np.uint64)
+        mixed = (banded * self._band_coeff).sum(axis=2)
+        return (mixed ^ (mixed >> np.uint64(32))).astype(np.uint32)
+
+    # Building and maintenance
+
+    def _empty_segment(self) -> _Segment:
+        return _Segment(np.empty(0, np.int64), np.empty((0, self.num_perm), np.uint16),
+                        np.empty((self.bands, 0), np.uint32), np.empty((self.bands, 0), np.int32))
+
+    def _segment(self, ids: np.ndarray, sigs16: np.ndarray, keys: np.ndarray) -> _Segment:
+        order = np.argsort(ids, kind='stable')
+        ids, sigs16, keys = ids[order], sigs16[order], keys[order]
+        pos = np.argsort(keys, axis=0, kind='stable').T.astype(np.int32)
+        sorted_keys = np.take_along_axis(keys.T, pos, axis=1)
+        return _Segment(ids, sigs16, sorted_keys, pos)
+
+    def _segment_keys(self, segment: _Segment) -> np.ndarray:
+        """Recover the unsorted (n, bands) key matrix of a segment"""
+        keys = np.empty((len(segment.ids), self.bands), dtype=np.uint32)
+        for band in range(self.bands):
+            keys[segment.pos[band], band] = segment.keys[band]
+        return keys
+
+    def rebuild(self, rows: Iterable[Tuple[int, str]], chunk_size: int = 10000) -> None:
+        """Replace the index contents with (incident_id, text) rows"""
+        id_parts, sig_parts, key_parts = [], [], []
+        batch: List[Tuple[int, str]] = []
+
+        def flush():
+            ids = np.fromiter((row[0] for row in batch), dtype=np.int64, count=len(batch))
+            sigs = self.signatures(row[1] for row in batch)
+            keep = sigs[:, 0] != _EMPTY
+            id_parts.append(ids[keep])
+            sig_parts.append(sigs[keep].astype(np.uint16))
+            key_parts.append(self._band_keys(sigs[keep]))
+            batch.clear()
+
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                flush()
+        if batch:
+            flush()
+
+        if id_parts:
+            segment = self._segment(np.concatenate(id_parts), np.concatenate(sig_parts),
+                                    np.concatenate(key_parts))
+        else:
+            segment = self._empty_segment()
+
+        with self._lock:
+            self._main = segment
+            self._drop_delta_through(int(segment.ids[-1]) if len(segment.ids) else None)
+        self.ready = True
+        logger.info(f"Similarity index rebuilt with {len(segment.ids)} incidents")
+
+    def add(self, incident_id: int, text: str) -> None:
+        """Index one new incident; cheap enough for the request path"""
+        self.add_many([incident_id], [text])
+
+    def add_many(self, incident_ids: Sequence[int], texts: Sequence[str]) -> None:
+        """Index a batch of new incidents with one vectorised signature pass"""
+        if not len(incident_ids):
+            return
+        sigs = self.signatures(list(texts))
+        keep = sigs[:, 0] != _EMPTY
+        if not keep.any():
+            return
+        sigs = sigs[keep]
+        ids = [incident_id for incident_id, kept in zip(incident_ids, keep.tolist()) if kept]
+        all_keys = self._band_keys(sigs)
+
+        with self._lock:
+            for incident_id, sig, keys in zip(ids, sigs, all_keys):
+                position = len(self._delta_ids)
+                self._delta_ids.append(incident_id)
+                self._delta_sigs.append(sig.astype(np.uint16))
+                self._delta_keys.append(keys)
+                for band, key in enumerate(keys.tolist()):
+                    self._delta_buckets.setdefault((band, key), []).append(position)
+            start_compaction = len(self._delta_ids) >= self.compact_threshold and not self._compacting
+            if start_compaction:
+                self._compacting = True
+
+        if start_compaction:
+            threading.Thread(target=self.compact, name="similarity-compact", daemon=True).start()
+
+    def compact(self) -> None:
+        """Merge the delta segment into the sorted arrays"""
+        try:
+            with self._lock:
+                main = self._main
+                count = len(self._delta_ids)
+                if not count:
+                    return
+                delta_ids = np.array(self._delta_ids[:count], dtype=np.int64)
+                delta_sigs = np.stack(self._delta_sigs[:count])
+                delta_keys = np.stack(self._delta_keys[:count])
+
+            # The expensive part runs without the lock; queries keep using the old arrays
+            merged = self._segment(np.concatenate([main.ids, delta_ids]),
+                                   np.concatenate([main.sigs, delta_sigs]),
+                                   np.concatenate([self._segment_keys(main), delta_keys]))
+
+            with self._lock:
+                self._main = merged
+                self._drop_delta_prefix(count)
+        finally:
+            self._compacting = False
+
+    def _drop_delta_prefix(self, count: int) -> None:
+        self._delta_ids = self._delta_ids[count:]
+        self._delta_sigs = self._delta_sigs[count:]
+        self._delta_keys = self._delta_keys[count:]
+        self._delta_buckets = {}
+        for position, keys in enumerate(self._delta_keys):
+            for band, key in enumerate(keys.tolist()):
+                self._delta_buckets.setdefault((band, key), []).append(position)
+
+    def _drop_delta_through(self, max_id: Optional[int]) -> None:
+        """Forget delta entries a rebuild already covered (ids are autoincrement)"""
+        if max_id is None:
+            return
+        covered = sum(1 for incident_id in self._delta_ids if incident_id <= max_id)
+        if covered == len(self._delta_ids):
+            self._drop_delta_prefix(covered)
+        elif covered:
+            keep = [i for i, incident_id in enumerate(self._delta_ids) if incident_id > max_id]
+            self._delta_ids = [self._delta_ids[i] for i in keep]
+            self._delta_sigs = [self._delta_sigs[i] for i in keep]
+            self._delta_keys = [self._delta_keys[i] for i in keep]
+            self._drop_delta_prefix(0)
+
+    # Queries
+
+    def similar(self, text: str, k: int = 10, exclude_id: Optional[int] = None,
+                min_similarity: float = 0.0) -> List[Tuple[int, float]]:
+        """Top-k (incident_id, estimated Jaccard similarity) pairs for text"""
+        sig = self.signatures([text])[0]
+        if sig[0] == _EMPTY:
+            return []
+        keys = self._band_keys(sig[None])[0]
+        sig16 = sig.astype(np.uint16)
+
+        with self._lock:
+            main = self._main
+            delta_ids = self._delta_ids
+            delta_sigs = self._delta_sigs
+            delta_positions = set()
+            for band, key in enumerate(keys.tolist()):
+                delta_positions.update(self._delta_buckets.get((band, key), ())[-self.max_bucket:])
+            delta_positions = sorted(delta_positions)
+
+        ids_parts, sim_parts = [], []
+
+        if len(main.ids):
+            lo = [np.searchsorted(main.keys[band], keys[band], side='left') for band in range(self.bands)]
+            hi = [np.searchsorted(main.keys[band], keys[band], side='right') for band in range(self.bands)]
+            # Within a bucket positions ascend with incident id, so the tail is the newest
+            buckets = [main.pos[band, max(lo[band], hi[band] - self.max_bucket):hi[band]]
+                       for band in range(self.bands) if hi[band] > lo[band]]
+            if buckets:
+                positions = np.unique(np.concatenate(buckets))
+                ids_parts.append(main.ids[positions])
+                sim_parts.append((main.sigs[positions] == sig16).mean(axis=1))
+
+        if delta_positions:
+            ids_parts.append(np.array([delta_ids[p] for p in delta_positions], dtype=np.int64))
+            sim_parts.append((np.stack([delta_sigs[p] for p in delta_positions]) == sig16).mean(axis=1))
+
+        if not ids_parts:
+            return []
+        ids = np.concatenate(ids_parts)
+        sims = np.concatenate(sim_parts)
+
+        keep = sims >= min_similarity
+        if exclude_id is not None:
+            keep &= ids != exclude_id
+        ids, sims = ids[keep], sims[keep]
+
+        # Highest similarity first, newest incident first on ties
+        order = np.lexsort((-ids, -sims))[:k]
+        return [(int(ids[i]), round(float(sims[i]), 4)) for i in order]
+
+
+def rebuild_from_db(index: SimilarityIndex, session_factory, chunk_size: int = 10000) -> None:
+    """Rebuild index from the incidents table; blocking, run it in a worker thread"""
+    from models import Incident
+
+    db = session_factory()
+    try:
+        rows = (
+            db.query(Incident.id, Incident.title, Incident.description, Incident.tags)
+            .order_by(Incident.id)
+            .yield_per(chunk_size)
+        )
+        index.rebuild(((row.id, incident_text(row.title, row.description, row.tags)) for row in rows),
+                      chunk_size=chunk_size)
+    except Exception as e:
+        logger.error(f"Similarity index rebuild failed: {e}")
+    finally:
+        db.close()
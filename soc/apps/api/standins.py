@@ -0,0 +1,313 @@
+"""
+Local stand-ins for external integrations
+
+Small HTTP servers that speak just enough of an integration's API for the
+code paths this service uses (VirusTotal file reports, FleetDM policies,
+Keycloak discovery/JWKS/token endpoints), so tests, benchmarks and the load
+driver run offline against a real socket. Each server runs in a background
+thread, records the calls it receives, and can add latency, fail a share of
+requests and enforce a rate limit with 429 responses.
+
+Usage:
+    python standins.py fleetdm --port 8412
+    python standins.py all --latency 0.05 --error-rate 0.01
+"""
+
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+
+class StandInServer:
+    """Threaded HTTP server; subclasses implement handle(method, path, body).
+
+    `latency` seconds are added to every response; `error_rate` of requests
+    fail with `error_status`; above `rate_limit` requests per second (bursts
+    of up to `burst`) requests are answered 429 with a Retry-After header.
+    """
+
+    name = "stand-in"
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, rate_limit: Optional[float] = None, burst: Optional[float] = None,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit = rate_limit
+        self.burst = burst if burst is not None else max(1.0, rate_limit or 1.0)
+        self.calls: List[Tuple[str, str]] = []
+        self.counters = {"requests": 0, "errors": 0, "rate_limited": 0}
+        self._tokens = self.burst
+        self._refilled = time.monotonic()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle(self, method: str, path: str, body: Any) -> Tuple[int, Any]:
+        raise NotImplementedError
+
+    def _admit(self) -> Optional[int]:
+        """Status to fail the request with (429 or the injected error), or None to serve it"""
+        with self._lock:
+            self.counters["requests"] += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate_limit)
+                self._refilled = now
+                if self._tokens < 1:
+                    self.counters["rate_limited"] += 1
+                    return 429
+                self._tokens -= 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.counters["errors"] += 1
+                return self.error_status
+        return None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real services
+
+            def _dispatch(self, method: str) -> None:
+                length = int(self.headers.get("content-length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                if self.headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
+                    body = dict(parse_qsl(raw.decode()))
+                else:
+                    try:
+                        body = json.loads(raw) if raw else None
+                    except ValueError:
+                        body = None
+                with server._lock:
+                    server.calls.append((method, self.path))
+                if server.latency:
+                    time.sleep(server.latency)
+                failure = server._admit()
+                if failure is None:
+                    status, payload = server.handle(method, self.path, body)
+                else:
+                    status, payload = failure, {"error": {"code": "StandInError", "message": f"HTTP {failure}"}}
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(data)))
+                if status == 429:
+                    self.send_header("retry-after", "1")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name=f"{self.name}-stand-in",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+class FleetDMStandIn(StandInServer):
+    """FleetDM global policies: POST/GET /api/v1/fleet/global/policies"""
+
+    name = "fleetdm"
+    POLICIES = "/api/v1/fleet/global/policies"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.policies: List[Dict[str, Any]] = []
+
+    def handle(self, method: str, path: str, body: Any) -> Tuple[int, Any]:
+        if path != self.POLICIES:
+            return 404, {"message": "Resource Not Found"}
+        if method == "GET":
+            return 200, {"policies": self.policies}
+        if not isinstance(body, dict) or not body.get("name") or not body.get("query"):
+            return 422, {"message": "Validation Failed", "errors": [{"name": "query", "reason": "required"}]}
+        with self._lock:
+            policy = {"id": len(self.policies) + 1, **body}
+            self.policies.append(policy)
+        return 200, {"policy": policy}
+
+
+class VirusTotalStandIn(StandInServer):
+    """VirusTotal v3 file reports: GET /api/v3/files/{hash}.
+
+    Verdicts are derived from the hash, so repeated runs see the same
+    reports; `unknown_rate` of hashes are answered 404 (never seen).
+    """
+
+    name = "virustotal"
+    FILES = "/api/v3/files/"
+
+    def __init__(self, *args, unknown_rate: float = 0.2, malicious_rate: float = 0.3, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.unknown_rate = unknown_rate
+        self.malicious_rate = malicious_rate
+
+    @property
+    def api_url(self) -> str:
+        """Value for the virustotal_base_url setting"""
+        return f"{self.base_url}/api/v3"
+
+    def handle(self, method: str, path: str, body: Any) -> Tuple[int, Any]:
+        if method != "GET" or not path.startswith(self.FILES):
+            return 404, {"error": {"code": "NotFoundError", "message": "Resource not found"}}
+        hash_value = path[len(self.FILES):].lower()
+        try:
+            score = int(hash_value[:8], 16) / 0xFFFFFFFF
+        except ValueError:
+            return 400, {"error": {"code": "InvalidArgumentError", "message": "Invalid file hash"}}
+        if score < self.unknown_rate:
+            return 404, {"error": {"code": "NotFoundError", "message": f'File "{hash_value}" not found'}}
+        malicious = 40 + int(score * 20) if score < self.unknown_rate + self.malicious_rate else 0
+        stats = {"malicious": malicious, "suspicious": 0, "undetected": 70 - malicious, "harmless": 0}
+        return 200, {"data": {"id": hash_value, "type": "file",
+                              "attributes": {"sha256": hash_value, "last_analysis_stats": stats}}}
+
+
+def _b64url_uint(value: int) -> str:
+    data = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+class KeycloakStandIn(StandInServer):
+    """One Keycloak realm: OIDC discovery, JWKS and the token endpoint (password grant).
+
+    Tokens are RS256-signed with a key generated at startup and carry the
+    user's realm roles under realm_access.roles, like Keycloak's.
+    """
+
+    name = "keycloak"
+
+    def __init__(self, *args, realm: str = "cyberblue", audience: str = "cyberblue-soc-api",
+                 users: Optional[Dict[str, List[str]]] = None, token_ttl: int = 3600, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.realm = realm
+        self.audience = audience
+        self.users = users if users is not None else {"analyst": ["analyst"], "admin": ["admin", "analyst"]}
+        self.token_ttl = token_ttl
+        self.jwks = {"keys": []}
+        self.rotate_key()
+
+    def rotate_key(self) -> str:
+        """Sign new tokens with a fresh key; the old public keys stay in the JWKS, as in Keycloak"""
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        self.kid = f"stand-in-rs256-{len(self.jwks['keys'])}"
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self._private_pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                              serialization.NoEncryption())
+        numbers = key.public_key().public_numbers()
+        self.jwks = {"keys": [{"kty": "RSA", "kid": self.kid, "use": "sig", "alg": "RS256",
+                               "n": _b64url_uint(numbers.n), "e": _b64url_uint(numbers.e)},
+                              *self.jwks["keys"]]}
+        return self.kid
+
+    @property
+    def issuer(self) -> str:
+        """Value for the oidc_issuer setting"""
+        return f"{self.base_url}/realms/{self.realm}"
+
+    def token_for(self, username: str) -> str:
+        from jose import jwt
+
+        now = int(time.time())
+        claims = {
+            "iss": self.issuer,
+            "aud": self.audience,
+            "sub": f"stand-in-{username}",
+            "preferred_username": username,
+            "realm_access": {"roles": list(self.users[username])},
+            "iat": now,
+            "exp": now + self.token_ttl,
+        }
+        return jwt.encode(claims, self._private_pem, algorithm="RS256", headers={"kid": self.kid})
+
+    def handle(self, method: str, path: str, body: Any) -> Tuple[int, Any]:
+        prefix = f"/realms/{self.realm}"
+        if path == f"{prefix}/.well-known/openid-configuration":
+            return 200, {
+                "issuer": self.issuer,
+                "jwks_uri": f"{self.issuer}/protocol/openid-connect/certs",
+                "token_endpoint": f"{self.issuer}/protocol/openid-connect/token",
+            }
+        if path == f"{prefix}/protocol/openid-connect/certs":
+            return 200, self.jwks
+        if path == f"{prefix}/protocol/openid-connect/token" and method == "POST":
+            body = body or {}
+            username = body.get("username")
+            if body.get("grant_type") != "password" or username not in self.users:
+                return 401, {"error": "invalid_grant", "error_description": "Invalid user credentials"}
+            return 200, {"access_token": self.token_for(username), "token_type": "Bearer",
+                         "expires_in": self.token_ttl}
+        return 404, {"error": "Unable to find matching target resource method"}
+
+
+STAND_INS = {"virustotal": VirusTotalStandIn, "fleetdm": FleetDMStandIn, "keycloak": KeycloakStandIn}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run local stand-ins for external integrations")
+    parser.add_argument("service", choices=[*sorted(STAND_INS), "all"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="first port; with 'all', one port per service")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 503")
+    parser.add_argument("--rate-limit", type=float, default=None, help="requests per second before 429s")
+    args = parser.parse_args()
+
+    names = sorted(STAND_INS) if args.service == "all" else [args.service]
+    servers = []
+    for offset, name in enumerate(names):
+        port = args.port + offset if args.port else 0
+        server = STAND_INS[name](args.host, port, latency=args.latency, error_rate=args.error_rate,
+                                 rate_limit=args.rate_limit).start()
+        servers.append(server)
+        print(f"{name} stand-in listening on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    for server in servers:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
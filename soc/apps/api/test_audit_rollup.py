@@ -0,0 +1,116 @@
+"""
+Tests for the trigger-maintained audit rollups and the summary read from them
+"""
+
+import asyncio
+import importlib.util
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, delete, func, insert, inspect, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+from models import AuditLog, AuditRollup, Base
+from routers.audit import get_audit_summary
+
+MIGRATION = os.path.join(os.path.dirname(__file__), "alembic", "versions", "006_audit_rollups.py")
+NOW = datetime.utcnow()
+
+
+def make_engine(*tables):
+    path = os.path.join(tempfile.mkdtemp(), "rollups.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=[table.__table__ for table in tables])
+    return engine
+
+
+def entries(count, **values):
+    return [{"user_sub": f"user-{n % 3}", "action": ["login", "logout"][n % 2], "resource": "session",
+             "details": "seeded", "created_at": NOW - timedelta(hours=7 * n), **values} for n in range(count)]
+
+
+def rollup_counts(engine):
+    with engine.connect() as conn:
+        return {(str(day), action, user): count for day, action, user, count in conn.execute(
+            select(AuditRollup.day, AuditRollup.action, AuditRollup.user_sub, AuditRollup.count)
+            .where(AuditRollup.count > 0))}
+
+
+def grouped_counts(engine):
+    with engine.connect() as conn:
+        return {(day, action or "", user or ""): count for day, action, user, count in conn.execute(
+            select(func.date(AuditLog.created_at), AuditLog.action, AuditLog.user_sub, func.count())
+            .group_by(func.date(AuditLog.created_at), AuditLog.action, AuditLog.user_sub))}
+
+
+def test_rollups_follow_every_kind_of_write():
+    engine = make_engine(AuditLog, AuditRollup)
+    with engine.begin() as conn:
+        conn.execute(insert(AuditLog), entries(200))
+    with Session(engine) as db:
+        db.add(AuditLog(user_sub=None, action="tool_restart", resource="tool:1", details="Restarted Wazuh"))
+        db.commit()
+    with engine.begin() as conn:
+        conn.execute(update(AuditLog).where(AuditLog.id <= 20).values(action="export_tools"))
+        conn.execute(update(AuditLog).where(AuditLog.id.between(21, 30)).values(details="edited"))
+        conn.execute(delete(AuditLog).where(AuditLog.id > 150, AuditLog.id <= 200))
+
+    assert rollup_counts(engine) == grouped_counts(engine)
+    assert sum(rollup_counts(engine).values()) == 151
+
+
+def test_summary_matches_a_scan_of_the_raw_entries():
+    engine = make_engine(AuditLog, AuditRollup)
+    with engine.begin() as conn:
+        conn.execute(insert(AuditLog), entries(400))
+    path = engine.url.database
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+    async def summary(days):
+        async with async_sessionmaker(async_engine)() as db:
+            return await get_audit_summary(days=days, db=db)
+
+    for days in (1, 7, 30):
+        since = (NOW - timedelta(days=days - 1)).date().isoformat()
+        with engine.connect() as conn:
+            by_day = dict(conn.execute(
+                select(func.date(AuditLog.created_at), func.count())
+                .where(func.date(AuditLog.created_at) >= since).group_by(func.date(AuditLog.created_at))).all())
+            by_action = dict(conn.execute(
+                select(AuditLog.action, func.count())
+                .where(func.date(AuditLog.created_at) >= since).group_by(AuditLog.action)).all())
+        result = asyncio.run(summary(days))
+        assert result["daily_activity"] == [{"date": day, "count": count} for day, count in sorted(by_day.items())]
+        assert result["action_counts"] == by_action
+        assert sum(result["user_counts"].values()) == sum(by_day.values())
+    asyncio.run(async_engine.dispose())
+
+
+def test_migration_backfills_existing_entries():
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+
+    spec = importlib.util.spec_from_file_location("migration_006", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    engine = make_engine(AuditLog)
+
+    def run(step):
+        with engine.connect() as conn:
+            with Operations.context(MigrationContext.configure(conn)):
+                step()
+            conn.commit()
+
+    with engine.begin() as conn:
+        conn.execute(insert(AuditLog), entries(100))
+    run(migration.upgrade)
+    with engine.begin() as conn:
+        conn.execute(insert(AuditLog), entries(10, action="login"))
+    assert rollup_counts(engine) == grouped_counts(engine)
+
+    run(migration.downgrade)
+    assert "audit_rollups" not in inspect(engine).get_table_names()
+    with engine.begin() as conn:
+        conn.execute(insert(AuditLog), entries(1))  # no trigger left behind
@@ -0,0 +1,114 @@
+"""
+Tests for audit log full-text search (SQLite FTS5 flavour)
+"""
+
+import asyncio
+import importlib.util
+import os
+import tempfile
+
+from sqlalchemy import create_engine, delete, insert, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from audit_search import apply_search, search_order, search_terms
+from models import AuditLog, Base
+
+MIGRATION = os.path.join(os.path.dirname(__file__), "alembic", "versions", "005_audit_log_search.py")
+
+
+def make_engines():
+    path = os.path.join(tempfile.mkdtemp(), "audit.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=[AuditLog.__table__])
+    return engine, create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+
+def search(async_engine, term, rank=True):
+    async def run():
+        async with async_sessionmaker(async_engine)() as db:
+            dialect = db.bind.dialect.name
+            query = apply_search(select(AuditLog.id), AuditLog, dialect, term)
+            ordering = search_order(AuditLog, dialect, term, rank)
+            return (await db.execute(query.order_by(*ordering))).scalars().all()
+
+    return asyncio.run(run())
+
+
+def test_search_terms_split_on_punctuation_and_underscores():
+    assert search_terms("Block_Hash fleet-dm  10.0.0.1") == ["block", "hash", "fleet", "dm", "10", "0", "0", "1"]
+    assert search_terms("' OR 1=1 --") == ["or", "1", "1"]
+
+
+def test_entries_are_indexed_as_written_and_ranked():
+    engine, async_engine = make_engines()
+    with engine.begin() as conn:
+        conn.execute(insert(AuditLog), [
+            {"user_sub": "analyst", "action": "block_hash_fleetdm", "resource": "hash:" + "a" * 64,
+             "details": "Blocked hash via FleetDM policy 12 from 10.0.0.1"},
+            {"user_sub": "analyst", "action": "virustotal_enrichment", "resource": "hash:" + "a" * 64,
+             "details": "Enriched hash with VirusTotal data from 10.0.0.1"},
+            {"user_sub": "admin", "action": "update_incident_status", "resource": "incident:7",
+             "details": "Changed status from 'open' to 'resolved' from 10.0.0.9"},
+            {"user_sub": "admin", "action": "login", "resource": "session", "details": "Login from 10.0.0.9"},
+        ])
+
+    assert search(async_engine, "fleet") == [1]  # prefix of fleetdm, in action and details
+    assert search(async_engine, "HASH virus") == [2]
+    assert set(search(async_engine, "hash")) == {1, 2}
+    assert search(async_engine, "resolved incident") == [3]
+    assert search(async_engine, "nothing-like-this") == []
+
+    # The entry naming FleetDM twice ranks above the one that only mentions it once
+    with engine.begin() as conn:
+        conn.execute(insert(AuditLog).values(user_sub="admin", action="export_tools", resource="tools",
+                                             details="Exported tools list, including fleetdm"))
+    assert search(async_engine, "fleetdm") == [1, 5]
+    assert search(async_engine, "fleetdm", rank=False) == [5, 1]  # too many matches to score: newest first
+
+    # Updates and deletes reach the index too
+    with engine.begin() as conn:
+        conn.execute(update(AuditLog).where(AuditLog.id == 4).values(details="Login via FleetDM SSO"))
+        conn.execute(delete(AuditLog).where(AuditLog.id == 1))
+    assert set(search(async_engine, "fleetdm")) == {4, 5}
+    assert search(async_engine, "policy") == []
+
+    with engine.connect() as conn:
+        query = apply_search(select(AuditLog.id), AuditLog, "sqlite", "fleet")
+        compiled = query.order_by(*search_order(AuditLog, "sqlite", "fleet")).compile(engine)
+        plan = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled),
+                                                        tuple(compiled.params[n] for n in compiled.positiontup))]
+    assert any("VIRTUAL TABLE INDEX" in step for step in plan), plan
+    assert any(step.startswith("SEARCH audit_logs USING INTEGER PRIMARY KEY") for step in plan), plan
+
+    # Unranked, the match set is read in index order rather than sorted
+    with engine.connect() as conn:
+        compiled = query.order_by(*search_order(AuditLog, "sqlite", "fleet", rank=False)).compile(engine)
+        plan = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled),
+                                                        tuple(compiled.params[n] for n in compiled.positiontup))]
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+    asyncio.run(async_engine.dispose())
+
+
+def test_migration_indexes_existing_entries():
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+
+    spec = importlib.util.spec_from_file_location("migration_005", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    engine, async_engine = make_engines()
+
+    def run(step):
+        with engine.connect() as conn:
+            with Operations.context(MigrationContext.configure(conn)):
+                step()
+            conn.commit()
+
+    # A database from before the search index
+    run(migration.downgrade)
+    with engine.begin() as conn:
+        conn.execute(insert(AuditLog).values(user_sub="admin", action="tool_restart", resource="tool:3",
+                                             details="Restarted Wazuh"))
+    run(migration.upgrade)
+    assert search(async_engine, "wazuh") == [1]
+    asyncio.run(async_engine.dispose())
@@ -0,0 +1,111 @@
+"""
+Tests for token validation and role checks, against the local Keycloak stand-in
+"""
+
+import httpx
+from fastapi import FastAPI, Request
+from jose import jwt
+from fastapi.testclient import TestClient
+
+import auth
+from config import settings
+from standins import KeycloakStandIn
+
+
+def make_app(calls=None):
+    app = FastAPI()
+    calls = [] if calls is None else calls
+
+    @app.get("/cases/{case_id}")
+    @auth.requires_roles(["analyst"])
+    async def get_case(case_id: int, req: Request):
+        calls.append("get_case")
+        return {"case_id": case_id, "user": auth.get_current_user(req)["preferred_username"]}
+
+    @app.get("/admin/settings")
+    @auth.requires_roles(["admin"])
+    async def get_settings(verbose: bool = False):
+        calls.append("get_settings")
+        return {"verbose": verbose}
+
+    return app
+
+
+def use_keycloak(monkeypatch, keycloak):
+    monkeypatch.setattr(settings, "oidc_issuer", keycloak.issuer)
+    monkeypatch.setattr(settings, "oidc_audience", keycloak.audience)
+    middleware = auth.JWTMiddleware()
+    monkeypatch.setattr(auth, "jwt_middleware", middleware)
+    return middleware
+
+
+def certs_fetched(keycloak):
+    return sum(1 for _, path in keycloak.calls if path.endswith("/certs"))
+
+
+def test_roles_are_checked_with_tokens_from_keycloak(monkeypatch):
+    with KeycloakStandIn(users={"analyst": ["analyst"], "admin": ["admin", "analyst"]}) as keycloak:
+        use_keycloak(monkeypatch, keycloak)
+
+        token = httpx.post(f"{keycloak.issuer}/protocol/openid-connect/token",
+                           data={"grant_type": "password", "username": "analyst"}).json()["access_token"]
+        client = TestClient(make_app())
+        analyst = {"Authorization": f"Bearer {token}"}
+        admin = {"Authorization": f"Bearer {keycloak.token_for('admin')}"}
+
+        response = client.get("/cases/7", headers=analyst)
+        assert response.status_code == 200 and response.json() == {"case_id": 7, "user": "analyst"}
+        assert client.get("/admin/settings", headers=analyst).status_code == 403
+        assert client.get("/admin/settings?verbose=true", headers=admin).json() == {"verbose": True}
+        assert client.get("/cases/7").status_code == 401
+        assert client.get("/cases/7", headers={"Authorization": "Bearer not-a-token"}).status_code == 401
+        # Discovery and key set fetched once, not per request
+        assert certs_fetched(keycloak) == 1
+
+
+def test_endpoints_are_not_run_without_a_required_role(monkeypatch):
+    users = {"viewer": [], "manager": ["manager"], "analyst": ["analyst"]}
+    with KeycloakStandIn(users=users) as keycloak:
+        use_keycloak(monkeypatch, keycloak)
+        calls = []
+        client = TestClient(make_app(calls))
+
+        for username in ("viewer", "manager"):
+            headers = {"Authorization": f"Bearer {keycloak.token_for(username)}"}
+            assert client.get("/cases/7", headers=headers).status_code == 403
+            assert client.get("/admin/settings", headers=headers).status_code == 403
+        analyst = {"Authorization": f"Bearer {keycloak.token_for('analyst')}"}
+        assert client.get("/admin/settings", headers=analyst).json()["detail"] == "Insufficient permissions"
+        assert calls == []
+
+        # Signed by the realm, but for another client
+        monkeypatch.setattr(settings, "oidc_audience", "another-client")
+        assert client.get("/cases/7", headers=analyst).status_code == 401
+        assert calls == []
+
+
+def test_unknown_key_ids_refetch_the_key_set(monkeypatch):
+    with KeycloakStandIn() as keycloak:
+        middleware = use_keycloak(monkeypatch, keycloak)
+        middleware.refetch_interval = 0
+        client = TestClient(make_app())
+        old_token = keycloak.token_for("analyst")
+
+        # Keycloak rotated its signing key after the API loaded the key set
+        keycloak.rotate_key()
+        new_token = keycloak.token_for("analyst")
+        assert client.get("/cases/1", headers={"Authorization": f"Bearer {new_token}"}).status_code == 200
+        assert certs_fetched(keycloak) == 2
+        assert client.get("/cases/1", headers={"Authorization": f"Bearer {old_token}"}).status_code == 200
+        assert client.get("/cases/1", headers={"Authorization": f"Bearer {new_token}"}).status_code == 200
+        assert certs_fetched(keycloak) == 2  # both keys known now
+
+        # A key id the realm never had: 401 after one refetch, and no more refetches within the interval
+        forged = jwt.encode(jwt.get_unverified_claims(new_token), keycloak._private_pem, algorithm="RS256",
+                            headers={"kid": "not-a-realm-key"})
+        assert client.get("/cases/1", headers={"Authorization": f"Bearer {forged}"}).status_code == 401
+        assert certs_fetched(keycloak) == 3
+        middleware.refetch_interval = 60
+        for _ in range(3):
+            assert client.get("/cases/1", headers={"Authorization": f"Bearer {forged}"}).status_code == 401
+        assert certs_fetched(keycloak) == 3
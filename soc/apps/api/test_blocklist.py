@@ -0,0 +1,179 @@
+"""
+Tests for the blocked-indicator membership filter
+"""
+
+import asyncio
+import os
+import tempfile
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from blocklist import BlockedIndicators, BloomFilter
+from enrichment import EnrichmentError
+from models import IOC, AuditLog, Base
+from playbook_engine import Playbook, PlaybookContext
+from routers import playbooks
+from unit_of_work import UnitOfWork
+
+
+def make_sessions():
+    """Blocking and asyncio session factories on one scratch database"""
+    path = os.path.join(tempfile.mkdtemp(), "blocklist.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[IOC.__table__, AuditLog.__table__])
+    return sessionmaker(bind=engine), async_sessionmaker(create_async_engine(f"sqlite+aiosqlite:///{path}"))
+
+
+async def block(hash_value, uow):
+    return (await playbooks.block_hash(hash_value, uow))["status"]
+
+
+def test_bloom_filter_has_no_false_negatives_and_bounded_false_positives():
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    members = [f"hash:{n:064x}" for n in range(5000)]
+    for key in members:
+        bloom.add(key)
+    assert all(key in bloom for key in members)
+    false_positives = sum(f"hash:{n:064x}" in bloom for n in range(5000, 25000))
+    assert false_positives / 20000 < 0.02
+
+
+def test_blocked_hashes_are_not_blocked_again(monkeypatch):
+    Session, AsyncSession = make_sessions()
+    blocked = BlockedIndicators(capacity=1000)
+    monkeypatch.setattr(playbooks, "blocked_indicators", blocked)
+    first, second = "A" * 64, "b" * 64
+
+    async def before_load():
+        # Before the filter is loaded every lookup is answered by the table
+        async with AsyncSession() as db:
+            async with UnitOfWork(db, "analyst", "10.0.0.1") as uow:
+                assert await block(first, uow) == "success"
+            async with UnitOfWork(db, "analyst", "10.0.0.1") as uow:
+                assert await block(first.lower(), uow) == "already_blocked"
+                assert len(uow) == 0
+
+    asyncio.run(before_load())
+
+    # A restarted process rebuilds the filter from the IOC table
+    restarted = BlockedIndicators(capacity=1000)
+    assert restarted.load(Session) == 1
+    monkeypatch.setattr(playbooks, "blocked_indicators", restarted)
+
+    async def after_restart():
+        async with AsyncSession() as db:
+            async with UnitOfWork(db, "analyst", "10.0.0.1") as uow:
+                assert await block(first, uow) == "already_blocked"
+                assert await block(second, uow) == "success"
+            assert await restarted.is_blocked(db, "hash", second)
+            assert await db.scalar(select(func.count(IOC.id)).where(IOC.source == "fleetdm")) == 2
+            assert await db.scalar(
+                select(func.count(AuditLog.id)).where(AuditLog.action == "block_hash_fleetdm")) == 2
+
+    asyncio.run(after_restart())
+    assert restarted.counters["filtered"] == 1  # the new hash cost no query
+    assert restarted.counters["confirmed"] == 2
+
+
+def test_retried_block_step_blocks_each_hash_once(monkeypatch):
+    _, AsyncSession = make_sessions()
+    monkeypatch.setattr(playbooks, "blocked_indicators", BlockedIndicators(capacity=1000))
+    hashes = ["a" * 64, "b" * 64, "c" * 64]
+    calls = []
+
+    async def flaky_block(hash_value):
+        calls.append(hash_value)
+        if hash_value == hashes[1] and calls.count(hash_value) == 1:
+            raise RuntimeError("FleetDM returned 503")
+        return {"policy_id": 1, "policy_name": "cyberblue-block", "hashes": 1}
+
+    monkeypatch.setattr(playbooks.containment, "block_hash", flaky_block)
+
+    async def run():
+        async with AsyncSession() as db:
+            async with UnitOfWork(db, "analyst", "10.0.0.1") as uow:
+                alert = {"syscheck": {"sha256_after": hashes[0]}, "data": {"sha256": hashes[1], "hash": hashes[2]}}
+                context = PlaybookContext(alert, uow=uow)
+                result = await Playbook("block", [playbooks.block_step("Critical")]).run(context)
+            iocs = await db.scalar(select(func.count(IOC.id)).where(IOC.source == "fleetdm"))
+            audits = await db.scalar(select(func.count(AuditLog.id)).where(AuditLog.action == "block_hash_fleetdm"))
+            return result, iocs, audits
+
+    result, iocs, audits = asyncio.run(run())
+    assert result.succeeded and result.timings()["block"]["attempts"] == 2
+    assert sorted(calls) == sorted(hashes + [hashes[1]])  # only the failed hash was sent again
+    assert iocs == 3 and audits == 3
+
+
+def test_high_response_blocks_only_hashes_virustotal_flagged(monkeypatch):
+    _, AsyncSession = make_sessions()
+    monkeypatch.setattr(playbooks, "blocked_indicators", BlockedIndicators(capacity=1000))
+    malicious, suspicious, harmless, unknown, failed = "a" * 32, "b" * 40, "c" * 64, "d" * 32, "e" * 64
+    reports = {
+        malicious: {"data": {"attributes": {"last_analysis_stats": {"malicious": 12, "undetected": 50}}}},
+        suspicious: {"data": {"attributes": {"last_analysis_stats": {"suspicious": 2, "undetected": 60}}}},
+        harmless: {"data": {"attributes": {"last_analysis_stats": {"harmless": 70}}}},
+        unknown: None,
+        failed: EnrichmentError("virustotal", 503, "Service Unavailable"),
+    }
+    blocked = []
+
+    async def lookup_many(hashes, priority=0):
+        return {h: reports[h] for h in hashes}
+
+    async def fleet_block(hash_value):
+        blocked.append(hash_value)
+        return {"policy_id": 1, "policy_name": "cyberblue-block", "hashes": 1}
+
+    monkeypatch.setattr(playbooks.enrichment, "lookup_many", lookup_many)
+    monkeypatch.setattr(playbooks.containment, "block_hash", fleet_block)
+
+    async def run():
+        async with AsyncSession() as db:
+            async with UnitOfWork(db, "analyst", "10.0.0.1") as uow:
+                alert = {"syscheck": {"md5_after": malicious, "sha1_after": suspicious, "sha256_after": harmless},
+                         "data": {"md5": unknown, "sha256": failed}}
+                context = PlaybookContext(alert, uow=uow)
+                return await playbooks.HIGH_RESPONSE_PLAYBOOK.run(context)
+
+    result = asyncio.run(run())
+    assert result.steps["block"].status == "succeeded"
+    assert sorted(blocked) == sorted([malicious, suspicious])
+    lines = result.steps["block"].actions
+    assert f"High: Hash {harmless} not blocked, VirusTotal verdict harmless" in lines
+    assert f"High: Hash {unknown} not blocked, VirusTotal verdict unknown" in lines
+    assert f"High: Hash {failed} not blocked, VirusTotal verdict unavailable" in lines
+
+
+def test_containment_blocks_only_the_changed_files_hashes(monkeypatch):
+    _, AsyncSession = make_sessions()
+    monkeypatch.setattr(playbooks, "blocked_indicators", BlockedIndicators(capacity=1000))
+    before, after, in_log = "1" * 64, "2" * 64, "3" * 32
+    enriched, blocked = [], []
+
+    async def lookup_many(hashes, priority=0):
+        enriched.extend(hashes)
+        return {h: None for h in hashes}
+
+    async def fleet_block(hash_value):
+        blocked.append(hash_value)
+        return {"policy_id": 1, "policy_name": "cyberblue-block", "hashes": 1}
+
+    monkeypatch.setattr(playbooks.enrichment, "lookup_many", lookup_many)
+    monkeypatch.setattr(playbooks.containment, "block_hash", fleet_block)
+    # A system binary was replaced: the before hash is the legitimate file's
+    alert = {"syscheck": {"path": "/usr/bin/sshd", "sha256_before": before, "sha256_after": after},
+             "full_log": f"File '/usr/bin/sshd' modified, session {in_log}"}
+
+    async def run():
+        async with AsyncSession() as db:
+            async with UnitOfWork(db, "analyst", "10.0.0.1") as uow:
+                return await playbooks.CRITICAL_RESPONSE_PLAYBOOK.run(PlaybookContext(alert, uow=uow))
+
+    assert asyncio.run(run()).succeeded
+    assert blocked == [after]
+    assert sorted(enriched) == sorted([before, after, in_log])  # still looked up
+    assert playbooks.extract_blockable_hashes({"file": {"hash": {"sha1": "F" * 40}}, "data": {"hash": "x" * 32}}) \
+        == ["f" * 40]
@@ -0,0 +1,64 @@
+"""
+Tests for batched FleetDM containment, against the local FleetDM stand-in
+"""
+
+import asyncio
+
+import pytest
+
+from containment import ContainmentBatcher, ContainmentError, FleetDMClient, blocklist_query
+from standins import FleetDMStandIn
+
+
+def test_block_requests_in_a_window_share_one_policy():
+    with FleetDMStandIn() as fleet:
+        client = FleetDMClient(fleet.base_url, "token")
+
+        async def send(hashes):
+            policy = await client.create_policy("blocklist", blocklist_query(hashes), "", "")
+            return {"policy_id": policy["id"], "hashes": len(hashes)}
+
+        batcher = ContainmentBatcher("fleetdm", send, max_batch=100, window=0.2)
+        hashes = [f"{n:064x}" for n in range(230)]
+
+        async def run():
+            # Duplicates waiting in the same batch are sent once
+            results = await asyncio.gather(*(batcher.submit(h) for h in hashes[:50] * 2 + hashes[50:]))
+            await client.aclose()
+            return results
+
+        results = asyncio.run(run())
+
+    assert [policy["id"] for policy in fleet.policies] == [1, 2, 3]
+    assert sorted(result["hashes"] for result in {r["policy_id"]: r for r in results}.values()) == [30, 100, 100]
+    assert all(result["policy_id"] in (1, 2, 3) for result in results)
+    assert sum(fleet.policies[0]["query"].count(f"'{h}'") for h in hashes) == 100
+    assert batcher.counters["batches"] == 3 and batcher.counters["collapsed"] == 50
+
+
+def test_failed_batch_fails_every_caller():
+    with FleetDMStandIn() as fleet:
+        client = FleetDMClient(fleet.base_url + "/nowhere", "token")
+
+        async def send(hashes):
+            return await client.create_policy("blocklist", blocklist_query(hashes), "", "")
+
+        batcher = ContainmentBatcher("fleetdm", send, max_batch=100, window=0.05)
+
+        async def run():
+            results = await asyncio.gather(*(batcher.submit(f"{n:032x}") for n in range(5)),
+                                           return_exceptions=True)
+            await client.aclose()
+            return results
+
+        results = asyncio.run(run())
+
+    assert all(isinstance(result, ContainmentError) and result.status_code == 404 for result in results)
+    assert batcher.counters["failed_batches"] == 1
+
+
+def test_blocklist_query_rejects_anything_but_hashes():
+    query = blocklist_query(["a" * 32, "b" * 64])
+    assert "h.md5 IN ('" + "a" * 32 + "')" in query and "h.sha256 IN" in query
+    with pytest.raises(ValueError):
+        blocklist_query(["' OR 1=1 --" + "a" * 21])
@@ -0,0 +1,87 @@
+"""
+Tests for alert correlation ahead of case creation
+"""
+
+import asyncio
+import os
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import routers.incidents as incidents
+from correlation import AlertCorrelator, write_counts
+from models import AuditLog, Base, Incident
+
+FIELDS = ["rule.id", "agent.id", "data.srcip"]
+
+
+def alert(rule_id, agent_id="001", srcip="10.0.0.5", alert_id=1):
+    return {"id": alert_id, "rule": {"id": rule_id, "level": 10, "description": "sshd: brute force"},
+            "agent": {"id": agent_id, "name": "web-01"}, "data": {"srcip": srcip}}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_storm_collapses_and_window_expires():
+    clock = Clock()
+    correlator = AlertCorrelator(FIELDS, window_seconds=60, clock=clock)
+    created = []
+
+    async def create(tags):
+        created.append(tags)
+        await asyncio.sleep(0)  # let concurrent alerts pile up behind the first one
+        return f"case-{len(created)}", len(created), "source:wazuh"
+
+    async def storm():
+        results = await asyncio.gather(*(correlator.correlate(alert("5712", alert_id=i), create)
+                                         for i in range(500)))
+        other = await correlator.correlate(alert("5712", agent_id="002"), create)
+        return results, other
+
+    results, other = asyncio.run(storm())
+    assert len(created) == 2
+    assert sum(not r.correlated for r in results) == 1
+    assert {r.incident_id for r in results} == {1} and other.incident_id == 2
+
+    clock.now += 30
+    updates = correlator.drain()
+    assert updates == [{"id": 1, "tags": f"source:wazuh,alert_count:500,first_seen:{int(clock.now) - 30},"
+                                         f"last_seen:{int(clock.now) - 30}"}]
+
+    # Idle past the window: the key opens a new incident
+    clock.now += 61
+    assert correlator.drain() == [] and correlator.open_windows() == 0
+    assert not asyncio.run(correlator.correlate(alert("5712"), create)).correlated
+    assert len(created) == 3
+
+
+def test_open_case_for_alert_writes_once_per_window(monkeypatch):
+    path = os.path.join(tempfile.mkdtemp(), "correlation.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=[Incident.__table__, AuditLog.__table__])
+    Session = sessionmaker(bind=engine)
+    AsyncSession = async_sessionmaker(create_async_engine(f"sqlite+aiosqlite:///{path}"), expire_on_commit=False)
+    monkeypatch.setattr(incidents, "alert_correlator", AlertCorrelator(FIELDS, window_seconds=300))
+
+    async def ingest():
+        async with AsyncSession() as db:
+            return [await incidents.open_case_for_alert(alert("5712", alert_id=i), db, "wazuh", "127.0.0.1")
+                    for i in range(1000)]
+
+    results = asyncio.run(ingest())
+    assert results[-1].alert_count == 1000
+    assert write_counts(incidents.alert_correlator.drain(), Session) == 1
+
+    with Session() as db:
+        assert db.query(Incident).count() == 1
+        assert db.query(AuditLog).count() == 1
+        tags = dict(tag.split(":") for tag in db.query(Incident).one().tags.split(","))
+        assert tags["alert_count"] == "1000" and tags["source"] == "wazuh"
@@ -0,0 +1,80 @@
+"""
+Tests for the vectorized synthetic SOC dataset generator
+"""
+
+from datetime import datetime
+
+from sqlalchemy import create_engine, func, select
+
+import datagen
+from models import Base, Incident, AuditLog, Metric
+
+START = datetime(2025, 1, 6)
+END = datetime(2025, 1, 20)
+
+
+def test_generators_are_deterministic_and_sized():
+    for name, generate in datagen.GENERATORS.items():
+        first = generate(5000, seed=7, start=START, end=END)
+        second = generate(5000, seed=7, start=START, end=END)
+        assert len(first) > 0, name
+        assert first.equals(second), name
+
+
+def test_timestamps_stay_in_range_and_follow_business_hours():
+    frame = datagen.audit_logs_frame(50000, seed=1, start=START, end=END)
+    stamps = frame['created_at']
+    assert stamps.min() >= START and stamps.max() < END
+    assert stamps.is_monotonic_increasing
+
+    hours = stamps.dt.hour
+    business = ((hours >= 9) & (hours < 17)).mean()
+    night = ((hours >= 0) & (hours < 8)).mean()
+    assert business > night
+    assert (stamps.dt.weekday < 5).mean() > 5 / 7
+
+
+def test_incident_training_frame_matches_model_features():
+    frame = datagen.incident_training_frame(20000, seed=3)
+    mix = frame['incident_type'].value_counts(normalize=True)
+    expected = dict(zip(datagen.INCIDENT_TYPES, datagen.INCIDENT_TYPE_WEIGHTS))
+    for incident_type, share in expected.items():
+        assert abs(mix[incident_type] - share) < 0.02
+
+    assert set(frame['severity_score'].unique()) <= {1, 2, 3, 4}
+    assert (frame['is_business_hours'] == frame['hour_of_day'].between(8, 17)).all()
+    assert (frame.loc[frame['incident_type'] == 'malware', 'known_malware_signature'] == 1).all()
+
+
+def test_alert_documents_carry_valid_hashes():
+    frame = datagen.alerts_frame(2000, seed=5, start=START, end=END)
+    documents = list(datagen.alert_documents(frame))
+    assert len(documents) == 2000
+
+    with_hashes = [d for d in documents if 'syscheck' in d]
+    assert with_hashes
+    for alert in with_hashes:
+        assert len(alert['syscheck']['md5_after']) == 32
+        assert len(alert['syscheck']['sha256_after']) == 64
+        int(alert['syscheck']['sha256_after'], 16)
+
+    # A few noisy rules should dominate the volume
+    top_rule_share = frame['rule_id'].value_counts(normalize=True).iloc[:10].sum()
+    assert top_rule_share > 0.4
+
+
+def test_bulk_load_inserts_generated_rows():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[Incident.__table__, AuditLog.__table__, Metric.__table__])
+
+    with engine.begin() as conn:
+        assert datagen.bulk_load(conn, Incident, datagen.incidents_frame(3000, seed=1), chunk_size=1000) == 3000
+        datagen.bulk_load(conn, AuditLog, datagen.audit_logs_frame(2000, seed=1))
+        datagen.bulk_load(conn, Metric.__table__, datagen.metrics_frame(1200, seed=1))
+
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(Incident)) == 3000
+        assert conn.scalar(select(func.count()).select_from(AuditLog)) == 2000
+        assert conn.scalar(select(func.count()).select_from(Metric)) == 1200
+        assert conn.scalar(select(func.count()).where(Incident.assigned_to.is_(None))) > 0
+        assert isinstance(conn.scalar(select(Incident.created_at).limit(1)), datetime)
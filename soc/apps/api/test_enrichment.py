@@ -0,0 +1,160 @@
+"""
+Tests for threat-intelligence enrichment
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from cache import SingleFlight
+from enrichment import EnrichmentCache, EnrichmentError, EnrichmentProvider
+from models import Base, IOC
+
+
+def make_provider(latency=0.05, concurrency=4):
+    state = {"in_flight": 0, "max_in_flight": 0, "calls": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        state["calls"] += 1
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        await asyncio.sleep(latency)
+        state["in_flight"] -= 1
+        hash_value = request.url.path.rsplit("/", 1)[-1]
+        if hash_value.startswith("0"):
+            return httpx.Response(404)
+        if hash_value.startswith("f"):
+            return httpx.Response(429)
+        return httpx.Response(200, json={"data": {"id": hash_value}})
+
+    provider = EnrichmentProvider("virustotal", "https://vt.test/api/v3", {}, concurrency,
+                                  transport=httpx.MockTransport(handler))
+    return provider, state
+
+
+def test_lookups_fan_out_under_the_concurrency_limit():
+    provider, state = make_provider(latency=0.05, concurrency=4)
+    hashes = [f"{i:x}" * 32 for i in range(1, 9)]
+
+    async def run():
+        started = time.perf_counter()
+        results = await asyncio.gather(*(provider.get_json(f"/files/{h}") for h in hashes))
+        await provider.aclose()
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(run())
+    assert [r["data"]["id"] for r in results] == hashes
+    assert state["max_in_flight"] == 4
+    assert elapsed < 0.05 * len(hashes) / 2
+
+
+def test_not_found_and_errors():
+    provider, _ = make_provider(latency=0)
+
+    async def run():
+        try:
+            missing = await provider.get_json("/files/" + "0" * 32)
+            try:
+                await provider.get_json("/files/" + "f" * 32)
+            except EnrichmentError as e:
+                return missing, e
+        finally:
+            await provider.aclose()
+
+    missing, error = asyncio.run(run())
+    assert missing is None
+    assert error.status_code == 429 and error.provider == "virustotal"
+
+
+def make_cache(fetch, ttls=None):
+    # A file database, so the cache's reads and writes from worker threads get their own
+    # connections, as they would against the real pool
+    path = os.path.join(tempfile.mkdtemp(), "iocs.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[IOC.__table__])
+    Session = sessionmaker(bind=engine)
+    ttls = ttls or {"malicious": 3600, "harmless": 3600, "unknown": 60}
+    return EnrichmentCache(fetch, Session, ttls, maxsize=100), Session
+
+
+def test_cache_single_flight_and_persistence():
+    calls = []
+
+    async def fetch(hash_value, priority):
+        calls.append(hash_value)
+        await asyncio.sleep(0.01)
+        if hash_value.startswith("0"):
+            return None
+        return {"data": {"attributes": {"last_analysis_stats": {"malicious": 30, "undetected": 40}}}}
+
+    cache, Session = make_cache(fetch)
+    known, unknown = "ab" * 16, "0" * 32
+
+    async def storm():
+        return await asyncio.gather(*[cache.get(h) for h in [known.upper()] * 50 + [unknown] * 50])
+
+    results = asyncio.run(storm())
+    assert sorted(calls) == [unknown, known]
+    assert results[0]["data"] and results[-1] is None
+    assert cache.flight.collapsed == 98
+
+    with Session() as db:
+        rows = {ioc.value: ioc for ioc in db.query(IOC)}
+        assert rows[known].verdict == "malicious" and rows[known].severity == "high"
+        assert rows[known].confidence == 43
+        assert rows[unknown].verdict == "unknown" and rows[unknown].details is None
+
+    # A fresh process (empty LRU) is served from the IOC table
+    restarted = EnrichmentCache(fetch, Session, cache.ttls, maxsize=100)
+    assert asyncio.run(restarted.get(known)) == results[0]
+    assert asyncio.run(restarted.get(unknown)) is None
+    assert len(calls) == 2 and restarted.stats["db_hits"] == 2
+
+
+
+def test_a_cancelled_leader_does_not_cancel_its_followers():
+    flight, calls = SingleFlight(), []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"verdict": "malicious"}
+
+    async def run():
+        # The leader is a playbook step that times out while another alert waits on the same hash
+        leader = asyncio.create_task(asyncio.wait_for(flight.do("hash", fetch), timeout=0.01))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("hash", fetch))
+        late = asyncio.create_task(flight.do("hash", fetch))
+        results = await asyncio.gather(leader, follower, late, return_exceptions=True)
+        return results, len(flight)
+
+    (leader, follower, late), inflight = asyncio.run(run())
+    assert isinstance(leader, asyncio.TimeoutError)
+    assert follower == late == {"verdict": "malicious"}
+    assert len(calls) == 2 and inflight == 0  # one new leader ran it again for both followers
+
+def test_cache_does_not_store_errors_or_expired_rows():
+    calls = []
+
+    async def fetch(hash_value, priority):
+        calls.append(hash_value)
+        if len(calls) == 1:
+            raise EnrichmentError("virustotal", 429, "HTTP 429")
+        return {"data": {"attributes": {"last_analysis_stats": {"harmless": 10}}}}
+
+    cache, Session = make_cache(fetch, ttls={"harmless": -1})
+    hash_value = "cd" * 16
+
+    try:
+        asyncio.run(cache.get(hash_value))
+    except EnrichmentError:
+        pass
+    assert asyncio.run(cache.get(hash_value)) is not None
+    assert asyncio.run(cache.get(hash_value)) is not None  # already expired, fetched again
+    assert len(calls) == 3
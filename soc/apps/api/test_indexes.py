@@ -0,0 +1,190 @@
+"""
+Query-plan regression tests for the hot query paths
+
+Seeds a scratch SQLite database with a realistic volume of audit logs,
+incidents, metrics and IOCs, then checks with EXPLAIN QUERY PLAN that the
+queries the routers issue are answered from an index instead of a full table
+scan. Migration 004 is exercised on the same database: without its indexes
+the same queries fall back to scans. The full migration chain is checked
+against the models with autogenerate.
+"""
+
+import importlib.util
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, desc, func, insert, inspect, select, text
+
+from models import IOC, AuditLog, Base, Incident, Metric
+
+ALEMBIC = os.path.join(os.path.dirname(__file__), "alembic")
+MIGRATION = os.path.join(ALEMBIC, "versions", "004_hot_path_indexes.py")
+NOW = datetime(2026, 10, 19, tzinfo=timezone.utc)
+ACTIONS = ["login", "logout", "create_incident", "update_incident_status", "virustotal_enrichment",
+           "block_hash_fleetdm", "tool_restart", "export_tools"]
+TOOLS = ["Wazuh", "Velociraptor", "MISP", "Shuffle", "TheHive", "Arkime", "FleetDM", "Caldera"]
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location("migration_004", MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def engine():
+    path = os.path.join(tempfile.mkdtemp(), "indexes.db")
+    engine = create_engine(f"sqlite:///{path}")
+    tables = [AuditLog.__table__, Incident.__table__, Metric.__table__, IOC.__table__]
+    Base.metadata.create_all(engine, tables=tables)
+    rng = random.Random(7)
+
+    def at(n, spread_days=90):
+        return NOW - timedelta(seconds=rng.randrange(spread_days * 86400))
+
+    with engine.begin() as conn:
+        conn.execute(insert(AuditLog), [
+            {"user_sub": f"user-{rng.randrange(200)}", "action": rng.choice(ACTIONS), "resource": f"incident:{n}",
+             "details": "seeded", "created_at": at(n)} for n in range(60000)])
+        conn.execute(insert(Incident), [
+            {"title": f"Incident {n}", "description": "seeded",
+             "severity": rng.choice(["low", "medium", "high", "critical"]),
+             "status": rng.choices(["open", "investigating", "resolved", "closed"], [1, 1, 10, 30])[0],
+             "created_at": at(n), "updated_at": NOW} for n in range(30000)])
+        conn.execute(insert(Metric), [
+            {"tool_name": rng.choice(TOOLS), "cpu_usage": rng.randrange(100), "memory_usage": rng.randrange(100),
+             "alerts_count": rng.randrange(10), "timestamp": at(n, 30)} for n in range(60000)])
+        conn.execute(insert(IOC), [
+            {"type": rng.choice(["hash", "ip", "domain", "url"]), "value": f"{rng.getrandbits(128):032x}",
+             "source": rng.choice(["virustotal", "fleetdm", "misp"]), "status": "active"} for n in range(40000)])
+        conn.execute(text("ANALYZE"))
+    yield engine
+    engine.dispose()
+
+
+def query_plan(engine, statement):
+    compiled = statement.compile(engine, compile_kwargs={"render_postcompile": True})
+    params = tuple(value.isoformat(" ") if isinstance(value, datetime) else value
+                   for value in (compiled.params[name] for name in compiled.positiontup))
+    with engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params)]
+
+
+def assert_index_used(plan, table, index=None):
+    steps = [step for step in plan if f" {table} " in f" {step} "]
+    assert steps, plan
+    for step in steps:
+        assert "INDEX" in step, f"full scan of {table}: {plan}"
+    if index:
+        assert any(index in step for step in steps), plan
+
+
+HOT_QUERIES = [
+    # Audit log page, unfiltered and filtered (routers/audit.py)
+    ("audit_logs", "ix_audit_logs_created_at",
+     select(AuditLog).order_by(desc(AuditLog.created_at)).limit(20)),
+    ("audit_logs", "ix_audit_logs_action_created_at",
+     select(AuditLog).where(AuditLog.action == "block_hash_fleetdm").order_by(desc(AuditLog.created_at)).limit(20)),
+    ("audit_logs", "ix_audit_logs_user_sub_created_at",
+     select(AuditLog).where(AuditLog.user_sub == "user-7").order_by(desc(AuditLog.created_at)).limit(20)),
+    # Audit summary over the last week
+    ("audit_logs", "ix_audit_logs_created_at",
+     select(func.date(AuditLog.created_at), func.count(AuditLog.id))
+     .where(AuditLog.created_at >= NOW - timedelta(days=7)).group_by(func.date(AuditLog.created_at))),
+    # Incident listing (routers/incidents.py) and the open-incident count on the dashboard
+    ("incidents", "ix_incidents_created_at",
+     select(Incident).order_by(Incident.created_at.desc()).limit(50)),
+    ("incidents", "ix_incidents_status_created_at",
+     select(Incident).where(Incident.status == "open").order_by(Incident.created_at.desc()).limit(50)),
+    ("incidents", "ix_incidents_severity_created_at",
+     select(Incident).where(Incident.severity == "critical").order_by(Incident.created_at.desc()).limit(50)),
+    ("incidents", "ix_incidents_status_created_at",
+     select(func.count(Incident.id)).where(Incident.status.in_(["open", "investigating"]))),
+    # Dashboard metrics (routers/metrics.py)
+    ("metrics", "ix_metrics_timestamp",
+     select(Metric).where(Metric.timestamp >= NOW - timedelta(days=1)).order_by(desc(Metric.timestamp)).limit(100)),
+    ("metrics", "ix_metrics_tool_name_timestamp",
+     select(Metric).where(Metric.tool_name == "Wazuh", Metric.timestamp >= NOW - timedelta(hours=6))
+     .order_by(Metric.timestamp)),
+    # Enrichment cache and blocklist lookups
+    ("iocs", "ix_iocs_type_value",
+     select(IOC).where(IOC.type == "hash", IOC.value == "0" * 32, IOC.source == "virustotal")),
+    ("iocs", "ix_iocs_type_value",
+     select(IOC.id).where(IOC.type == "hash", IOC.value == "0" * 32, IOC.source == "fleetdm",
+                          IOC.status == "active").limit(1)),
+]
+
+
+@pytest.mark.parametrize("table,index,statement", HOT_QUERIES)
+def test_hot_queries_use_an_index(engine, table, index, statement):
+    assert_index_used(query_plan(engine, statement), table, index)
+
+
+def test_migration_matches_the_models(engine):
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+
+    migration = load_migration()
+    expected = {name for name, _, _ in migration.INDEXES}
+    lookup = select(IOC).where(IOC.type == "hash", IOC.value == "0" * 32)
+
+    def index_names():
+        inspector = inspect(engine)
+        return {index["name"] for table in ("audit_logs", "incidents", "metrics", "iocs")
+                for index in inspector.get_indexes(table)}
+
+    def run(step):
+        with engine.connect() as conn:
+            with Operations.context(MigrationContext.configure(conn)):
+                step()
+            conn.commit()
+
+    assert expected <= index_names()
+    run(migration.downgrade)
+    try:
+        assert not expected & index_names()
+        assert any(step.startswith("SCAN iocs") and "INDEX" not in step for step in query_plan(engine, lookup))
+    finally:
+        run(migration.upgrade)
+    assert expected <= index_names()
+    assert_index_used(query_plan(engine, lookup), "iocs", "ix_iocs_type_value")
+
+
+def table_of(diff):
+    if isinstance(diff, list):  # column changes come grouped per column
+        return diff[0][2]
+    target = diff[1]
+    return target.name if diff[0].endswith("_table") else target.table.name
+
+
+def test_migrations_leave_no_drift_from_the_models():
+    from alembic import command
+    from alembic.autogenerate import compare_metadata
+    from alembic.config import Config
+    from alembic.runtime.environment import EnvironmentContext
+    from alembic.script import ScriptDirectory
+
+    config = Config()
+    config.set_main_option("script_location", ALEMBIC)
+    config.set_main_option("sqlalchemy.url", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'drift.db')}")
+    command.upgrade(config, "head")
+
+    # Compare through env.py so its include_object filter is the one applied
+    script = ScriptDirectory.from_config(config)
+    diffs = []
+
+    def compare(revision, context):
+        diffs.extend(compare_metadata(context, Base.metadata))
+        return []
+
+    with EnvironmentContext(config, script, fn=compare):
+        script.run_env()
+
+    # The account tables from the initial migration predate these checks and
+    # carry their own unique-constraint and nullability differences
+    accounts = {"users", "roles", "tools", "user_roles"}
+    assert [diff for diff in diffs if table_of(diff) not in accounts] == []
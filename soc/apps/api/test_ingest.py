@@ -0,0 +1,100 @@
+"""
+Tests for streaming bulk alert ingestion
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import datagen
+from correlation import AlertCorrelator
+from ingest import IngestError, NDJSONDecoder, alert_batches
+from models import AuditLog, Base, Incident
+
+
+async def chunked(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def collect(data, batch_size=4, chunk_size=7, **kwargs):
+    decoder = NDJSONDecoder(**kwargs)
+
+    async def run():
+        return [batch async for batch in alert_batches(chunked(data, chunk_size), decoder, batch_size)]
+
+    return asyncio.run(run()), decoder.stats
+
+
+def test_gzip_ndjson_is_decoded_incrementally_into_batches():
+    alerts = [{"id": str(n), "rule": {"id": "5710"}} for n in range(10)]
+    lines = [json.dumps(alert).encode() for alert in alerts]
+    body = b"\n".join(lines[:5]) + b"\n\n" + b"not json\n[1, 2]\n" + b"\n".join(lines[5:])  # no final newline
+    # Two gzip members, as written by a client that compresses each batch it sends
+    half = len(body) // 2
+    compressed = gzip.compress(body[:half]) + gzip.compress(body[half:])
+
+    batches, stats = collect(compressed)
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert [alert["id"] for batch in batches for alert in batch] == [str(n) for n in range(10)]
+    assert stats.alerts == 10 and stats.rejected == 2
+    assert [error["line"] for error in stats.errors] == [7, 8]
+
+    plain, _ = collect(body, batch_size=100, chunk_size=3)
+    assert plain == [[alert for batch in batches for alert in batch]]
+
+
+def test_unreadable_streams_are_rejected():
+    with pytest.raises(IngestError, match="truncated"):
+        collect(gzip.compress(b'{"id": "1"}\n' * 100)[:-12])
+    with pytest.raises(IngestError, match="exceeds"):
+        collect(b'{"id": "' + b"x" * 100 + b'"}', max_line_bytes=64)
+
+
+def test_batches_create_cases_in_one_transaction(monkeypatch):
+    from routers import incidents
+
+    path = os.path.join(tempfile.mkdtemp(), "ingest.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[Incident.__table__, AuditLog.__table__])
+    Session = sessionmaker(bind=engine)
+    AsyncSession = async_sessionmaker(create_async_engine(f"sqlite+aiosqlite:///{path}"), expire_on_commit=False)
+    correlator = AlertCorrelator(["rule.id", "agent.id"], window_seconds=300)
+    monkeypatch.setattr(incidents, "alert_correlator", correlator)
+
+    alerts = list(datagen.alert_documents(datagen.alerts_frame(500, seed=3, n_rules=20, n_agents=10)))
+    keys = {(a["rule"]["id"], a["agent"]["id"]) for a in alerts}
+
+    async def run():
+        results = []
+        async with AsyncSession() as db:
+            for start in range(0, len(alerts), 200):
+                results.extend(await incidents.open_cases_for_alerts(alerts[start:start + 200], db,
+                                                                     "wazuh", "10.0.0.5"))
+        return results
+
+    results = asyncio.run(run())
+    assert sum(not result.correlated for result in results) == len(keys)
+    by_key = {}
+    for alert, result in zip(alerts, results):
+        by_key.setdefault((alert["rule"]["id"], alert["agent"]["id"]), set()).add(result.incident_id)
+    assert all(len(ids) == 1 for ids in by_key.values())
+
+    with Session() as db:
+        assert db.query(Incident).count() == len(keys)
+        assert db.query(AuditLog).filter(AuditLog.action == "create_incident").count() == len(keys)
+        first = db.get(Incident, results[0].incident_id)
+        assert first.title == f"[ALERT] {alerts[0]['rule']['description']}"
+        assert "source:wazuh" in first.tags and "alert_count:1" in first.tags
+
+    # Counts of the correlated alerts reach the incidents on the next flush
+    updates = correlator.drain()
+    counts = {u["id"]: int(dict(tag.split(":", 1) for tag in u["tags"].split(","))["alert_count"]) for u in updates}
+    assert sum(counts.values()) + (len(keys) - len(counts)) == len(alerts)
@@ -0,0 +1,69 @@
+"""
+Tests for single-pass IOC extraction
+"""
+
+import pytest
+
+from ioc_extract import IOCExtractor, is_valid
+
+MD5 = "e74d7dee05c61294a961262385e5bf44"
+SHA1 = "da39a3ee5e6b4b0d3255bfef95601890afd80709"
+SHA256 = "b62553376e78b47e9a6141ea0a01cfb78e8af8c8cde842a77392e82330efb565"
+
+HINTS = {"syscheck.md5_after": "md5", "syscheck.sha256_after": "sha256", "data.srcip": "ip", "data.hash": "hash"}
+
+
+def test_walks_the_whole_alert_once():
+    alert = {
+        "id": "1697000000.123456",
+        "timestamp": "2026-10-19T09:00:00.000+0000",
+        "agent": {"id": "007", "name": "host-7", "ip": "10.0.0.7"},
+        "rule": {"id": "554", "level": 12, "description": "File added to the system."},
+        "syscheck": {"path": "C:\\Users\\bob\\evil.exe", "md5_after": MD5.upper(), "sha256_after": SHA256},
+        "data": {"srcip": "203.0.113.7", "hash": SHA1},
+        "full_log": (
+            f"GET https://evil.example.com/payload.exe?x=1, beacon to 198.51.100.23:443 and "
+            f"fe80::1ff:fe23:4567:890a at 09:00:00; dup {SHA256}; contact ops@mail.example.org; "
+            f"version 10.0.19041.1 std::vector config.yaml"
+        ),
+        "previous": [{"nested": {"url": "ftp://files.example.net/a.zip"}}],
+    }
+    found = IOCExtractor(HINTS, ignore_fields=["id", "timestamp", "agent.ip"]).extract(alert)
+
+    assert found.md5 == [MD5] and found.sha1 == [SHA1] and found.sha256 == [SHA256]
+    assert found.hashes() == [SHA256, SHA1, MD5]
+    assert found.ipv4 == ["203.0.113.7", "198.51.100.23"]
+    assert found.ipv6 == ["fe80::1ff:fe23:4567:890a"]
+    assert found.url == ["https://evil.example.com/payload.exe?x=1", "ftp://files.example.net/a.zip"]
+    assert found.domain == ["evil.example.com", "mail.example.org", "files.example.net"]
+
+
+def test_anchored_matching_rejects_near_misses():
+    # The old pattern '^[a-f0-9]{32}|[a-f0-9]{64}$' accepted anything that started with 32 hex digits
+    assert not is_valid("hash", MD5 + "zz")
+    assert not is_valid("hash", "zz" + SHA256)
+    assert not is_valid("hash", MD5[:-1])
+    assert is_valid("hash", SHA1) and is_valid("hash", SHA256.upper())
+    assert not is_valid("ip", "256.1.1.1") and is_valid("ip", "::1")
+
+    extractor = IOCExtractor(HINTS)
+    found = extractor.extract({
+        "syscheck": {"md5_after": SHA256},  # wrong type for the hint: falls back to scanning
+        "data": {"srcip": "not-an-ip", "hash": "xyz"},
+        "msg": f"{MD5}0 {'a' * 33} 1.2.3.4.5 300.1.1.1 deadbeef:cafe report.pdf",
+    })
+    assert found.sha256 == [SHA256]
+    assert found.md5 == [] and found.ipv4 == [] and found.ipv6 == [] and found.domain == []
+
+
+def test_unknown_hint_types_are_rejected():
+    with pytest.raises(ValueError, match="Unknown IOC types"):
+        IOCExtractor({"data.thing": "email"})
+
+
+def test_playbook_hash_extraction_uses_wazuh_fields():
+    from routers.playbooks import extract_hashes_from_alert, is_valid_hash
+
+    alert = {"syscheck": {"md5_after": MD5, "sha256_after": SHA256}, "data": {"sha256": SHA256}}
+    assert extract_hashes_from_alert(alert) == [SHA256, MD5]
+    assert not is_valid_hash(MD5 + "zz")
@@ -0,0 +1,162 @@
+"""
+Tests for the durable background job queue
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue, JobWorkerPool
+from models import Base, Job
+
+
+def make_queue(**kwargs):
+    path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[Job.__table__])
+    queue = JobQueue(async_sessionmaker(create_async_engine(f"sqlite+aiosqlite:///{path}"),
+                                        expire_on_commit=False), **kwargs)
+    return queue, sessionmaker(bind=engine)
+
+
+def enqueue(queue, n=1, **payload):
+    async def run():
+        async with queue.session_factory() as db:
+            return [(await queue.enqueue(db, "respond", dict(payload, id=f"a{i}"), "analyst", "10.0.0.1")).id
+                    for i in range(n)]
+
+    return asyncio.run(run())
+
+
+def test_workers_drain_the_queue_concurrently():
+    queue, Session = make_queue()
+    ids = enqueue(queue, 6)
+
+    async def respond(job):
+        await asyncio.sleep(0.1)
+        if job["payload"]["id"] == "a5":
+            raise RuntimeError("playbook exploded")
+        return {"alert_id": job["payload"]["id"], "user": job["user_sub"]}
+
+    async def run():
+        pool = JobWorkerPool(queue, {"respond": respond}, concurrency=3, poll_interval=0.01)
+        started = time.perf_counter()
+        pool.start()
+        while pool.counters["succeeded"] + pool.counters["failed"] < 6:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        await pool.stop()
+        return elapsed
+
+    elapsed = asyncio.run(run())
+    assert elapsed < 0.5  # two rounds of three, not six sequential jobs
+
+    with Session() as db:
+        jobs = {job.id: job for job in db.query(Job)}
+    assert [jobs[i].status for i in ids] == [SUCCEEDED] * 5 + [FAILED]
+    assert '"alert_id": "a0"' in jobs[ids[0]].result and jobs[ids[0]].finished_at is not None
+    assert jobs[ids[5]].error == "playbook exploded" and jobs[ids[5]].attempts == 1
+
+
+def test_claims_are_exclusive_and_expired_leases_are_retried():
+    queue, Session = make_queue(lease_seconds=60, max_attempts=2)
+    first, second = enqueue(queue, 2)
+
+    claims = [asyncio.run(queue.claim()) for _ in range(3)]
+    assert [c["id"] if c else None for c in claims] == [first, second, None]
+
+    # The worker holding the first job died: once its lease is over the job is handed out again
+    with Session() as db:
+        db.execute(update(Job).where(Job.id == first)
+                   .values(lease_expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+        db.commit()
+    retried = asyncio.run(queue.claim())
+    assert retried["id"] == first and retried["attempts"] == 2
+
+    with Session() as db:
+        db.execute(update(Job).where(Job.id == first)
+                   .values(lease_expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+        db.commit()
+    assert asyncio.run(queue.claim()) is None
+    with Session() as db:
+        statuses = {job.id: (job.status, job.error) for job in db.query(Job)}
+    assert statuses[first] == (FAILED, "worker lease expired too many times")
+    assert statuses[second][0] == RUNNING
+
+
+def test_notify_wakes_idle_workers():
+    queue, Session = make_queue()
+    done = []
+
+    async def respond(job):
+        done.append(time.perf_counter())
+        return {}
+
+    async def run():
+        pool = JobWorkerPool(queue, {"respond": respond}, concurrency=2, poll_interval=30)
+        pool.start()
+        await asyncio.sleep(0.05)  # both workers found nothing and are idle
+        async with queue.session_factory() as db:
+            assert (await queue.enqueue(db, "respond", {}, "analyst", "10.0.0.1")).status == QUEUED
+        enqueued = time.perf_counter()
+        pool.notify()
+        while not done:
+            await asyncio.sleep(0.005)
+        await pool.stop()
+        return done[0] - enqueued
+
+    assert asyncio.run(run()) < 1.0
+
+
+def test_running_jobs_keep_their_lease_and_are_not_run_twice():
+    queue, Session = make_queue(lease_seconds=0.3)
+    [job_id] = enqueue(queue)
+    runs = []
+
+    async def respond(job):
+        runs.append(job["attempts"])
+        await asyncio.sleep(1.0)  # over three leases
+        return {"done": True}
+
+    async def run():
+        pool = JobWorkerPool(queue, {"respond": respond}, concurrency=2, poll_interval=0.05)
+        pool.start()
+        while pool.counters["succeeded"] + pool.counters["failed"] + pool.counters["lost"] < 1:
+            await asyncio.sleep(0.02)
+        await pool.stop()
+        return pool.counters
+
+    counters = asyncio.run(run())
+    assert runs == [1] and counters == {"succeeded": 1, "failed": 0, "lost": 0}
+    with Session() as db:
+        job = db.get(Job, job_id)
+    assert job.status == SUCCEEDED and job.attempts == 1 and job.lease_expires_at is None
+
+
+def test_a_stale_claim_cannot_overwrite_the_current_one():
+    queue, Session = make_queue(lease_seconds=60)
+    enqueue(queue)
+    stale = asyncio.run(queue.claim())
+
+    # The first worker stalled past its lease and the job was handed out again
+    with Session() as db:
+        db.execute(update(Job).where(Job.id == stale["id"])
+                   .values(lease_expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+        db.commit()
+    current = asyncio.run(queue.claim())
+    assert current["attempts"] == 2
+
+    assert asyncio.run(queue.renew(stale)) is False
+    assert asyncio.run(queue.complete(stale, {"by": "stale"})) is False
+    assert asyncio.run(queue.fail(stale, "stale worker")) is False
+    assert asyncio.run(queue.complete(current, {"by": "current"})) is True
+    assert asyncio.run(queue.fail(current, "too late")) is False
+    with Session() as db:
+        job = db.get(Job, current["id"])
+    assert job.status == SUCCEEDED and job.result == '{"by": "current"}' and job.error is None
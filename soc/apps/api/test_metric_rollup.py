@@ -0,0 +1,178 @@
+"""
+Tests for metric downsampling tiers and retention
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from metric_rollup import HOUR, MINUTE, MetricRetention, Series
+from models import Base, Metric, MetricRollup
+
+NOW = datetime(2026, 10, 19, 12, 0, 30, tzinfo=timezone.utc).timestamp()
+START = NOW - 3 * HOUR
+SAMPLES = [{"tool_name": "Wazuh" if k % 2 else "MISP", "cpu_usage": k * 7 % 100, "memory_usage": k % 50,
+            "alerts_count": k % 3, "timestamp": datetime.fromtimestamp(START + 10 * k, timezone.utc)}
+           for k in range(1080)]  # every 10 s for three hours
+
+
+def make_retention(**options):
+    series = Series(Metric.__table__, Metric.timestamp,
+                    {name: getattr(Metric, name) for name in ("cpu_usage", "memory_usage", "alerts_count")},
+                    key=Metric.tool_name)
+    options = {"raw_retention": HOUR, "minute_retention": 2 * HOUR, "batch_size": 100, "min_points": 30,
+               **options}
+    return MetricRetention(series, MetricRollup, **options)
+
+
+@pytest.fixture
+def sessions():
+    path = os.path.join(tempfile.mkdtemp(), "metrics.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=[Metric.__table__, MetricRollup.__table__])
+    with engine.begin() as conn:
+        conn.execute(insert(Metric), SAMPLES)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    yield engine, async_sessionmaker(async_engine, expire_on_commit=False)
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+
+def expected(samples, metric, width, tool=None):
+    buckets = {}
+    for sample in samples:
+        if tool and sample["tool_name"] != tool:
+            continue
+        at = int(sample["timestamp"].timestamp()) // width * width
+        buckets.setdefault(at, []).append(sample[metric])
+    return {at: (min(v), max(v), sum(v), len(v)) for at, v in buckets.items()}
+
+
+def test_rollups_match_the_raw_samples_and_old_samples_are_deleted(sessions):
+    engine, Session = sessions
+    retention = make_retention()
+
+    async def run():
+        async with Session() as db:
+            first = await retention.run(db, now=NOW)
+            again = await retention.run(db, now=NOW)
+            return first, again
+
+    first, again = asyncio.run(run())
+    assert again == {"minute_rows": 0, "hour_rows": 0, "raw_deleted": 0, "minute_deleted": 0}
+
+    with engine.connect() as conn:
+        rows = conn.execute(select(MetricRollup.resolution, MetricRollup.bucket, MetricRollup.min, MetricRollup.max,
+                                   MetricRollup.sum, MetricRollup.count)
+                            .where(MetricRollup.series == "Wazuh", MetricRollup.metric == "cpu_usage")).all()
+        remaining = conn.scalar(select(func.min(Metric.timestamp)))
+    minutes = {bucket: tuple(rest) for resolution, bucket, *rest in rows if resolution == MINUTE}
+    hours = {bucket: tuple(rest) for resolution, bucket, *rest in rows if resolution == HOUR}
+
+    # Minutes closed by now - grace (the last is 11:58), and the hours they complete (up to 10:00)
+    covered = NOW // HOUR * HOUR - HOUR
+    assert hours == expected([s for s in SAMPLES if s["timestamp"].timestamp() < covered], "cpu_usage", HOUR, "Wazuh")
+    assert len(hours) == 2
+    assert min(minutes) == (NOW - 2 * HOUR) // MINUTE * MINUTE and max(minutes) == (NOW - 60) // 60 * 60 - 60
+    assert all(minutes[at] == value for at, value in expected(SAMPLES, "cpu_usage", MINUTE, "Wazuh").items()
+               if at in minutes)
+
+    # Raw samples past their hour of retention went in batches of 100, but only those the hour tier holds
+    assert first["raw_deleted"] == 717 and first["minute_rows"] > 0
+    assert remaining.replace(tzinfo=timezone.utc).timestamp() == covered
+
+
+def test_history_uses_the_coarsest_tier_that_gives_enough_points(sessions):
+    _, Session = sessions
+    retention = make_retention()
+
+    async def run():
+        async with Session() as db:
+            before = await retention.history(db, "memory_usage", START, NOW, resolution=HOUR, now=NOW)
+            await retention.run(db, now=NOW)
+            return before, {span: await retention.history(db, "memory_usage", NOW - span, NOW, now=NOW)
+                            for span in (10 * MINUTE, 50 * MINUTE, 3 * HOUR)}
+
+    before, after = asyncio.run(run())
+    assert retention.pick_tier(NOW - 10 * MINUTE, NOW, NOW) == 0
+    # Three hours reach past the minute tier's two
+    assert [after[span][0] for span in sorted(after)] == [0, MINUTE, HOUR]
+
+    # Stored hours plus raw samples not yet rolled up: nothing lost or counted twice
+    for resolution, points in [before, after[3 * HOUR]]:
+        assert sum(p.count for p in points) == 1080
+        assert sum(p.sum for p in points) == sum(s["memory_usage"] for s in SAMPLES)
+        assert [p.bucket for p in points] == sorted({p.bucket for p in points})
+    assert before[0] == HOUR and len(before[1]) == len(after[3 * HOUR][1]) == 4
+    assert len(after[50 * MINUTE][1]) == 51  # 11:10 to 12:00
+
+    # Per tool, raw samples
+    resolution, points = after[10 * MINUTE]
+    assert resolution == 0 and len(points) == 60 and all(p.count == 1 and p.min == p.max for p in points)
+
+
+def test_hour_tier_serves_ranges_older_than_the_minute_tier(sessions):
+    _, Session = sessions
+    retention = make_retention(minute_retention=HOUR / 2)
+
+    async def run():
+        async with Session() as db:
+            await retention.run(db, now=NOW)
+            return await retention.history(db, "alerts_count", START, NOW, key="MISP", now=NOW)
+
+    resolution, points = asyncio.run(run())
+    assert resolution == HOUR
+    assert sum(p.sum for p in points) == sum(s["alerts_count"] for s in SAMPLES if s["tool_name"] == "MISP")
+
+
+def test_max_points_merges_buckets_in_sql(sessions):
+    _, Session = sessions
+    retention = make_retention()
+
+    async def run():
+        async with Session() as db:
+            raw = await retention.history(db, "cpu_usage", START, NOW, resolution=0, now=NOW, max_points=50)
+            await retention.run(db, now=NOW)
+            minutes = await retention.history(db, "cpu_usage", START, NOW, resolution=MINUTE, now=NOW, max_points=20)
+            return raw, minutes
+
+    raw, minutes = asyncio.run(run())
+    assert raw[0] == 216 and minutes[0] == 9 * MINUTE
+    # Stored minutes (from 10:00) and raw samples not yet rolled up share the bucket across the watermark
+    for width, points in (raw, minutes):
+        assert len(points) <= 51 and [p.bucket for p in points] == sorted({p.bucket for p in points})
+        assert all(p.bucket % width == 0 for p in points)
+        assert max(p.max for p in points) == max(s["cpu_usage"] for s in SAMPLES)
+    assert sum(p.count for p in raw[1]) == 1080
+    assert sum(p.sum for p in minutes[1]) == sum(s["cpu_usage"] for s in SAMPLES
+                                                 if s["timestamp"].timestamp() >= NOW - 2 * HOUR - 30)
+
+
+def test_a_gap_longer_than_a_day_does_not_stall_the_minute_tier(sessions):
+    engine, Session = sessions
+    # An hour of samples from before the tools went quiet for five days
+    early = [dict(sample, timestamp=datetime.fromtimestamp(sample["timestamp"].timestamp() - 5 * 86400, timezone.utc))
+             for sample in SAMPLES[:360]]
+    with engine.begin() as conn:
+        conn.execute(insert(Metric), early)
+    retention = make_retention(raw_retention=30 * 86400, minute_retention=30 * 86400)
+
+    async def run():
+        async with Session() as db:
+            return [(await retention.run(db, now=NOW))["minute_rows"] for _ in range(3)]
+
+    runs = asyncio.run(run())
+    # The quiet days are skipped in one step, not worked through a day per run
+    assert runs[0] > 0 and runs[1] > 0 and runs[2] == 0
+    with engine.connect() as conn:
+        minutes = conn.execute(select(MetricRollup.bucket, MetricRollup.count)
+                               .where(MetricRollup.resolution == MINUTE, MetricRollup.series == "Wazuh",
+                                      MetricRollup.metric == "cpu_usage")).all()
+    closed = [s for s in early + SAMPLES if s["tool_name"] == "Wazuh" and s["timestamp"].timestamp() < NOW - 90]
+    assert sum(count for _, count in minutes) == len(closed)
+    assert max(bucket for bucket, _ in minutes) == (NOW - 60) // 60 * 60 - 60
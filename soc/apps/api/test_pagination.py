@@ -0,0 +1,119 @@
+"""
+Tests for keyset pagination and approximate counts
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.dialects.postgresql import asyncpg
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import pagination
+from models import AuditLog, Base
+from pagination import InvalidCursor, count_rows, decode_cursor, encode_cursor, keyset, split_page
+
+START = datetime(2026, 10, 19, 12, 0, 0)
+
+
+@pytest.fixture(scope="module")
+def engines():
+    path = os.path.join(tempfile.mkdtemp(), "pages.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=[AuditLog.__table__])
+    with engine.begin() as conn:
+        # Three entries per second, so pages end in the middle of a timestamp
+        conn.execute(insert(AuditLog), [
+            {"user_sub": f"user-{n % 5}", "action": "login" if n % 2 else "logout", "resource": "session",
+             "details": "seeded", "created_at": START + timedelta(seconds=n // 3)} for n in range(3000)])
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    yield engine, async_engine
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+
+def walk(async_engine, query, per_page):
+    async def run():
+        pages, cursor = [], None
+        async with async_sessionmaker(async_engine)() as db:
+            while True:
+                rows = (await db.execute(keyset(query, AuditLog.created_at, AuditLog.id, cursor, per_page)))
+                page, cursor = split_page(rows.scalars().all(), per_page)
+                pages.append([entry.id for entry in page])
+                if cursor is None:
+                    return pages
+
+    return asyncio.run(run())
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    assert decode_cursor(encode_cursor(START, 42)) == (START, 42)
+    for garbage in ["", "not a cursor", encode_cursor(START, 1)[:-4], "bm9waXBl"]:
+        with pytest.raises(InvalidCursor):
+            decode_cursor(garbage)
+
+
+def test_pages_cover_every_row_once_newest_first(engines):
+    engine, async_engine = engines
+    pages = walk(async_engine, select(AuditLog), 50)
+    ids = [row_id for page in pages for row_id in page]
+    assert len(pages) == 60 and all(len(page) == 50 for page in pages)
+    assert ids == list(range(3000, 0, -1))  # ties on created_at broken by id
+
+    logins = walk(async_engine, select(AuditLog).where(AuditLog.action == "login"), 7)
+    assert [row_id for page in logins for row_id in page] == list(range(3000, 0, -2))
+
+
+def test_a_deep_page_is_read_from_the_index(engines):
+    engine, _ = engines
+    deep = encode_cursor(START + timedelta(seconds=20), 62)
+    for query in [select(AuditLog), select(AuditLog).where(AuditLog.action == "login")]:
+        compiled = keyset(query, AuditLog.created_at, AuditLog.id, deep, 50).compile(engine)
+        params = tuple(value.isoformat(" ") if isinstance(value, datetime) else value
+                       for value in (compiled.params[name] for name in compiled.positiontup))
+        with engine.connect() as conn:
+            plan = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params)]
+        assert any("INDEX" in step and "created_at<" in step.replace(" ", "") for step in plan), plan
+        assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+def test_approximate_count_stops_at_the_cap(engines, monkeypatch):
+    _, async_engine = engines
+    monkeypatch.setattr(pagination, "COUNT_CAP", 1000)
+
+    async def run():
+        async with async_sessionmaker(async_engine)() as db:
+            query = select(AuditLog)
+            return (await count_rows(db, query), await count_rows(db, query, approximate=True),
+                    await count_rows(db, query.where(AuditLog.user_sub == "user-1"), approximate=True))
+
+    assert asyncio.run(run()) == ((3000, True), (1000, False), (600, True))
+
+
+def test_postgres_estimate_keeps_values_bound():
+    cursor = encode_cursor(START, 42)
+    query = keyset(select(AuditLog).where(AuditLog.action.in_(["login", "x' OR '1'='1"])),
+                   AuditLog.created_at, AuditLog.id, cursor, 20)
+    executed = []
+
+    class Connection:
+        async def execute(self, statement):
+            executed.append(statement.compile(dialect=asyncpg.dialect(),
+                                              compile_kwargs={"render_postcompile": True}))
+            return type("Result", (), {"scalar": lambda self: '[{"Plan": {"Plan Rows": 1234}}]'})()
+
+    class PostgresSession:
+        bind = type("Bind", (), {"dialect": asyncpg.dialect()})()
+
+        async def connection(self):
+            return Connection()
+
+    assert asyncio.run(count_rows(PostgresSession(), query, approximate=True)) == (1234, False)
+    [compiled] = executed
+    sql = str(compiled)
+    assert sql.startswith("EXPLAIN (FORMAT JSON) SELECT") and "ORDER BY" not in sql and "$1" in sql
+    assert "2026" not in sql and "login" not in sql and "OR '1'" not in sql
+    assert {START, "login", "x' OR '1'='1", 42} <= set(compiled.construct_params().values())
@@ -0,0 +1,89 @@
+"""
+Tests for the DAG playbook engine
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from playbook_engine import FAILED, SKIPPED, SUCCEEDED, TIMED_OUT, Playbook, PlaybookContext, Step, note
+
+
+def sleeper(seconds, line, log=None):
+    async def action(context):
+        if log is not None:
+            log.append(line)
+        await asyncio.sleep(seconds)
+        return line
+    return action
+
+
+def test_independent_steps_run_concurrently_and_dependencies_wait():
+    order = []
+    playbook = Playbook("test", [
+        Step("enrich", sleeper(0.1, "enrich", order)),
+        Step("notify", sleeper(0.1, "notify", order)),
+        Step("isolate", sleeper(0.1, "isolate", order)),
+        Step("block", sleeper(0.05, "block", order), depends_on=["enrich"]),
+    ])
+
+    started = time.perf_counter()
+    run = asyncio.run(playbook.run(PlaybookContext({})))
+    elapsed = time.perf_counter() - started
+
+    assert run.succeeded and run.actions == ["enrich", "notify", "isolate", "block"]
+    assert order[-1] == "block"
+    assert elapsed < 0.25  # 0.15s critical path, not the 0.35s sum
+    timings = run.timings()
+    assert timings["block"]["started_ms"] >= timings["enrich"]["duration_ms"]
+    assert all(t["duration_ms"] is not None for t in timings.values())
+
+
+def test_timeouts_retries_and_skipped_dependents():
+    attempts = {"flaky": 0}
+
+    async def flaky(context):
+        attempts["flaky"] += 1
+        if attempts["flaky"] < 3:
+            raise RuntimeError("provider unavailable")
+        return "flaky ok"
+
+    playbook = Playbook("test", [
+        Step("flaky", flaky, retries=2, retry_delay=0.001),
+        Step("slow", sleeper(1.0, "slow"), timeout=0.05, retries=1, retry_delay=0.001),
+        Step("after_slow", sleeper(0, "after"), depends_on=["slow"]),
+        note("after_after", "never", depends_on=["after_slow"]),
+        note("after_flaky", "done", depends_on=["flaky"]),
+    ])
+    run = asyncio.run(playbook.run(PlaybookContext({})))
+
+    assert run.steps["flaky"].status == SUCCEEDED and run.steps["flaky"].attempts == 3
+    assert run.steps["slow"].status == TIMED_OUT and run.steps["slow"].attempts == 2
+    assert run.steps["after_slow"].status == SKIPPED and run.steps["after_after"].status == SKIPPED
+    assert run.steps["after_flaky"].status == SUCCEEDED
+    assert "Step 'slow' timed_out: no result after 0.05s" in run.actions
+    assert not run.succeeded
+
+
+def test_invalid_dags_are_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        Playbook("cyclic", [note("a", "a", depends_on=["b"]), note("b", "b", depends_on=["a"])])
+    with pytest.raises(ValueError, match="unknown"):
+        Playbook("dangling", [note("a", "a", depends_on=["missing"])])
+    with pytest.raises(ValueError, match="duplicate"):
+        Playbook("dupes", [note("a", "a"), note("a", "b")])
+
+
+def test_response_playbooks_are_dags():
+    from routers import playbooks
+
+    playbook = playbooks.select_playbook("malware", 0.9, 80, 12)
+    assert playbook is playbooks.CRITICAL_RESPONSE_PLAYBOOK
+    assert playbooks.select_playbook("unknown", 0.1, 10, 3) is playbooks.DEFAULT_RESPONSE_PLAYBOOK
+
+    run = asyncio.run(playbooks.DEFAULT_RESPONSE_PLAYBOOK.run(PlaybookContext({"id": "a1"})))
+    assert run.succeeded
+    assert run.actions == ["Default: Enhanced monitoring and alerting", "Default: Documented incident for review",
+                           "Default: Scheduled follow-up investigation"]
+    assert FAILED not in {step.status for step in run.steps.values()}
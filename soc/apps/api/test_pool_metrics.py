@@ -0,0 +1,51 @@
+"""
+Tests for connection pool settings and checkout metrics
+"""
+
+import os
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from pool_metrics import PoolMetrics
+
+SETTINGS = SimpleNamespace(db_pool_size=1, db_max_overflow=1, db_pool_timeout_seconds=0.2,
+                           db_pool_recycle_seconds=1800, db_pool_pre_ping=True)
+
+
+def test_in_memory_databases_keep_their_single_connection_pool():
+    options = PoolMetrics("test").engine_options("sqlite://", SETTINGS)
+    assert "pool_size" not in options and options["pool_pre_ping"] is True
+    create_engine("sqlite://", **options).dispose()
+
+
+def test_contention_shows_as_checkout_wait_overflow_and_timeouts():
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'pool.db')}"
+    metrics = PoolMetrics("test")
+    engine = create_engine(url, connect_args={"check_same_thread": False}, **metrics.engine_options(url, SETTINGS))
+
+    first, second = engine.connect(), engine.connect()  # pool_size + max_overflow
+    stats = metrics.snapshot(engine)
+    assert stats["pool"] == "TimedQueuePool"
+    assert stats["in_use"] == 2 and stats["overflow"] == 1
+
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    assert metrics.counters["timeouts"] == 1
+
+    # A checkout that has to wait for a connection to come back
+    threading.Timer(0.1, second.close).start()
+    started = time.perf_counter()
+    with engine.connect() as third:
+        third.execute(text("SELECT 1"))
+    assert time.perf_counter() - started >= 0.09
+    first.close()
+
+    stats = metrics.snapshot(engine)
+    assert stats["checkouts"] == 3 and stats["in_use"] == 0
+    assert stats["checkout_wait_ms"]["max"] >= 90
+    engine.dispose()
@@ -0,0 +1,76 @@
+"""
+Tests for the quota-aware enrichment scheduler
+"""
+
+import asyncio
+import time
+
+from enrichment import EnrichmentError
+from scheduler import EnrichmentScheduler, Priority, TokenBucket
+
+
+def test_token_bucket_refills_at_rate():
+    now = [0.0]
+    bucket = TokenBucket(rate=2, capacity=4, clock=lambda: now[0])
+    for _ in range(4):
+        assert bucket.delay() == 0
+        bucket.take()
+    assert bucket.delay() == 0.5
+    now[0] += 1.0
+    assert bucket.available() == 2
+    bucket.pause(3)
+    assert bucket.delay() == 3
+
+
+def test_dispatch_stays_within_quota_and_serves_critical_first():
+    calls = []
+
+    async def fetch(values):
+        calls.append((time.monotonic(), values))
+        return {value: value.upper() for value in values}
+
+    scheduler = EnrichmentScheduler("test", fetch, rate_per_second=40, burst=2)
+
+    async def run():
+        started = time.monotonic()
+        defaults = [asyncio.create_task(scheduler.submit(f"d{i}")) for i in range(10)]
+        await asyncio.sleep(0.01)
+        critical = await scheduler.submit("c0", Priority.CRITICAL)
+        results = await asyncio.gather(*defaults)
+        stats = scheduler.stats()
+        await scheduler.aclose()
+        return critical, results, time.monotonic() - started, stats
+
+    critical, results, elapsed, stats = asyncio.run(run())
+    assert critical == "C0" and results == [f"D{i}" for i in range(10)]
+    order = [values[0] for _, values in calls]
+    assert order.index("c0") < 4  # overtook most of the queued default lookups
+    assert elapsed >= (11 - 2) / 40 * 0.9  # never faster than the quota
+    assert stats["calls"] == 11 and stats["queue_depth"] == 0
+    assert stats["wait_seconds"]["samples"] == 11 and stats["wait_seconds"]["max"] > 0
+
+
+def test_batches_and_retries_rate_limited_calls():
+    calls = []
+
+    async def fetch(values):
+        calls.append(values)
+        if len(calls) == 1:
+            raise EnrichmentError("test", 429, "HTTP 429")
+        return {value: len(value) for value in values}
+
+    scheduler = EnrichmentScheduler(
+        "test", fetch, rate_per_second=100, burst=10, batch_size=3, retry_after=0.01,
+        is_rate_limited=lambda exc: isinstance(exc, EnrichmentError) and exc.status_code == 429,
+    )
+
+    async def run():
+        results = await asyncio.gather(*(scheduler.submit("x" * i) for i in range(1, 8)))
+        await scheduler.aclose()
+        return results
+
+    assert asyncio.run(run()) == list(range(1, 8))
+    # All three batches leave before the 429 comes back; the rejected one is retried
+    assert [len(batch) for batch in calls] == [3, 3, 1, 3]
+    assert calls[-1] == calls[0]
+    assert scheduler.counters["rate_limited"] == 1 and scheduler.counters["failed"] == 0
@@ -0,0 +1,58 @@
+"""
+Tests for the MinHash LSH incident similarity index
+"""
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import datagen
+from models import Base, Incident
+from similarity import SimilarityIndex, incident_text, rebuild_from_db
+
+BASE = "Ransomware behaviour observed on host-0042 (rule 87105) encrypting shared drive files"
+
+
+def test_near_duplicates_rank_first():
+    index = SimilarityIndex()
+    frame = datagen.incidents_frame(5000, seed=5)
+    index.rebuild((i + 1, text) for i, text in enumerate(frame['description']))
+    index.add(10001, BASE)
+    index.add(10002, BASE + " again")
+    index.add(10003, "Phishing email reported by finance team")
+
+    matches = index.similar(BASE, k=3, exclude_id=10001)
+    assert matches[0][0] == 10002
+    assert matches[0][1] > 0.6
+    assert all(match_id != 10001 for match_id, _ in matches)
+    assert index.similar("", k=3) == []
+
+
+def test_compaction_keeps_results():
+    index = SimilarityIndex(compact_threshold=10**9)
+    for i in range(200):
+        index.add(i + 1, f"Brute force login failures for user{i} from 10.0.0.{i}")
+    index.add(500, BASE)
+    before = index.similar(BASE + " again", k=5)
+
+    index.compact()
+    assert index.similar(BASE + " again", k=5) == before
+    assert before[0][0] == 500
+    assert len(index) == 201
+
+
+def test_rebuild_from_db_skips_entries_already_added():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[Incident.__table__])
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add_all([Incident(title="Malware signature detected", description=BASE, tags="source:wazuh"),
+                    Incident(title="Phishing email reported", description="Credential link clicked")])
+        db.commit()
+        rows = [(inc.id, incident_text(inc.title, inc.description, inc.tags)) for inc in db.query(Incident)]
+
+    index = SimilarityIndex()
+    index.add(rows[0][0], rows[0][1])  # created while the rebuild was running
+    rebuild_from_db(index, Session)
+
+    assert index.ready and len(index) == 2
+    assert index.similar(rows[0][1], k=1)[0] == (rows[0][0], 1.0)
@@ -0,0 +1,31 @@
+"""
+Tests for the offline integration stand-ins
+"""
+
+import httpx
+
+from standins import VirusTotalStandIn
+
+
+def test_virustotal_reports_are_stable_per_hash():
+    with VirusTotalStandIn(unknown_rate=0.5) as vt:
+        statuses = {}
+        for n in range(40):
+            hash_value = f"{(n * 0x9E3779B1) & 0xFFFFFFFF:08x}".ljust(64, "0")
+            first = httpx.get(f"{vt.api_url}/files/{hash_value}")
+            second = httpx.get(f"{vt.api_url}/files/{hash_value}")
+            assert first.status_code == second.status_code and first.json() == second.json()
+            statuses[hash_value] = first.status_code
+    assert set(statuses.values()) == {200, 404}
+
+
+def test_rate_limit_and_error_injection():
+    with VirusTotalStandIn(rate_limit=1, burst=3) as vt:
+        responses = [httpx.get(f"{vt.api_url}/files/{'f' * 64}") for _ in range(5)]
+        assert [r.status_code for r in responses] == [200, 200, 200, 429, 429]
+        assert responses[-1].headers["retry-after"] == "1"
+        assert vt.counters == {"requests": 5, "errors": 0, "rate_limited": 2}
+
+    with VirusTotalStandIn(error_rate=1.0, error_status=500) as vt:
+        assert httpx.get(f"{vt.api_url}/files/{'f' * 64}").status_code == 500
+        assert vt.counters["errors"] == 1
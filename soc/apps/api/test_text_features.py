@@ -0,0 +1,42 @@
+"""
+Tests for the hashed sparse incident featurizer
+"""
+
+import scipy.sparse as sp
+
+import datagen
+from routers.ai import IncidentAnalysisService
+from text_features import NUMERIC_FEATURES, IncidentFeaturizer
+
+
+def test_dimension_is_fixed_regardless_of_corpus():
+    featurizer = IncidentFeaturizer(n_text_features=1024)
+    small = featurizer.transform(datagen.incident_training_frame(10, seed=1))
+    large = featurizer.transform(datagen.incident_training_frame(5000, seed=2))
+
+    assert sp.isspmatrix_csr(small) and sp.isspmatrix_csr(large)
+    assert small.shape[1] == large.shape[1] == len(NUMERIC_FEATURES) + 1024
+
+
+def test_streaming_batches_match_one_shot_transform():
+    featurizer = IncidentFeaturizer(n_text_features=1024)
+    frame = datagen.incident_training_frame(2500, seed=4)
+    rows = frame.drop(columns='incident_type').to_dict('records')
+
+    whole = featurizer.transform(frame)
+    batched = sp.vstack(list(featurizer.transform_batches(iter(rows), batch_size=1000)))
+    assert (whole != batched).nnz == 0
+
+
+def test_text_changes_features_and_model_uses_them(tmp_path):
+    service = IncidentAnalysisService()
+    service.model_path = str(tmp_path / "incident_classifier.pkl")
+    service._train_with_synthetic_data()
+
+    assert service.model.n_features_in_ == service.featurizer.n_features
+    result = service.analyze_incident({
+        'title': 'Trojan dropper quarantined',
+        'description': 'Suspicious binary with known malware hash',
+        'severity': 'high',
+    })
+    assert result['predicted_type'] == 'malware'
@@ -0,0 +1,88 @@
+"""
+Tests for unit-of-work batching of playbook audit writes
+"""
+
+import asyncio
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import enrichment
+from blocklist import BlockedIndicators
+from correlation import AlertCorrelator
+from models import IOC, AuditLog, Base, Incident
+from routers import incidents, playbooks
+from unit_of_work import UnitOfWork
+
+HASHES = ["a" * 64, "b" * 64, "c" * 40, "d" * 32, "e" * 32]
+
+
+class FakeAnalysis:
+    def analyze_incident(self, incident):
+        return {"predicted_type": "malware", "confidence": 0.9, "risk_score": 90,
+                "severity_assessment": "critical", "recommended_actions": []}
+
+
+def make_sessions():
+    """Blocking session factory for checks, asyncio one for the code under test, and its commits"""
+    path = os.path.join(tempfile.mkdtemp(), "uow.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[Incident.__table__, AuditLog.__table__, IOC.__table__])
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    commits = []
+    event.listen(async_engine.sync_engine, "commit", lambda conn: commits.append(1))
+    return sessionmaker(bind=engine), async_sessionmaker(async_engine, expire_on_commit=False), commits
+
+
+def test_response_commits_do_not_grow_with_indicator_count(monkeypatch):
+    async def lookup_many(hashes, priority=0):
+        return {h: {"data": {"attributes": {"last_analysis_stats": {"malicious": 3}}}} for h in hashes}
+
+    monkeypatch.setattr(enrichment, "lookup_many", lookup_many)
+    monkeypatch.setattr(playbooks, "incident_analysis_service", FakeAnalysis())
+    monkeypatch.setattr(incidents, "alert_correlator", AlertCorrelator([], 0))
+    monkeypatch.setattr(playbooks, "blocked_indicators", BlockedIndicators())
+    Session, AsyncSession, commits = make_sessions()
+
+    alert = {"id": "alert-1", "rule": {"level": 13, "description": "Malware dropped"},
+             "syscheck": {"sha256_after": HASHES[0], "sha1_after": HASHES[2], "md5_after": HASHES[3]},
+             "data": {"sha256": HASHES[1], "md5": HASHES[4]}}
+
+    async def respond():
+        async with AsyncSession() as db:
+            return await playbooks.run_auto_incident_response(alert, db, "analyst", "10.0.0.1")
+
+    result = asyncio.run(respond())
+
+    assert result["status"] == "completed"
+    assert result["playbook_result"]["playbook"] == "critical_response"
+    # One commit opens the case, one writes everything the response did
+    assert len(commits) == 2
+
+    with Session() as db:
+        actions = [row.action for row in db.query(AuditLog)]
+        assert db.get(Incident, result["incident_id"]).severity == "critical"
+    assert actions.count("virustotal_enrichment") == len(HASHES)
+    assert actions.count("block_hash_fleetdm") == len(HASHES)
+    assert actions.count("create_incident") == 1 and actions.count("auto_incident_response") == 1
+
+
+def test_failed_run_still_writes_its_audit_trail():
+    Session, AsyncSession, commits = make_sessions()
+
+    async def fail():
+        async with AsyncSession() as db:
+            async with UnitOfWork(db, "analyst", "10.0.0.1") as uow:
+                uow.audit("block_hash_fleetdm", "hash:abc", "Blocked hash")
+                uow.audit("block_hash_fleetdm", "hash:def", "Blocked hash")
+                raise RuntimeError("step failed")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(fail())
+    with Session() as db:
+        assert db.query(AuditLog).count() == 2
+    assert len(commits) == 1
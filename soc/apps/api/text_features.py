@@ -0,0 +1,81 @@
+"""
+Sparse feature pipeline for AI incident analysis
+
+Combines the hand-picked numeric incident features with hashed word and bigram
+features from the incident text (title, description, tags). Hashing into a fixed
+number of bins keeps the featurizer stateless: there is no vocabulary to fit or
+store, memory does not grow with the corpus, and any batch of incidents can be
+transformed on its own, so features can be computed in a streaming fashion.
+"""
+
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Union
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+
+# Column order of the numeric block; the hashed text block follows it
+NUMERIC_FEATURES = [
+    'alert_count', 'severity_score', 'has_malware_hash', 'network_traffic_anomaly',
+    'login_failure_count', 'data_exfiltration_indicators', 'privilege_change_count',
+    'hour_of_day', 'is_business_hours', 'source_ip_count', 'affected_systems',
+    'threat_actor_indicators', 'known_malware_signature',
+]
+TEXT_FEATURE = 'text'
+DEFAULT_TEXT_BINS = 2 ** 16
+
+Rows = Union[pd.DataFrame, List[Dict[str, Any]]]
+
+
+class IncidentFeaturizer:
+    """Stateless transformer from incident feature rows to a CSR matrix"""
+
+    def __init__(self, n_text_features: int = DEFAULT_TEXT_BINS):
+        self.n_text_features = n_text_features
+        self.vectorizer = HashingVectorizer(
+            n_features=n_text_features,
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            norm='l2',
+            dtype=np.float32,
+        )
+
+    @property
+    def n_features(self) -> int:
+        return len(NUMERIC_FEATURES) + self.n_text_features
+
+    def feature_name(self, index: int) -> str:
+        """Readable name for a column index, e.g. for feature importances"""
+        if index < len(NUMERIC_FEATURES):
+            return NUMERIC_FEATURES[index]
+        return f"text_bin_{index - len(NUMERIC_FEATURES)}"
+
+    def transform(self, rows: Rows) -> sp.csr_matrix:
+        """Featurize a DataFrame or a list of dicts holding NUMERIC_FEATURES and 'text'"""
+        if isinstance(rows, pd.DataFrame):
+            numeric = rows.reindex(columns=NUMERIC_FEATURES, fill_value=0).to_numpy(dtype=np.float32)
+            texts = rows[TEXT_FEATURE].fillna('') if TEXT_FEATURE in rows else [''] * len(rows)
+        else:
+            numeric = np.array([[row.get(name, 0) for name in NUMERIC_FEATURES] for row in rows],
+                               dtype=np.float32).reshape(len(rows), len(NUMERIC_FEATURES))
+            texts = [row.get(TEXT_FEATURE) or '' for row in rows]
+
+        text_matrix = self.vectorizer.transform(texts)
+        return sp.hstack([sp.csr_matrix(numeric), text_matrix], format='csr', dtype=np.float32)
+
+    def transform_batches(self, rows: Union[pd.DataFrame, Iterable[Dict[str, Any]]],
+                          batch_size: int = 10000) -> Iterator[sp.csr_matrix]:
+        """Featurize rows batch by batch; memory is bounded by batch_size, not the input size"""
+        if isinstance(rows, pd.DataFrame):
+            for offset in range(0, len(rows), batch_size):
+                yield self.transform(rows.iloc[offset:offset + batch_size])
+            return
+
+        iterator = iter(rows)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                return
+            yield self.transform(batch)
@@ -0,0 +1,75 @@
+"""
+Unit of work for playbook runs
+
+A playbook run touches the database from many steps: every enrichment and
+containment action is audited, and the incident may be updated on the way.
+Instead of each step committing on its own, steps record their audit entries
+and changes on the run's UnitOfWork, which writes them in one transaction at
+the end of the run (or at an explicit checkpoint). Commits per alert stay
+constant no matter how many indicators the alert carries.
+"""
+
+import asyncio
+import logging
+from typing import Any, List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+
+class UnitOfWork:
+    """Pending audit entries and changes of one playbook run, flushed together.
+
+    Used as an async context manager, it flushes on exit even when the run failed
+    part-way: the actions that did happen still need their audit trail.
+    Steps of a run execute concurrently but share one AsyncSession, which
+    allows a single operation at a time; steps that query through `db` hold
+    `db_lock` while they do.
+    """
+
+    def __init__(self, db: AsyncSession, user_sub: str, client_ip: str):
+        self.db = db
+        self.user_sub = user_sub
+        self.client_ip = client_ip
+        self.db_lock = asyncio.Lock()
+        self._pending: List[Any] = []
+        self.commits = 0
+
+    def audit(self, action: str, resource: str, details: str) -> None:
+        """Record an audit entry attributed to the run's user"""
+        self._pending.append(AuditLog(user_sub=self.user_sub, action=action, resource=resource, details=details))
+
+    def add(self, obj: Any) -> None:
+        """Queue a new or modified ORM object for the next flush"""
+        self._pending.append(obj)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def checkpoint(self) -> None:
+        """Write everything recorded so far in one transaction"""
+        pending, self._pending = self._pending, []
+        if not pending and not (self.db.dirty or self.db.new):
+            return
+        async with self.db_lock:
+            try:
+                self.db.add_all(pending)
+                await self.db.commit()
+            except Exception:
+                await self.db.rollback()
+                raise
+        self.commits += 1
+
+    async def __aenter__(self) -> "UnitOfWork":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        try:
+            await self.checkpoint()
+        except Exception as e:
+            if exc is None:
+                raise
+            logger.error(f"Could not write the audit trail of a failed playbook run: {e}")
@@ -1,9 +1,10 @@
 from fastapi import WebSocket
 import asyncio
 import json
-from database import get_db
+from sqlalchemy import select
+
+from database import AsyncSessionLocal
 from models import Tool
-from sqlalchemy.orm import Session
 
 connected_clients = set()
 
@@ -17,8 +18,8 @@ async def websocket_status_endpoint(websocket: WebSocket):
             # Mock status updates every 5 seconds
             await asyncio.sleep(5)
 
-            db: Session = next(get_db())
-            tools = db.query(Tool).all()
+            async with AsyncSessionLocal() as db:
+                tools = (await db.execute(select(Tool))).scalars().all()
             status_data = {
                 "timestamp": asyncio.get_event_loop().time(),
                 "tools": [
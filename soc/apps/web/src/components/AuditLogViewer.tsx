@@ -24,6 +24,8 @@ export const AuditLogViewer: React.FC = () => {
   const [userFilter, setUserFilter] = useState<string>('all');
   const [page, setPage] = useState(1);
   const [totalPages, setTotalPages] = useState(1);
+  // cursors[n] continues the list after page n; page 1 needs none
+  const [cursors, setCursors] = useState<(string | null)[]>([null]);
 
   const fetchAuditLogs = async () => {
     try {
@@ -33,6 +35,10 @@ export const AuditLogViewer: React.FC = () => {
         action: actionFilter,
         user: userFilter
       });
+      const cursor = cursors[page - 1];
+      if (cursor) {
+        params.set('cursor', cursor);
+      }
 
       const response = await fetch(`/api/audit-logs?${params}`, {
         headers: {
@@ -44,6 +50,11 @@ export const AuditLogViewer: React.FC = () => {
         const data = await response.json();
         setLogs(data.logs);
         setTotalPages(data.total_pages);
+        setCursors(previous => {
+          const next = previous.slice(0, page);
+          next[page] = data.next_cursor;
+          return next;
+        });
       }
     } catch (error) {
       console.error('Failed to fetch audit logs:', error);
@@ -56,6 +67,11 @@ export const AuditLogViewer: React.FC = () => {
     fetchAuditLogs();
   }, [page, searchTerm, actionFilter, userFilter]);
 
+  // Cursors belong to one set of filters
+  useEffect(() => {
+    setCursors([null]);
+  }, [searchTerm, actionFilter, userFilter]);
+
   const getActionColor = (action: string) => {
     if (action.includes('start')) return 'bg-green-500';
     if (action.includes('stop')) return 'bg-red-500';